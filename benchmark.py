@@ -0,0 +1,542 @@
+# Benchmarks for the StockBot routing and stock components
+# Run with: python benchmark.py <benchmark> [options]
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import database
+import spa
+import skus
+import slotting
+import trips
+from workloads import percentile, quiet_logging, rack_grid, random_grid
+
+def bench_distance_table(args):
+    """Build a memory-mapped distance table and time random lookups"""
+    grid = random_grid(args.rows, args.cols, args.density, args.seed)
+    rng = random.Random(args.seed)
+
+    # Choose the storage cells at random from the open cells
+    open_cells = [(row, col) for row in range(grid.rows) for col in range(grid.cols)
+                  if not grid.is_obstacle(row, col)]
+    cells = rng.sample(open_cells, min(args.cells, len(open_cells)))
+
+    path = os.path.join(tempfile.gettempdir(), f"stockbot_distances_{os.getpid()}.bin")
+    try:
+        start_time = time.perf_counter()
+        spa.build_distance_table(grid, cells, path)
+        build_time = time.perf_counter() - start_time
+
+        table = spa.DistanceTable(path)
+        pairs = [(rng.choice(cells), rng.choice(cells)) for _ in range(args.lookups)]
+        start_time = time.perf_counter()
+        for a, b in pairs:
+            table.distance(a, b)
+        lookup_time = time.perf_counter() - start_time
+        table.close()
+
+        print(f"Grid: {args.rows}x{args.cols}, obstacle density {args.density}, {len(cells)} storage cells")
+        print(f"Build time: {build_time:.2f} s ({build_time / len(cells) * 1000:.2f} ms per cell)")
+        print(f"File size: {os.path.getsize(path) / 1024:.1f} KiB")
+        print(f"Lookup latency: {lookup_time / len(pairs) * 1e9:.0f} ns ({len(pairs)} lookups)")
+    finally:
+        os.remove(path)
+
+def bench_alt(args):
+    """Compare nodes expanded by A* with the Manhattan and ALT heuristics"""
+    grid = rack_grid(args.rows, args.cols, args.seed)
+    path_finder = spa.PathFinder(grid)
+    path_finder.landmark_count = args.landmarks
+    rng = random.Random(args.seed)
+    open_cells = [(row, col) for row in range(grid.rows) for col in range(grid.cols)
+                  if not grid.is_obstacle(row, col)]
+    pairs = [(rng.choice(open_cells), rng.choice(open_cells)) for _ in range(args.queries)]
+
+    start_time = time.perf_counter()
+    path_finder.select_landmarks()
+    precompute_time = time.perf_counter() - start_time
+
+    results = {}
+    for name, heuristic in (("manhattan", path_finder.heuristic), ("alt", path_finder.alt_heuristic)):
+        expanded = 0
+        start_time = time.perf_counter()
+        for a, b in pairs:
+            path_finder.astar(a, b, heuristic=heuristic)
+            expanded += path_finder.last_expanded
+        results[name] = (expanded, time.perf_counter() - start_time)
+
+    print(f"Rack layout: {args.rows}x{args.cols}, {len(grid.obstacles)} obstacles, {args.queries} queries")
+    print(f"Landmark precomputation: {precompute_time:.2f} s for {len(path_finder.landmarks)} landmarks")
+    for name, (expanded, elapsed) in results.items():
+        print(f"{name:>9}: {expanded / len(pairs):10.1f} nodes expanded per query, "
+              f"{elapsed / len(pairs) * 1000:.2f} ms per query")
+    reduction = 1 - results["alt"][0] / max(1, results["manhattan"][0])
+    print(f"ALT expands {reduction:.1%} fewer nodes")
+
+def bench_turns(args):
+    """Compare steps, turns and travel time of BFS routes with turn-penalised routes"""
+    grid = random_grid(args.rows, args.cols, args.density, args.seed)
+    path_finder = spa.PathFinder(grid)
+    path_finder.turn_cost = args.turn_cost
+    rng = random.Random(args.seed)
+    open_cells = [(row, col) for row in range(grid.rows) for col in range(grid.cols)
+                  if not grid.is_obstacle(row, col)]
+    pairs = [(rng.choice(open_cells), rng.choice(open_cells)) for _ in range(args.queries)]
+
+    print(f"Random layout: {args.rows}x{args.cols}, {len(grid.obstacles)} obstacles, {args.queries} queries, "
+          f"turn cost {args.turn_cost}")
+    results = {}
+    for algorithm in ("bfs", "turns"):
+        path_finder.set_algorithm(algorithm)
+        steps = turns = travel_time = 0
+        start_time = time.perf_counter()
+        for a, b in pairs:
+            path = path_finder.find_path(a, b)
+            if path:
+                route = spa.Route.from_coordinates(path, grid.cols)
+                steps += len(route) - 1
+                turns += route.turns()
+                travel_time += route.travel_time(args.turn_cost)
+        elapsed = time.perf_counter() - start_time
+        results[algorithm] = travel_time
+        print(f"{algorithm:>6}: {steps / len(pairs):7.1f} steps, {turns / len(pairs):5.1f} turns, "
+              f"{travel_time / len(pairs):7.1f} travel time per query, {elapsed / len(pairs) * 1000:.2f} ms per query")
+    print(f"Turn-aware routes cut travel time by {1 - results['turns'] / max(1, results['bfs']):.1%}")
+
+def bench_trips(args):
+    """Plan one large order into capacitated trips and compare with filling trips in pick order"""
+    grid = random_grid(args.rows, args.cols, args.density, args.seed)
+    path_finder = spa.PathFinder(grid)
+    rng = random.Random(args.seed)
+    docks = ((0, 0), (args.rows - 1, args.cols - 1))
+    open_cells = [(row, col) for row in range(grid.rows) for col in range(grid.cols)
+                  if not grid.is_obstacle(row, col) and (row, col) not in docks]
+    picks = Counter()
+    for row, col in rng.sample(open_cells, min(args.picks, len(open_cells))):
+        picks[spa.coordinates_to_index(row, col, grid.cols)] = rng.randint(1, args.max_units)
+
+    planner = trips.TripPlanner(path_finder, capacity=args.capacity)
+    start_time = time.perf_counter()
+    path_finder.distance_matrix(list(docks) + [spa.index_to_coordinates(item_id, grid.cols) for item_id in picks])
+    matrix_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    plan = planner.plan(picks, docks[0], docks[1], time_budget=args.budget, build_paths=False)
+    plan_time = time.perf_counter() - start_time
+
+    print(f"Random layout: {args.rows}x{args.cols}, {len(picks)} bins, {sum(picks.values())} units, "
+          f"capacity {args.capacity}")
+    print(f"Distance matrix: {matrix_time:.2f} s (distance fields are then cached)")
+    print(f"Planning: {plan_time:.2f} s with a {args.budget:.1f} s budget")
+    print(f"Trips: {len(plan.trips)}, distance {plan.distance} vs {plan.naive_distance} filling trips in pick order "
+          f"({1 - plan.distance / max(1, plan.naive_distance):.1%} shorter)")
+
+def bench_slotting(args):
+    """Build a skewed pick history, then time planning a re-slot of the whole warehouse"""
+    grid = random_grid(args.rows, args.cols, args.density, args.seed)
+    path_finder = spa.PathFinder(grid)
+    db = database.open_inventory(args.rows, args.cols, "memory")
+    random.seed(args.seed)
+    db.populate_random_data()
+
+    # A fifth of the bins take most of the picks
+    rng = random.Random(args.seed)
+    open_positions = [spa.coordinates_to_index(row, col, grid.cols) for row in range(grid.rows)
+                      for col in range(grid.cols) if not grid.is_obstacle(row, col)]
+    popular = rng.sample(open_positions, max(1, len(open_positions) // 5))
+    picks = Counter(rng.choice(popular if rng.random() < 0.8 else open_positions) for _ in range(args.picks))
+    for item_id, units in picks.items():
+        db.update_quantity(item_id, units)
+    db.decrement_quantities(dict(picks))
+
+    optimiser = slotting.SlottingOptimiser(db, path_finder)
+    start_time = time.perf_counter()
+    plan = optimiser.plan((0, 0), (args.rows - 1, args.cols - 1), max_moves=args.max_moves)
+    elapsed = time.perf_counter() - start_time
+    db.close()
+
+    print(f"Random layout: {args.rows}x{args.cols}, {len(grid.obstacles)} obstacles, "
+          f"{args.picks} picks over {len(picks)} bins")
+    print(f"Planning: {elapsed:.2f} s including both dock distance fields")
+    print(plan.summary(limit=0))
+
+def bench_skus(args):
+    """Load a large SKU catalogue into SQLite, then time resolving orders to their nearest stocked locations"""
+    grid = random_grid(args.rows, args.cols, args.density, args.seed)
+    path_finder = spa.PathFinder(grid)
+    rng = random.Random(args.seed)
+    open_positions = [spa.coordinates_to_index(row, col, grid.cols) for row in range(grid.rows)
+                      for col in range(grid.cols) if not grid.is_obstacle(row, col)]
+    db_path = os.path.join(tempfile.gettempdir(), f"stockbot_skus_{os.getpid()}.db")
+    try:
+        db = database.InventoryDB(args.rows, args.cols, db_path)
+        start_time = time.perf_counter()
+        db.add_skus((f"SKU{number:07d}", None) for number in range(args.skus))
+        # SKU IDs are assigned in insertion order, so stock can be written without looking them up
+        db.set_sku_stock((sku_id, location_id, rng.randint(0, 50))
+                         for sku_id in range(1, args.skus + 1)
+                         for location_id in rng.sample(open_positions, rng.randint(1, args.max_locations)))
+        load_time = time.perf_counter() - start_time
+
+        resolver = skus.SkuResolver(db, path_finder)
+        origin = (0, 0)
+        # Build the distance field up front; it is cached, so only the queries are timed below
+        resolver.distances(origin)
+        orders = [{f"SKU{rng.randrange(args.skus):07d}": rng.randint(1, 5) for _ in range(args.lines)}
+                  for _ in range(args.orders)]
+
+        latencies = []
+        short = 0
+        for order in orders:
+            start_time = time.perf_counter()
+            allocation = resolver.resolve(order, origin)
+            latencies.append(time.perf_counter() - start_time)
+            short += len(allocation.unfilled)
+
+        batch_times = []
+        for i in range(0, len(orders), args.batch):
+            start_time = time.perf_counter()
+            resolver.resolve_orders(orders[i:i + args.batch], origin)
+            batch_times.append(time.perf_counter() - start_time)
+        db.close()
+
+        print(f"Catalogue: {args.skus} SKUs on a {args.rows}x{args.cols} grid with up to "
+              f"{args.max_locations} locations each, loaded in {load_time:.1f} s "
+              f"({os.path.getsize(db_path) / 1e6:.0f} MB)")
+        print(f"Single orders of {args.lines} lines: p50 {percentile(latencies, 0.5) * 1000:.2f} ms, "
+              f"p99 {percentile(latencies, 0.99) * 1000:.2f} ms, {short} lines short of stock")
+        print(f"Batches of {args.batch} orders: mean {sum(batch_times) / len(batch_times) * 1000:.2f} ms "
+              f"({sum(batch_times) / len(orders) * 1000:.3f} ms per order)")
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+def bench_ga(args):
+    """Route quality and generation rate of the pure-Python and numpy genetic algorithms"""
+    grid = random_grid(args.rows, args.cols, args.density, args.seed)
+    path_finder = spa.PathFinder(grid)
+    rng = random.Random(args.seed)
+    open_cells = [(row, col) for row in range(grid.rows) for col in range(grid.cols)
+                  if not grid.is_obstacle(row, col)]
+    start, end = (0, 0), (grid.rows - 1, grid.cols - 1)
+    points = rng.sample(open_cells, args.points)
+    # Build the distance fields up front so both engines are timed on the GA alone
+    path_finder.distance_matrix([start] + points + [end])
+    print(f"Original order costs {path_finder.route_cost(start, points, end)}")
+
+    engines = [("python", False)]
+    if spa._import_numpy() is not None:
+        engines.append(("numpy", True))
+    else:
+        print("numpy is not installed, only timing the pure-Python GA")
+    for name, use_numpy in engines:
+        path_finder.use_numpy = use_numpy
+        random.seed(args.seed)
+        start_time = time.perf_counter()
+        order = path_finder.optimise_point_order(start, list(points), end,
+                                                 deadline=time.monotonic() + args.budget)
+        elapsed = time.perf_counter() - start_time
+        print(f"{name:>7}: cost {path_finder.route_cost(start, order, end)} after "
+              f"{path_finder.last_generations} generations in {elapsed:.2f} s "
+              f"({path_finder.last_generations / elapsed:.0f} generations per second)")
+
+def _reservation_worker(db_path, rows, cols, mode, operations, seed):
+    """Run pick lists against a shared database from one process"""
+    quiet_logging()
+    db = database.InventoryDB(rows, cols, db_path)
+    rng = random.Random(seed)
+    completed = 0
+    start_time = time.perf_counter()
+    for _ in range(operations):
+        picks = Counter(rng.randrange(2, rows * cols) for _ in range(3))
+        if mode == "reserve":
+            reservation_id = db.reserve_stock(picks)
+            db.commit_reservation(reservation_id)
+        else:
+            # Check-then-act: read every quantity, then decrement unit by unit
+            if all(db.get_quantity(item_id) >= amount for item_id, amount in picks.items()):
+                for item_id, amount in picks.items():
+                    for _ in range(amount):
+                        db.decrement_quantity(item_id)
+        completed += 1
+    return completed, time.perf_counter() - start_time, db.lock_stats
+
+def bench_reservations(args):
+    """Pick list throughput with several processes sharing one database file"""
+    db_path = os.path.join(tempfile.gettempdir(), f"stockbot_reservations_{os.getpid()}.db")
+    try:
+        db = database.InventoryDB(args.rows, args.cols, db_path)
+        db.populate_random_data()
+        # Plenty of stock so every pick list can be met
+        for item_id in range(1, args.rows * args.cols + 1):
+            db.update_quantity(item_id, 1000000)
+
+        for mode in ("check-then-act", "reserve"):
+            jobs = [(db_path, args.rows, args.cols, mode, args.operations, args.seed + worker)
+                    for worker in range(args.processes)]
+            start_time = time.perf_counter()
+            with multiprocessing.Pool(args.processes) as pool:
+                results = pool.starmap(_reservation_worker, jobs)
+            elapsed = time.perf_counter() - start_time
+
+            completed = sum(result[0] for result in results)
+            print(f"{mode}: {completed} pick lists from {args.processes} processes in {elapsed:.2f} s "
+                  f"({completed / elapsed:.0f} per second)")
+            if mode == "reserve":
+                transactions = sum(result[2]['transactions'] for result in results)
+                wait_total = sum(result[2]['lock_wait_total'] for result in results)
+                wait_max = max(result[2]['lock_wait_max'] for result in results)
+                retries = sum(result[2]['busy_retries'] for result in results)
+                print(f"  {transactions} transactions, mean lock wait {wait_total / transactions * 1000:.2f} ms, "
+                      f"max {wait_max * 1000:.1f} ms, {retries} busy retries")
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+def bench_backends(args):
+    """Run the same stock workload against every storage backend"""
+    rng = random.Random(args.seed)
+    total = args.rows * args.cols
+    item_ids = [rng.randint(1, total) for _ in range(args.operations)]
+    pick_lists = [Counter(rng.choices(range(1, total + 1), k=3)) for _ in range(args.operations // 10)]
+    db_path = os.path.join(tempfile.gettempdir(), f"stockbot_backends_{os.getpid()}.db")
+
+    print(f"{'backend':>8} {'populate':>10} {'get':>10} {'update':>10} {'decrement':>10} "
+          f"{'position':>10} {'reserve':>10}   (operations per second)")
+    try:
+        for backend in database.BACKENDS:
+            db = database.open_inventory(args.rows, args.cols, backend, db_path)
+            timings = {}
+
+            start_time = time.perf_counter()
+            db.populate_random_data()
+            timings['populate'] = 1 / (time.perf_counter() - start_time)
+
+            for name, operation in (
+                ('get', db.get_quantity),
+                ('update', lambda item_id: db.update_quantity(item_id, 1000)),
+                ('decrement', db.decrement_quantity),
+                ('position', db.get_position),
+            ):
+                start_time = time.perf_counter()
+                for item_id in item_ids:
+                    operation(item_id)
+                timings[name] = len(item_ids) / (time.perf_counter() - start_time)
+
+            start_time = time.perf_counter()
+            for picks in pick_lists:
+                db.release_reservation(db.reserve_stock(picks))
+            timings['reserve'] = len(pick_lists) / (time.perf_counter() - start_time)
+
+            db.close()
+            print(f"{backend:>8} " + " ".join(f"{timings[name]:10.0f}" for name in
+                                              ('populate', 'get', 'update', 'decrement', 'position', 'reserve')))
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+async def _http_request(reader, writer, method, path, payload=None):
+    """Send one request on a keep-alive connection and return (status, body)"""
+    body = json.dumps(payload).encode() if payload is not None else b''
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode().partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+async def _load_test(args, port):
+    """Drive the service with concurrent clients and collect latencies per request type"""
+    rng = random.Random(args.seed)
+    size = args.rows * args.cols
+    # A handful of standard kits, so identical route requests arrive together
+    kits = [sorted(rng.sample(range(2, size), args.picks)) for _ in range(args.kits)]
+    latencies = {'route': [], 'stock': []}
+    failures = Counter()
+    remaining = [args.requests]
+
+    async def client():
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                if rng.random() < args.route_share:
+                    kind, method, path, payload = 'route', 'POST', '/route', {'points': rng.choice(kits)}
+                else:
+                    kind, method, path, payload = 'stock', 'GET', f"/stock/{rng.randrange(1, size + 1)}", None
+                start_time = time.perf_counter()
+                status, _ = await _http_request(reader, writer, method, path, payload)
+                latencies[kind].append(time.perf_counter() - start_time)
+                if status != 200:
+                    failures[status] += 1
+        finally:
+            writer.close()
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start_time
+
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    _, stats = await _http_request(reader, writer, 'GET', '/stats')
+    writer.close()
+    return latencies, elapsed, failures, stats
+
+def bench_server(args):
+    """Start the routing service on a free port and report latency percentiles and throughput"""
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    db_path = os.path.join(tempfile.gettempdir(), f"stockbot_server_{os.getpid()}.db")
+    server_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py")
+    process = subprocess.Popen([sys.executable, server_script, "--rows", str(args.rows), "--cols", str(args.cols),
+                                "--db", db_path, "--port", str(port)], cwd=tempfile.gettempdir())
+    try:
+        # Wait for the service to accept connections
+        deadline = time.time() + 30
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                if time.time() > deadline or process.poll() is not None:
+                    raise RuntimeError("Routing service did not start")
+                time.sleep(0.1)
+
+        latencies, elapsed, failures, stats = asyncio.run(_load_test(args, port))
+        total = sum(len(values) for values in latencies.values())
+        print(f"{total} requests from {args.concurrency} clients in {elapsed:.2f} s "
+              f"({total / elapsed:.0f} requests per second)")
+        for kind, values in latencies.items():
+            if values:
+                print(f"{kind:>6}: p50 {percentile(values, 0.5) * 1000:.2f} ms, "
+                      f"p99 {percentile(values, 0.99) * 1000:.2f} ms ({len(values)} requests)")
+        print(f"Route searches: {stats['service']['route_searches']}, coalesced: {stats['service']['coalesced']}")
+        if failures:
+            print(f"Non-200 responses: {dict(failures)}")
+    finally:
+        process.terminate()
+        process.wait()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+def main():
+    parser = argparse.ArgumentParser(description="StockBot benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    table_parser = subparsers.add_parser("distance-table", help="memory-mapped distance table build and lookup")
+    table_parser.add_argument("--rows", type=int, default=1000)
+    table_parser.add_argument("--cols", type=int, default=1000)
+    table_parser.add_argument("--density", type=float, default=0.1)
+    table_parser.add_argument("--cells", type=int, default=50)
+    table_parser.add_argument("--lookups", type=int, default=100000)
+    table_parser.add_argument("--seed", type=int, default=1)
+    table_parser.set_defaults(func=bench_distance_table)
+
+    alt_parser = subparsers.add_parser("alt", help="A* node expansions with Manhattan vs ALT heuristics")
+    alt_parser.add_argument("--rows", type=int, default=60)
+    alt_parser.add_argument("--cols", type=int, default=60)
+    alt_parser.add_argument("--landmarks", type=int, default=4)
+    alt_parser.add_argument("--queries", type=int, default=200)
+    alt_parser.add_argument("--seed", type=int, default=1)
+    alt_parser.set_defaults(func=bench_alt)
+
+    turns_parser = subparsers.add_parser("turns", help="BFS vs turn-penalised routes: steps, turns and travel time")
+    turns_parser.add_argument("--rows", type=int, default=60)
+    turns_parser.add_argument("--cols", type=int, default=60)
+    turns_parser.add_argument("--density", type=float, default=0.2)
+    turns_parser.add_argument("--turn-cost", type=int, default=spa.DEFAULT_TURN_COST)
+    turns_parser.add_argument("--queries", type=int, default=100)
+    turns_parser.add_argument("--seed", type=int, default=1)
+    turns_parser.set_defaults(func=bench_turns)
+
+    trips_parser = subparsers.add_parser("trips", help="capacitated multi-trip planning for one large order")
+    trips_parser.add_argument("--rows", type=int, default=60)
+    trips_parser.add_argument("--cols", type=int, default=60)
+    trips_parser.add_argument("--density", type=float, default=0.1)
+    trips_parser.add_argument("--picks", type=int, default=300, help="distinct bins in the order")
+    trips_parser.add_argument("--max-units", type=int, default=4, help="most units taken from one bin")
+    trips_parser.add_argument("--capacity", type=int, default=20, help="units a bot carries per trip")
+    trips_parser.add_argument("--budget", type=float, default=2.0, help="seconds for savings and 2-opt")
+    trips_parser.add_argument("--seed", type=int, default=1)
+    trips_parser.set_defaults(func=bench_trips)
+
+    slotting_parser = subparsers.add_parser("slotting", help="re-slot busy items towards the docks from pick history")
+    slotting_parser.add_argument("--rows", type=int, default=100)
+    slotting_parser.add_argument("--cols", type=int, default=100)
+    slotting_parser.add_argument("--density", type=float, default=0.1)
+    slotting_parser.add_argument("--picks", type=int, default=20000, help="units in the pick history")
+    slotting_parser.add_argument("--max-moves", type=int, help="limit the plan to this many swaps")
+    slotting_parser.add_argument("--seed", type=int, default=1)
+    slotting_parser.set_defaults(func=bench_slotting)
+
+    skus_parser = subparsers.add_parser("skus", help="resolve orders against a large SKU catalogue")
+    skus_parser.add_argument("--rows", type=int, default=100)
+    skus_parser.add_argument("--cols", type=int, default=100)
+    skus_parser.add_argument("--density", type=float, default=0.1)
+    skus_parser.add_argument("--skus", type=int, default=1000000, help="SKUs in the catalogue")
+    skus_parser.add_argument("--max-locations", type=int, default=3, help="most locations holding one SKU")
+    skus_parser.add_argument("--orders", type=int, default=2000)
+    skus_parser.add_argument("--lines", type=int, default=10, help="SKUs per order")
+    skus_parser.add_argument("--batch", type=int, default=100, help="orders resolved together")
+    skus_parser.add_argument("--seed", type=int, default=1)
+    skus_parser.set_defaults(func=bench_skus)
+
+    ga_parser = subparsers.add_parser("ga", help="pure-Python vs numpy point order optimisation")
+    ga_parser.add_argument("--rows", type=int, default=60)
+    ga_parser.add_argument("--cols", type=int, default=60)
+    ga_parser.add_argument("--density", type=float, default=0.1)
+    ga_parser.add_argument("--points", type=int, default=10)
+    ga_parser.add_argument("--budget", type=float, default=2.0, help="seconds per optimisation")
+    ga_parser.add_argument("--seed", type=int, default=1)
+    ga_parser.set_defaults(func=bench_ga)
+
+    reservation_parser = subparsers.add_parser("reservations", help="multi-process stock reservation throughput")
+    reservation_parser.add_argument("--rows", type=int, default=20)
+    reservation_parser.add_argument("--cols", type=int, default=20)
+    reservation_parser.add_argument("--processes", type=int, default=4)
+    reservation_parser.add_argument("--operations", type=int, default=200)
+    reservation_parser.add_argument("--seed", type=int, default=1)
+    reservation_parser.set_defaults(func=bench_reservations)
+
+    backend_parser = subparsers.add_parser("backends", help="same stock workload on every storage backend")
+    backend_parser.add_argument("--rows", type=int, default=20)
+    backend_parser.add_argument("--cols", type=int, default=20)
+    backend_parser.add_argument("--operations", type=int, default=2000)
+    backend_parser.add_argument("--seed", type=int, default=1)
+    backend_parser.set_defaults(func=bench_backends)
+
+    server_parser = subparsers.add_parser("server", help="load test the asyncio routing service")
+    server_parser.add_argument("--rows", type=int, default=20)
+    server_parser.add_argument("--cols", type=int, default=20)
+    server_parser.add_argument("--requests", type=int, default=2000)
+    server_parser.add_argument("--concurrency", type=int, default=32)
+    server_parser.add_argument("--route-share", type=float, default=0.5, help="fraction of requests that are routes")
+    server_parser.add_argument("--kits", type=int, default=5, help="distinct pick lists to draw routes from")
+    server_parser.add_argument("--picks", type=int, default=4, help="positions per pick list")
+    server_parser.add_argument("--seed", type=int, default=1)
+    server_parser.set_defaults(func=bench_server)
+
+    args = parser.parse_args()
+    quiet_logging()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,172 @@
 import sqlite3
 import random
 import logging
+import queue  # For the connection pool
+import sys
+import threading
+import time
+from array import array  # Compact snapshot storage
+from collections import Counter
+from contextlib import contextmanager
+import spa  # For the layout distance table format
 
 # Get the main logger
 logger = logging.getLogger(__name__)
 
-class InventoryDB:
+# Quantities below this count as low stock (matches the GUI legend)
+LOW_STOCK_THRESHOLD = 2
+
+# SQLite path for a database held entirely in memory
+MEMORY_DB = ":memory:"
+
+# Storage backends accepted by open_inventory
+BACKENDS = ("sqlite", "memory", "array")
+
+class InsufficientStockError(ValueError):
+    """Raised when a reservation cannot be met; item_ids lists the items that were short"""
+    def __init__(self, item_ids):
+        self.item_ids = list(item_ids)
+        super().__init__(f"Not enough stock for ItemIDs {', '.join(map(str, self.item_ids))}")
+
+class ConnectionPool:
+    """Fixed-size pool of SQLite connections that can be shared between threads"""
+    def __init__(self, db_path, size=4, timeout=5.0):
+        self.size = size
+        self._connections = queue.Queue()
+        for _ in range(size):
+            self._connections.put(sqlite3.connect(db_path, timeout=timeout, isolation_level=None,
+                                                  check_same_thread=False))
+        logger.info(f"Opened connection pool of {size} connections to {db_path}")
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection, waiting if all of them are in use"""
+        conn = self._connections.get()
+        try:
+            yield conn
+        finally:
+            self._connections.put(conn)
+
+    def close(self):
+        """Close every connection in the pool"""
+        for _ in range(self.size):
+            self._connections.get().close()
+
+class InventoryBackend:
+    """
+    Shared behaviour for stock storage backends
+    
+    Every backend offers the same API, so callers can be given whichever one
+    suits the deployment by open_inventory:
+    
+    Stock: populate_random_data, validate_item_id, get_quantity,
+        get_quantities, get_all_quantities, get_low_stock, update_quantity,
+        decrement_quantity, decrement_quantities, restock, swap_quantities
+    Reservations: reserve_stock, commit_reservation, release_reservation
+    Journal: take_snapshot, restore_from_journal, get_route_movements,
+        get_pick_counts
+    SKUs: add_skus, set_sku_stock, get_sku_ids, get_sku_locations,
+        get_location_skus, take_sku_stock
+    Layout and routes: get_position, save_layout, load_layout,
+        save_route_cache, load_route_cache
+    Lifecycle: close
+    """
     def __init__(self, rows, cols):
-        """Initialize database with grid dimensions"""
         self.rows = rows
         self.cols = cols
-        self.db_path = "inventory.db"
+        # Callbacks told about stock changes as {item_id: new_quantity}
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """Call callback({item_id: new_quantity}) after every committed stock change"""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        """Stop sending stock changes to callback"""
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _notify(self, changes):
+        """Send committed stock changes to every listener"""
+        if not changes:
+            return
+        for callback in list(self._listeners):
+            try:
+                callback(changes)
+            except Exception as e:
+                logger.error(f"Error in stock change listener: {str(e)}")
+
+    def _check_quantity(self, quantity):
+        """Raise TypeError or ValueError unless quantity is a valid stock level"""
+        if not isinstance(quantity, int):
+            raise TypeError("Quantity must be an integer")
+        if quantity < 0:
+            raise ValueError("Quantity cannot be negative")
+
+    def _check_sku_stock(self, stock):
+        """Yield (sku_id, location_id, quantity) rows, raising ValueError at the first one outside the grid or negative"""
+        count = self.rows * self.cols
+        for sku_id, location_id, quantity in stock:
+            if not (1 <= location_id <= count):
+                raise ValueError(f"LocationID {location_id} is outside the {self.rows}x{self.cols} grid")
+            if quantity < 0:
+                raise ValueError(f"Quantity for SKU {sku_id} at {location_id} cannot be negative")
+            yield sku_id, location_id, quantity
+
+    def _reject_sku_held(self, held):
+        """Raise ValueError if any item ID in held is a bin holding SKU stock, whose total only its SKU rows may change"""
+        if held:
+            raise ValueError(f"ItemIDs {sorted(held)} hold SKU stock; change them with set_sku_stock or take_sku_stock")
+
+    def _sku_pick_entries(self, picks, taken, totals):
+        """Journal entries for the (sku_id, location_id) keys taken, each with its location's quantity after that pick"""
+        running = dict(totals)
+        entries = []
+        for sku_id, location_id in reversed(taken):
+            if location_id in running:
+                entries.append((location_id, -picks[sku_id, location_id], running[location_id], 'pick', None, sku_id))
+                running[location_id] += picks[sku_id, location_id]
+        entries.reverse()
+        return entries
+
+class InventoryDB(InventoryBackend):
+    def __init__(self, rows, cols, db_path="inventory.db", pool_size=0):
+        """
+        Initialize database with grid dimensions; pool_size > 0 shares a connection pool
+        
+        With db_path=":memory:" the database lives in memory on a single shared
+        connection and is discarded by close().
+        """
+        super().__init__(rows, cols)
+        self.db_path = db_path
+        # Seconds SQLite waits for a lock before reporting the database as busy
+        self.lock_timeout = 5.0
+        # Write lock contention metrics for reservation transactions
+        self.lock_stats = {
+            'transactions': 0,
+            'lock_wait_total': 0.0,
+            'lock_wait_max': 0.0,
+            'busy_retries': 0,
+        }
+        self._stats_lock = threading.Lock()
+        # A snapshot is taken automatically after this many journal entries
+        self.snapshot_interval = 1000
+        self._entries_since_snapshot = 0
+        self._journal_lock = threading.Lock()
         logger.info(f"Initializing database with dimensions {rows}x{cols}")
+        if db_path == MEMORY_DB:
+            # Every connection to ":memory:" is a separate database, so keep exactly one open
+            pool_size = 1
+        self.pool = ConnectionPool(db_path, pool_size, self.lock_timeout) if pool_size else None
         self._init_database()
     
     def _init_database(self):
         """Create the database and required tables if they don't exist"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._raw_connection() as conn:
                 cursor = conn.cursor()
+                # Write-ahead logging lets readers carry on while another process holds the write lock
+                cursor.execute('PRAGMA journal_mode=WAL')
                 cursor.execute('''
                     CREATE TABLE IF NOT EXISTS items (
                         ItemID INTEGER PRIMARY KEY,
@@ -28,16 +176,179 @@ class InventoryDB:
                         UNIQUE(row, col)
                     )
                 ''')
+                # Covering index so low-stock queries scan only the matching rows
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_items_quantity ON items (Quantity, row, col)')
+                # Saved warehouse layout (single row) and its precomputed distance tables
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS layout (
+                        LayoutID INTEGER PRIMARY KEY CHECK (LayoutID = 1),
+                        rows INTEGER NOT NULL,
+                        cols INTEGER NOT NULL,
+                        ObstacleMask BLOB NOT NULL,
+                        LayoutHash TEXT NOT NULL
+                    )
+                ''')
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS layout_distances (
+                        SourceCell INTEGER PRIMARY KEY,
+                        Distances BLOB NOT NULL
+                    )
+                ''')
+                # Append-only record of every stock movement, and compacted snapshots of all quantities
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS stock_journal (
+                        Seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                        Timestamp REAL NOT NULL,
+                        ItemID INTEGER NOT NULL,
+                        Delta INTEGER NOT NULL,
+                        Quantity INTEGER NOT NULL,
+                        Reason TEXT NOT NULL,
+                        RouteID INTEGER,
+                        SkuID INTEGER
+                    )
+                ''')
+                # Journals created before SKU stock existed have no SkuID column
+                cursor.execute('PRAGMA table_info(stock_journal)')
+                if 'SkuID' not in {column[1] for column in cursor.fetchall()}:
+                    cursor.execute('ALTER TABLE stock_journal ADD COLUMN SkuID INTEGER')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_journal_route ON stock_journal (RouteID) WHERE RouteID IS NOT NULL')
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS stock_snapshots (
+                        SnapshotID INTEGER PRIMARY KEY AUTOINCREMENT,
+                        Created REAL NOT NULL,
+                        LastSeq INTEGER NOT NULL,
+                        rows INTEGER NOT NULL,
+                        cols INTEGER NOT NULL,
+                        Quantities BLOB NOT NULL
+                    )
+                ''')
+                # Routes kept by spa.RouteCache so repeated pick lists survive a restart
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS route_cache (
+                        RouteID INTEGER PRIMARY KEY AUTOINCREMENT,
+                        StartCell INTEGER NOT NULL,
+                        EndCell INTEGER NOT NULL,
+                        Cells BLOB NOT NULL,
+                        Optimised INTEGER NOT NULL,
+                        Algorithm TEXT NOT NULL,
+                        LayoutHash TEXT NOT NULL,
+                        Created REAL NOT NULL,
+                        PointOrder BLOB NOT NULL,
+                        Path BLOB NOT NULL
+                    )
+                ''')
+                # Stock held for pick lists that are being routed
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS reservations (
+                        ReservationID INTEGER PRIMARY KEY AUTOINCREMENT,
+                        Created REAL NOT NULL
+                    )
+                ''')
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS reservation_items (
+                        ReservationID INTEGER NOT NULL REFERENCES reservations(ReservationID),
+                        ItemID INTEGER NOT NULL,
+                        Quantity INTEGER NOT NULL,
+                        PRIMARY KEY (ReservationID, ItemID)
+                    )
+                ''')
+                # Catalogue of SKUs, independent of where they are stored
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS skus (
+                        SkuID INTEGER PRIMARY KEY,
+                        Code TEXT NOT NULL UNIQUE,
+                        Description TEXT
+                    )
+                ''')
+                # Stock of each SKU per location; locations are the bins in items (LocationID = ItemID),
+                # so a bin can hold many SKUs and a SKU can sit in many bins. The items Quantity of a
+                # bin holding SKUs is kept equal to their total by every SKU stock change
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS sku_stock (
+                        SkuID INTEGER NOT NULL REFERENCES skus(SkuID),
+                        LocationID INTEGER NOT NULL,
+                        Quantity INTEGER NOT NULL CHECK (Quantity >= 0),
+                        PRIMARY KEY (SkuID, LocationID)
+                    ) WITHOUT ROWID
+                ''')
+                # The primary key serves lookups by SKU; this one serves "what is in this bin"
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_sku_stock_location ON sku_stock (LocationID, SkuID)')
                 conn.commit()
                 logger.info("Database table created successfully")
         except Exception as e:
             logger.error(f"Error creating database: {str(e)}")
             raise
     
+    @contextmanager
+    def _raw_connection(self):
+        """Yields a connection with no transaction, from the pool when one is configured"""
+        if self.pool is not None:
+            with self.pool.connection() as conn:
+                yield conn
+        else:
+            conn = sqlite3.connect(self.db_path, timeout=self.lock_timeout)
+            try:
+                yield conn
+            finally:
+                conn.close()
+
+    @contextmanager
+    def _connect(self, immediate=False, retries=3):
+        """
+        Yields a connection inside a transaction, committed when the block exits
+        normally and rolled back on error
+        
+        Connections come from the pool when one is configured. With immediate=True
+        the write lock is taken up front (BEGIN IMMEDIATE) and the time spent
+        waiting for it is recorded in lock_stats.
+        """
+        if self.pool is not None:
+            with self.pool.connection() as conn:
+                with self._transaction(conn, immediate, retries):
+                    yield conn
+        else:
+            conn = sqlite3.connect(self.db_path, timeout=self.lock_timeout, isolation_level=None)
+            try:
+                with self._transaction(conn, immediate, retries):
+                    yield conn
+            finally:
+                conn.close()
+
+    @contextmanager
+    def _transaction(self, conn, immediate, retries):
+        """Run a BEGIN ... COMMIT/ROLLBACK block on an autocommit connection"""
+        if immediate:
+            wait_start = time.perf_counter()
+            for attempt in range(retries + 1):
+                try:
+                    conn.execute('BEGIN IMMEDIATE')
+                    break
+                except sqlite3.OperationalError as e:
+                    if 'locked' not in str(e) or attempt == retries:
+                        with self._stats_lock:
+                            self.lock_stats['busy_retries'] += attempt
+                        raise
+            wait = time.perf_counter() - wait_start
+            # Pool workers in the server share the counters, so they are updated under a lock
+            with self._stats_lock:
+                self.lock_stats['busy_retries'] += attempt
+                self.lock_stats['transactions'] += 1
+                self.lock_stats['lock_wait_total'] += wait
+                self.lock_stats['lock_wait_max'] = max(self.lock_stats['lock_wait_max'], wait)
+        else:
+            conn.execute('BEGIN')
+        
+        try:
+            yield
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
     def populate_random_data(self):
         """Fill the database with random quantities for each grid position"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute('DELETE FROM items')
                 logger.info("Cleared existing inventory data")
@@ -50,8 +361,14 @@ class InventoryDB:
                             INSERT INTO items (ItemID, row, col, Quantity)
                             VALUES (?, ?, ?, ?)
                         ''', (item_id, row, col, quantity))
-                conn.commit()
-                logger.info(f"Populated database with random data for {self.rows*self.cols} positions")
+                # Bins holding SKUs keep the total of their SKU rows
+                cursor.execute('SELECT DISTINCT LocationID FROM sku_stock')
+                self._sync_locations(cursor, [location_id for location_id, in cursor.fetchall()])
+                changes = self._read_quantities(cursor, range(1, self.rows * self.cols + 1))
+            logger.info(f"Populated database with random data for {self.rows*self.cols} positions")
+            # Record the new baseline so a restart can restore it
+            self.take_snapshot()
+            self._notify(changes)
         except Exception as e:
             logger.error(f"Error populating database: {str(e)}")
             raise
@@ -62,7 +379,7 @@ class InventoryDB:
         if not (1 <= item_id <= max_id):
             raise ValueError(f"ItemID must be between 1 and {max_id}")
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT 1 FROM items WHERE ItemID = ?', (item_id,))
             if not cursor.fetchone():
@@ -73,7 +390,7 @@ class InventoryDB:
         """Get quantity for a specific item"""
         try:
             self.validate_item_id(item_id)
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute('SELECT Quantity FROM items WHERE ItemID = ?', (item_id,))
                 result = cursor.fetchone()
@@ -88,21 +405,25 @@ class InventoryDB:
         """Update quantity for a specific item"""
         try:
             self.validate_item_id(item_id)
-            if not isinstance(new_quantity, int):
-                raise TypeError("Quantity must be an integer")
-            if new_quantity < 0:
-                raise ValueError("Quantity cannot be negative")
+            self._check_quantity(new_quantity)
                 
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
+                self._reject_sku_held(self._sku_held(cursor, [item_id]))
+                old_quantity = self._read_quantities(cursor, [item_id]).get(item_id, 0)
                 cursor.execute('''
                     UPDATE items 
                     SET Quantity = ?
                     WHERE ItemID = ?
                 ''', (new_quantity, item_id))
-                conn.commit()
-                logger.info(f"Updated quantity to {new_quantity} for ItemID {item_id}")
-                return cursor.rowcount > 0
+                updated = cursor.rowcount > 0
+                if updated:
+                    self._journal(cursor, [(item_id, new_quantity - old_quantity, new_quantity, 'update', None)])
+            logger.info(f"Updated quantity to {new_quantity} for ItemID {item_id}")
+            if updated:
+                self._journal_written(1)
+                self._notify({item_id: new_quantity})
+            return updated
         except Exception as e:
             logger.error(f"Error updating quantity for ItemID {item_id}: {str(e)}")
             raise
@@ -111,33 +432,1148 @@ class InventoryDB:
         """Decrement quantity by 1 for a specific item"""
         try:
             self.validate_item_id(item_id)
-            current_qty = self.get_quantity(item_id)
-            if current_qty is None or current_qty <= 0:
-                logger.warning(f"Cannot decrement: ItemID {item_id} has no stock")
-                return False
-                
-            with sqlite3.connect(self.db_path) as conn:
+            # A single conditional UPDATE checks and takes the stock atomically
+            with self._connect() as conn:
                 cursor = conn.cursor()
+                self._reject_sku_held(self._sku_held(cursor, [item_id]))
                 cursor.execute('''
                     UPDATE items 
                     SET Quantity = Quantity - 1
                     WHERE ItemID = ? AND Quantity > 0
                 ''', (item_id,))
-                conn.commit()
-                logger.info(f"Decremented quantity for ItemID {item_id}")
-                return cursor.rowcount > 0
+                if cursor.rowcount == 0:
+                    logger.warning(f"Cannot decrement: ItemID {item_id} has no stock")
+                    return False
+                changes = self._read_quantities(cursor, [item_id])
+                self._journal(cursor, [(item_id, -1, changes[item_id], 'pick', None)])
+            logger.info(f"Decremented quantity for ItemID {item_id}")
+            self._journal_written(1)
+            self._notify(changes)
+            return True
         except Exception as e:
             logger.error(f"Error decrementing quantity for ItemID {item_id}: {str(e)}")
             raise
 
+    def get_quantities(self, item_ids):
+        """Get quantities for many items with one bulk read, returned as {item_id: quantity}"""
+        try:
+            with self._connect() as conn:
+                quantities = self._read_quantities(conn.cursor(), item_ids)
+                logger.debug(f"Retrieved quantities for {len(quantities)} items")
+                return quantities
+        except Exception as e:
+            logger.error(f"Error getting quantities: {str(e)}")
+            raise
+
+    def get_all_quantities(self):
+        """Return every quantity from one query as an array indexed by ItemID - 1 (0 for missing items)"""
+        try:
+            quantities = array('I', [0]) * (self.rows * self.cols)
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT ItemID, Quantity FROM items')
+                for item_id, quantity in cursor:
+                    if 1 <= item_id <= len(quantities):
+                        quantities[item_id - 1] = quantity
+            logger.debug(f"Retrieved all {len(quantities)} quantities")
+            return quantities
+        except Exception as e:
+            logger.error(f"Error getting all quantities: {str(e)}")
+            raise
+
+    def _read_quantities(self, cursor, item_ids):
+        """Read {item_id: quantity} for the given items using an open cursor"""
+        item_ids = list(set(item_ids))
+        quantities = {}
+        # Query in chunks to stay under SQLite's bound parameter limit
+        for i in range(0, len(item_ids), 900):
+            chunk = item_ids[i:i + 900]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f'SELECT ItemID, Quantity FROM items WHERE ItemID IN ({placeholders})', chunk)
+            quantities.update(cursor.fetchall())
+        return quantities
+
+    def _sku_held(self, cursor, item_ids):
+        """Item IDs among item_ids whose bins hold SKU stock, using an open cursor"""
+        item_ids = list(set(item_ids))
+        held = set()
+        for i in range(0, len(item_ids), 900):
+            chunk = item_ids[i:i + 900]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f'SELECT DISTINCT LocationID FROM sku_stock WHERE LocationID IN ({placeholders})', chunk)
+            held.update(location_id for location_id, in cursor.fetchall())
+        return held
+
+    def get_low_stock(self, threshold=LOW_STOCK_THRESHOLD):
+        """
+        Return every position with quantity below threshold in one indexed query
+        
+        Results are (item_id, row, col, quantity) tuples, lowest stock first.
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT ItemID, row, col, Quantity FROM items
+                    WHERE Quantity < ?
+                    ORDER BY Quantity
+                ''', (threshold,))
+                low_stock = cursor.fetchall()
+                logger.debug(f"Found {len(low_stock)} positions below {threshold}")
+                return low_stock
+        except Exception as e:
+            logger.error(f"Error finding low stock: {str(e)}")
+            raise
+
+    def _journal(self, cursor, entries):
+        """
+        Append stock movements to the journal as (item_id, delta, quantity, reason, route_id[, sku_id])
+        
+        Rows are written with the caller's cursor, so they commit or roll back
+        in the same transaction as the stock change they record; a crash can
+        never leave items ahead of the journal. Call _journal_written once the
+        transaction has committed.
+        """
+        timestamp = time.time()
+        cursor.executemany('''
+            INSERT INTO stock_journal (Timestamp, ItemID, Delta, Quantity, Reason, RouteID, SkuID)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [(timestamp,) + tuple(entry) + (None,) * (6 - len(entry)) for entry in entries])
+
+    def _journal_written(self, count):
+        """Count committed journal entries, taking a snapshot every snapshot_interval entries"""
+        with self._journal_lock:
+            self._entries_since_snapshot += count
+            due = self._entries_since_snapshot >= self.snapshot_interval
+            if due:
+                self._entries_since_snapshot = 0
+        if due:
+            self.take_snapshot()
+
+    def take_snapshot(self, prune_journal=False):
+        """
+        Store every quantity as one compact snapshot covering the journal so far
+        
+        With prune_journal=True the journal entries covered by the snapshot are
+        deleted; otherwise they are kept as the audit trail. Only the two most
+        recent snapshots are kept.
+        """
+        try:
+            with self._connect(immediate=True) as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT COALESCE(MAX(Seq), 0) FROM stock_journal')
+                last_seq = cursor.fetchone()[0]
+                cursor.execute('SELECT ItemID, Quantity FROM items')
+                quantities = array('I', [0]) * (self.rows * self.cols)
+                for item_id, quantity in cursor.fetchall():
+                    if 1 <= item_id <= len(quantities):
+                        quantities[item_id - 1] = quantity
+                if sys.byteorder != 'little':
+                    quantities.byteswap()
+                cursor.execute('''
+                    INSERT INTO stock_snapshots (Created, LastSeq, rows, cols, Quantities)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (time.time(), last_seq, self.rows, self.cols, quantities.tobytes()))
+                snapshot_id = cursor.lastrowid
+                cursor.execute('DELETE FROM stock_snapshots WHERE SnapshotID < ? - 1', (snapshot_id,))
+                if prune_journal:
+                    cursor.execute('DELETE FROM stock_journal WHERE Seq <= ?', (last_seq,))
+            with self._journal_lock:
+                self._entries_since_snapshot = 0
+            logger.info(f"Took stock snapshot {snapshot_id} at journal position {last_seq}")
+            return snapshot_id
+        except Exception as e:
+            logger.error(f"Error taking stock snapshot: {str(e)}")
+            raise
+
+    def restore_from_journal(self):
+        """
+        Rebuild the items table from the latest snapshot plus the journal after it
+        
+        Every stock change is journaled in its own transaction, so an items
+        table holding exactly one row per cell of the current grid is already
+        up to date and is left alone; a missing, partial or differently shaped
+        one is rebuilt. Returns True if the stock is in place, False if it is
+        not and there is no snapshot for the current grid size.
+        """
+        try:
+            with self._connect(immediate=True) as conn:
+                cursor = conn.cursor()
+                # A table saved for another grid can have the same row count, so check every cell fits this one
+                cursor.execute('''
+                    SELECT COUNT(*), COALESCE(SUM(row < ? AND col < ? AND ItemID = row * ? + col + 1), 0)
+                    FROM items
+                ''', (self.rows, self.cols, self.cols))
+                count, matching = cursor.fetchone()
+                if count == matching == self.rows * self.cols:
+                    logger.info("Stock table is complete, nothing to restore")
+                    return True
+                cursor.execute('''
+                    SELECT LastSeq, Quantities FROM stock_snapshots
+                    WHERE rows = ? AND cols = ?
+                    ORDER BY SnapshotID DESC LIMIT 1
+                ''', (self.rows, self.cols))
+                result = cursor.fetchone()
+                if not result:
+                    return False
+                last_seq, blob = result
+                quantities = array('I')
+                quantities.frombytes(blob)
+                if sys.byteorder != 'little':
+                    quantities.byteswap()
+                
+                # Replay the journal tail; only the latest quantity of each item matters
+                cursor.execute('SELECT ItemID, Quantity FROM stock_journal WHERE Seq > ? ORDER BY Seq', (last_seq,))
+                replayed = 0
+                for item_id, quantity in cursor.fetchall():
+                    if 1 <= item_id <= len(quantities):
+                        quantities[item_id - 1] = quantity
+                        replayed += 1
+                
+                cursor.execute('DELETE FROM items')
+                cursor.executemany('''
+                    INSERT INTO items (ItemID, row, col, Quantity)
+                    VALUES (?, ?, ?, ?)
+                ''', [(index + 1, index // self.cols, index % self.cols, quantity)
+                      for index, quantity in enumerate(quantities)])
+            logger.info(f"Restored stock from snapshot at journal position {last_seq} plus {replayed} journal entries")
+            self._notify({index + 1: quantity for index, quantity in enumerate(quantities)})
+            return True
+        except Exception as e:
+            logger.error(f"Error restoring stock: {str(e)}")
+            raise
+
+    def save_route_cache(self, cache):
+        """Replace the stored routes with the contents of a spa.RouteCache"""
+        try:
+            rows = []
+            for (start, cells, end, optimised, algorithm, layout_hash), created, order, path in cache.entries():
+                rows.append((start[0] * self.cols + start[1], end[0] * self.cols + end[1],
+                             _pack_cells(cells, self.cols), int(optimised), algorithm, layout_hash, created,
+                             _pack_cells(order, self.cols), path.to_bytes()))
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute('DELETE FROM route_cache')
+                cursor.executemany('''
+                    INSERT INTO route_cache (StartCell, EndCell, Cells, Optimised, Algorithm, LayoutHash,
+                                             Created, PointOrder, Path)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', rows)
+            logger.info(f"Saved {len(rows)} cached routes")
+            return len(rows)
+        except Exception as e:
+            logger.error(f"Error saving route cache: {str(e)}")
+            raise
+
+    def load_route_cache(self, cache):
+        """Fill a spa.RouteCache with the stored routes, oldest first"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT StartCell, EndCell, Cells, Optimised, Algorithm, LayoutHash, Created, PointOrder, Path
+                    FROM route_cache ORDER BY RouteID
+                ''')
+                results = cursor.fetchall()
+            for start, end, cells, optimised, algorithm, layout_hash, created, order, path in results:
+                key = (divmod(start, self.cols), tuple(_unpack_cells(cells, self.cols)), divmod(end, self.cols),
+                       bool(optimised), algorithm, layout_hash)
+                cache.put(key, _unpack_cells(order, self.cols), spa.Route.from_bytes(path, self.cols), created=created)
+            logger.info(f"Loaded {len(results)} cached routes")
+            return len(results)
+        except Exception as e:
+            logger.error(f"Error loading route cache: {str(e)}")
+            raise
+
+    def get_route_movements(self, route_id):
+        """Audit trail for one route: journal entries as (timestamp, item_id, delta, reason)"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT Timestamp, ItemID, Delta, Reason FROM stock_journal
+                WHERE RouteID = ? ORDER BY Seq
+            ''', (route_id,))
+            return cursor.fetchall()
+
+    def get_pick_counts(self, since=None):
+        """
+        Units picked per item from the journal, as {item_id: units}, optionally only after a time.time() value
+        
+        Reservations count as picks unless they were released again. Entries
+        removed by take_snapshot(prune_journal=True) are not counted.
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT ItemID, -SUM(Delta) FROM stock_journal
+                    WHERE Reason IN ('pick', 'reserve', 'release') AND Timestamp >= ?
+                    GROUP BY ItemID
+                ''', (since if since is not None else 0,))
+                return {item_id: units for item_id, units in cursor.fetchall() if units > 0}
+        except Exception as e:
+            logger.error(f"Error reading pick history: {str(e)}")
+            raise
+
+    def add_skus(self, skus):
+        """Add SKUs from (code, description) pairs in one transaction, skipping codes already known; returns the number added"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                before = conn.total_changes
+                cursor.executemany('INSERT OR IGNORE INTO skus (Code, Description) VALUES (?, ?)', skus)
+                added = conn.total_changes - before
+            logger.info(f"Added {added} SKUs")
+            return added
+        except Exception as e:
+            logger.error(f"Error adding SKUs: {str(e)}")
+            raise
+
+    def set_sku_stock(self, stock):
+        """
+        Set stock from (sku_id, location_id, quantity) rows in one transaction
+
+        Existing rows for the same SKU and location are overwritten. Location
+        IDs are grid positions, as for items. The items Quantity of every
+        location touched becomes the total of its SKU rows, journaled as an
+        update and sent to the stock listeners. From then on the item-level
+        methods (update_quantity, reserve_stock and so on) refuse that bin
+        with ValueError, so the two counts cannot drift apart. Raises
+        ValueError for a location with units still reserved.
+        """
+        touched = set()
+
+        def rows():
+            for sku_id, location_id, quantity in self._check_sku_stock(stock):
+                touched.add(location_id)
+                yield sku_id, location_id, quantity
+
+        try:
+            with self._connect(immediate=True) as conn:
+                cursor = conn.cursor()
+                before = conn.total_changes
+                cursor.executemany('''
+                    INSERT INTO sku_stock (SkuID, LocationID, Quantity) VALUES (?, ?, ?)
+                    ON CONFLICT (SkuID, LocationID) DO UPDATE SET Quantity = excluded.Quantity
+                ''', rows())
+                written = conn.total_changes - before
+                touched = list(touched)
+                for i in range(0, len(touched), 900):
+                    chunk = touched[i:i + 900]
+                    placeholders = ','.join('?' * len(chunk))
+                    cursor.execute(f'SELECT DISTINCT ItemID FROM reservation_items WHERE ItemID IN ({placeholders})', chunk)
+                    reserved = [item_id for item_id, in cursor.fetchall()]
+                    if reserved:
+                        # Rolls back the rows already written
+                        raise ValueError(f"ItemIDs {sorted(reserved)} have reserved stock; settle the reservation first")
+                old, totals = self._sync_locations(cursor, touched)
+                changes = {location_id: total for location_id, total in totals.items() if old[location_id] != total}
+                self._journal(cursor, [(location_id, total - old[location_id], total, 'update', None)
+                                       for location_id, total in changes.items()])
+            self._journal_written(len(changes))
+            self._notify(changes)
+            logger.info(f"Set {written} SKU stock rows")
+            return written
+        except Exception as e:
+            logger.error(f"Error setting SKU stock: {str(e)}")
+            raise
+
+    def get_sku_ids(self, codes):
+        """Look up many SKU codes through the unique index, returned as {code: sku_id}; unknown codes are left out"""
+        codes = list(set(codes))
+        sku_ids = {}
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                # Query in chunks to stay under SQLite's bound parameter limit
+                for i in range(0, len(codes), 900):
+                    chunk = codes[i:i + 900]
+                    placeholders = ','.join('?' * len(chunk))
+                    cursor.execute(f'SELECT Code, SkuID FROM skus WHERE Code IN ({placeholders})', chunk)
+                    sku_ids.update(cursor.fetchall())
+            return sku_ids
+        except Exception as e:
+            logger.error(f"Error looking up SKUs: {str(e)}")
+            raise
+
+    def get_sku_locations(self, sku_ids):
+        """Locations holding stock of many SKUs via the primary key, returned as {sku_id: [(location_id, quantity), ...]}"""
+        sku_ids = list(set(sku_ids))
+        locations = {}
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                for i in range(0, len(sku_ids), 900):
+                    chunk = sku_ids[i:i + 900]
+                    placeholders = ','.join('?' * len(chunk))
+                    cursor.execute(f'''
+                        SELECT SkuID, LocationID, Quantity FROM sku_stock
+                        WHERE SkuID IN ({placeholders}) AND Quantity > 0
+                    ''', chunk)
+                    for sku_id, location_id, quantity in cursor.fetchall():
+                        locations.setdefault(sku_id, []).append((location_id, quantity))
+            return locations
+        except Exception as e:
+            logger.error(f"Error reading SKU locations: {str(e)}")
+            raise
+
+    def get_location_skus(self, location_id):
+        """Every SKU stocked at one location as (sku_id, code, quantity)"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT s.SkuID, s.Code, l.Quantity FROM sku_stock AS l
+                    JOIN skus AS s ON s.SkuID = l.SkuID
+                    WHERE l.LocationID = ? AND l.Quantity > 0
+                    ORDER BY s.SkuID
+                ''', (location_id,))
+                return cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Error reading stock at location {location_id}: {str(e)}")
+            raise
+
+    def _sync_locations(self, cursor, location_ids):
+        """
+        Set the items Quantity of each location to the total of its SKU rows using an open cursor
+        
+        Returns ({location_id: old_quantity}, {location_id: total}) for the
+        locations that have an items row; the others are left out.
+        """
+        location_ids = list(set(location_ids))
+        totals = dict.fromkeys(location_ids, 0)
+        for i in range(0, len(location_ids), 900):
+            chunk = location_ids[i:i + 900]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f'''
+                SELECT LocationID, SUM(Quantity) FROM sku_stock
+                WHERE LocationID IN ({placeholders}) GROUP BY LocationID
+            ''', chunk)
+            totals.update(cursor.fetchall())
+        old = self._read_quantities(cursor, location_ids)
+        totals = {location_id: total for location_id, total in totals.items() if location_id in old}
+        cursor.executemany('UPDATE items SET Quantity = ? WHERE ItemID = ?',
+                           [(total, location_id) for location_id, total in totals.items()])
+        return old, totals
+
+    def take_sku_stock(self, picks):
+        """
+        Take SKU stock in one transaction
+
+        picks maps (sku_id, location_id) to the number of units taken. Returns
+        the keys that did not have enough stock; those rows are left unchanged.
+        The locations' items quantities drop with their SKU rows, and each
+        pick is journaled with its SkuID and sent to the stock listeners.
+        """
+        short = []
+        taken = []
+        try:
+            with self._connect(immediate=True) as conn:
+                cursor = conn.cursor()
+                for (sku_id, location_id), amount in picks.items():
+                    cursor.execute('''
+                        UPDATE sku_stock SET Quantity = Quantity - ?
+                        WHERE SkuID = ? AND LocationID = ? AND Quantity >= ?
+                    ''', (amount, sku_id, location_id, amount))
+                    if cursor.rowcount == 0:
+                        short.append((sku_id, location_id))
+                    else:
+                        taken.append((sku_id, location_id))
+                _, totals = self._sync_locations(cursor, [location_id for _, location_id in taken])
+                self._journal(cursor, self._sku_pick_entries(picks, taken, totals))
+            self._journal_written(len(taken))
+            self._notify(totals)
+            logger.info(f"Took SKU stock from {len(taken)} locations")
+            return short
+        except Exception as e:
+            logger.error(f"Error taking SKU stock: {str(e)}")
+            raise
+
+    def close(self):
+        """Close pooled connections"""
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    def decrement_quantities(self, picks):
+        """
+        Decrement stock for several items in one transaction
+        
+        picks maps item_id to the number of units taken. Returns the item IDs that
+        did not have enough stock; those rows are left unchanged.
+        """
+        short = []
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                self._reject_sku_held(self._sku_held(cursor, picks))
+                for item_id, amount in picks.items():
+                    cursor.execute('''
+                        UPDATE items 
+                        SET Quantity = Quantity - ?
+                        WHERE ItemID = ? AND Quantity >= ?
+                    ''', (amount, item_id, amount))
+                    if cursor.rowcount == 0:
+                        short.append(item_id)
+                changes = self._read_quantities(cursor, [item_id for item_id in picks if item_id not in short])
+                self._journal(cursor, [(item_id, -picks[item_id], quantity, 'pick', None)
+                                       for item_id, quantity in changes.items()])
+            logger.info(f"Decremented stock for {len(changes)} items")
+            self._journal_written(len(changes))
+            self._notify(changes)
+            return short
+        except Exception as e:
+            logger.error(f"Error decrementing quantities: {str(e)}")
+            raise
+
+    def reserve_stock(self, picks):
+        """
+        Atomically reserve stock for a whole pick list
+        
+        picks maps item_id to the number of units needed. Either every item is
+        reserved or none are; InsufficientStockError lists the items that were
+        short. Returns a reservation ID for commit_reservation or release_reservation.
+        """
+        try:
+            with self._connect(immediate=True) as conn:
+                cursor = conn.cursor()
+                self._reject_sku_held(self._sku_held(cursor, picks))
+                short = []
+                for item_id, amount in picks.items():
+                    cursor.execute('''
+                        UPDATE items 
+                        SET Quantity = Quantity - ?
+                        WHERE ItemID = ? AND Quantity >= ?
+                    ''', (amount, item_id, amount))
+                    if cursor.rowcount == 0:
+                        short.append(item_id)
+                if short:
+                    # Rolls back the items already taken
+                    raise InsufficientStockError(short)
+                
+                cursor.execute('INSERT INTO reservations (Created) VALUES (?)', (time.time(),))
+                reservation_id = cursor.lastrowid
+                cursor.executemany('''
+                    INSERT INTO reservation_items (ReservationID, ItemID, Quantity)
+                    VALUES (?, ?, ?)
+                ''', [(reservation_id, item_id, amount) for item_id, amount in picks.items()])
+                changes = self._read_quantities(cursor, picks)
+                self._journal(cursor, [(item_id, -picks[item_id], quantity, 'reserve', reservation_id)
+                                       for item_id, quantity in changes.items()])
+            self._journal_written(len(changes))
+            self._notify(changes)
+            logger.info(f"Reserved {sum(picks.values())} units across {len(picks)} items (reservation {reservation_id})")
+            return reservation_id
+        except InsufficientStockError as e:
+            logger.warning(f"Reservation failed: {str(e)}")
+            raise
+        except Exception as e:
+            logger.error(f"Error reserving stock: {str(e)}")
+            raise
+
+    def commit_reservation(self, reservation_id):
+        """Confirm a reservation once its picks are made; the stock stays taken"""
+        try:
+            with self._connect(immediate=True) as conn:
+                cursor = conn.cursor()
+                cursor.execute('DELETE FROM reservation_items WHERE ReservationID = ?', (reservation_id,))
+                cursor.execute('DELETE FROM reservations WHERE ReservationID = ?', (reservation_id,))
+                found = cursor.rowcount > 0
+            logger.info(f"Committed reservation {reservation_id}")
+            return found
+        except Exception as e:
+            logger.error(f"Error committing reservation {reservation_id}: {str(e)}")
+            raise
+
+    def release_reservation(self, reservation_id):
+        """Cancel a reservation and return its stock"""
+        try:
+            with self._connect(immediate=True) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    UPDATE items
+                    SET Quantity = Quantity + (
+                        SELECT Quantity FROM reservation_items
+                        WHERE ReservationID = ? AND reservation_items.ItemID = items.ItemID
+                    )
+                    WHERE ItemID IN (SELECT ItemID FROM reservation_items WHERE ReservationID = ?)
+                ''', (reservation_id, reservation_id))
+                cursor.execute('SELECT ItemID, Quantity FROM reservation_items WHERE ReservationID = ?', (reservation_id,))
+                returned = dict(cursor.fetchall())
+                changes = self._read_quantities(cursor, returned)
+                cursor.execute('DELETE FROM reservation_items WHERE ReservationID = ?', (reservation_id,))
+                cursor.execute('DELETE FROM reservations WHERE ReservationID = ?', (reservation_id,))
+                found = cursor.rowcount > 0
+                self._journal(cursor, [(item_id, returned[item_id], quantity, 'release', reservation_id)
+                                       for item_id, quantity in changes.items()])
+            self._journal_written(len(changes))
+            self._notify(changes)
+            logger.info(f"Released reservation {reservation_id}")
+            return found
+        except Exception as e:
+            logger.error(f"Error releasing reservation {reservation_id}: {str(e)}")
+            raise
+
+    def restock(self, picks):
+        """
+        Put units back on the shelf in one transaction, e.g. for a cancelled pick
+        
+        picks maps item_id to the number of units returned. Each row is
+        incremented in place, so a pick made meanwhile is never overwritten,
+        and the movement is journaled as a release. Returns {item_id: new_quantity}.
+        """
+        try:
+            with self._connect(immediate=True) as conn:
+                cursor = conn.cursor()
+                self._reject_sku_held(self._sku_held(cursor, picks))
+                cursor.executemany('''
+                    UPDATE items SET Quantity = Quantity + ? WHERE ItemID = ?
+                ''', [(amount, item_id) for item_id, amount in picks.items()])
+                changes = self._read_quantities(cursor, picks)
+                self._journal(cursor, [(item_id, picks[item_id], quantity, 'release', None)
+                                       for item_id, quantity in changes.items()])
+            self._journal_written(len(changes))
+            self._notify(changes)
+            logger.info(f"Restocked {sum(picks.values())} units across {len(changes)} items")
+            return changes
+        except Exception as e:
+            logger.error(f"Error restocking: {str(e)}")
+            raise
+
+    def swap_quantities(self, swaps):
+        """
+        Swap the stock of each (item_id, item_id) pair, in order, in one transaction
+        
+        The write lock is held from the first read, so no pick can slip in
+        between reading and writing a bin, and an error leaves every bin as it
+        was. Movements are journaled with the reason 'slot', which pick
+        history ignores. Returns {item_id: new_quantity}.
+        """
+        try:
+            with self._connect(immediate=True) as conn:
+                cursor = conn.cursor()
+                quantities = self._read_quantities(cursor, [item_id for pair in swaps for item_id in pair])
+                self._reject_sku_held(self._sku_held(cursor, quantities))
+                entries = []
+                for first, second in swaps:
+                    if first not in quantities or second not in quantities:
+                        raise ValueError(f"Cannot swap ItemIDs {first} and {second}: not in database")
+                    for item_id, old, new in ((first, quantities[first], quantities[second]),
+                                              (second, quantities[second], quantities[first])):
+                        quantities[item_id] = new
+                        entries.append((item_id, new - old, new, 'slot', None))
+                cursor.executemany('UPDATE items SET Quantity = ? WHERE ItemID = ?',
+                                   [(quantity, item_id) for item_id, quantity in quantities.items()])
+                self._journal(cursor, entries)
+            self._journal_written(len(entries))
+            self._notify(quantities)
+            logger.info(f"Swapped stock for {len(swaps)} pairs of items")
+            return quantities
+        except Exception as e:
+            logger.error(f"Error swapping quantities: {str(e)}")
+            raise
+
     def get_position(self, item_id):
         """Get grid position (row, col) for an item"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT row, col FROM items WHERE ItemID = ?', (item_id,))
             result = cursor.fetchone()
             return result if result else None
 
+    def save_layout(self, grid, distance_fields=None):
+        """Save the grid dimensions, obstacle mask and optional distance tables"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT OR REPLACE INTO layout (LayoutID, rows, cols, ObstacleMask, LayoutHash)
+                    VALUES (1, ?, ?, ?, ?)
+                ''', (grid.rows, grid.cols, bytes(grid.obstacle_mask()), grid.layout_hash()))
+                
+                # Distance tables are only valid for this exact layout, so replace them all
+                cursor.execute('DELETE FROM layout_distances')
+                if distance_fields:
+                    cursor.executemany('''
+                        INSERT INTO layout_distances (SourceCell, Distances)
+                        VALUES (?, ?)
+                    ''', [(row * grid.cols + col, spa.pack_distance_field(field))
+                          for (row, col), field in distance_fields.items()])
+                logger.info(f"Saved layout with {len(grid.obstacles)} obstacles and "
+                            f"{len(distance_fields or {})} distance tables")
+        except Exception as e:
+            logger.error(f"Error saving layout: {str(e)}")
+            raise
+
+    def load_layout(self):
+        """
+        Load the saved layout in one step
+        
+        Returns a dictionary with rows, cols, mask, layout_hash and distance_fields
+        (keyed by source cell), or None if no layout has been saved.
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT rows, cols, ObstacleMask, LayoutHash FROM layout WHERE LayoutID = 1')
+                result = cursor.fetchone()
+                if not result:
+                    return None
+                rows, cols, mask, layout_hash = result
+                
+                cursor.execute('SELECT SourceCell, Distances FROM layout_distances')
+                distance_fields = {divmod(source, cols): spa.unpack_distance_field(blob)
+                                   for source, blob in cursor.fetchall()}
+                logger.info(f"Loaded {rows}x{cols} layout with {len(distance_fields)} distance tables")
+                return {
+                    'rows': rows,
+                    'cols': cols,
+                    'mask': mask,
+                    'layout_hash': layout_hash,
+                    'distance_fields': distance_fields,
+                }
+        except Exception as e:
+            logger.error(f"Error loading layout: {str(e)}")
+            raise
+
+class ArrayInventory(InventoryBackend):
+    """
+    Pure-Python stock store holding one quantity per grid position in an array
+    
+    Nothing is written to disk, so it suits tests, simulations and benchmarks.
+    A lock makes every operation atomic across threads. The journal and
+    snapshots are kept in memory too, so pick history and route audits work
+    as with SQLite but last only as long as the process.
+    """
+    def __init__(self, rows, cols):
+        super().__init__(rows, cols)
+        # Quantity of each item by ItemID - 1; empty until populated, like a new database
+        self.quantities = array('I')
+        self.reservations = {}
+        self._next_reservation_id = 1
+        self._layout = None
+        self._routes = []
+        # Stock movements as (seq, timestamp, item_id, delta, quantity, reason, route_id, sku_id),
+        # and the two latest snapshots as (last_seq, quantities)
+        self.journal = []
+        self._next_seq = 1
+        self.snapshots = []
+        # SKU catalogue as {code: sku_id} and back as {sku_id: code} with descriptions,
+        # and stock as {sku_id: {location_id: quantity}}
+        self._sku_ids = {}
+        self._sku_codes = {}
+        self._sku_descriptions = {}
+        self._sku_stock = {}
+        # SKUs stocked at each location, so location totals need no catalogue scan
+        self._location_skus = {}
+        self._lock = threading.Lock()
+        # No connections to pool, but the attribute is checked by callers
+        self.pool = None
+        self.lock_stats = {
+            'transactions': 0,
+            'lock_wait_total': 0.0,
+            'lock_wait_max': 0.0,
+            'busy_retries': 0,
+        }
+        logger.info(f"Initializing array inventory with dimensions {rows}x{cols}")
+
+    def populate_random_data(self):
+        """Fill the store with random quantities for each grid position"""
+        with self._lock:
+            self.quantities = array('I', (random.randint(1, 10) for _ in range(self.rows * self.cols)))
+            self.reservations.clear()
+            # Bins holding SKUs keep the total of their SKU rows
+            self._sync_locations(self._location_skus)
+            changes = {index + 1: quantity for index, quantity in enumerate(self.quantities)}
+        logger.info(f"Populated array inventory with random data for {self.rows*self.cols} positions")
+        # Record the new baseline, as the SQLite backend does
+        self.take_snapshot()
+        self._notify(changes)
+
+    def validate_item_id(self, item_id):
+        """Validate if item_id exists and is within bounds"""
+        max_id = self.rows * self.cols
+        if not (1 <= item_id <= max_id):
+            raise ValueError(f"ItemID must be between 1 and {max_id}")
+        if item_id > len(self.quantities):
+            raise ValueError(f"ItemID {item_id} not found in database")
+        return True
+
+    def get_quantity(self, item_id):
+        """Get quantity for a specific item"""
+        self.validate_item_id(item_id)
+        return self.quantities[item_id - 1]
+
+    def update_quantity(self, item_id, new_quantity):
+        """Update quantity for a specific item"""
+        self.validate_item_id(item_id)
+        self._check_quantity(new_quantity)
+        with self._lock:
+            self._reject_sku_held(self._sku_held([item_id]))
+            old_quantity = self.quantities[item_id - 1]
+            self.quantities[item_id - 1] = new_quantity
+            self._journal([(item_id, new_quantity - old_quantity, new_quantity, 'update', None)])
+        logger.info(f"Updated quantity to {new_quantity} for ItemID {item_id}")
+        self._notify({item_id: new_quantity})
+        return True
+
+    def decrement_quantity(self, item_id):
+        """Decrement quantity by 1 for a specific item"""
+        self.validate_item_id(item_id)
+        with self._lock:
+            self._reject_sku_held(self._sku_held([item_id]))
+            quantity = self.quantities[item_id - 1]
+            if quantity == 0:
+                logger.warning(f"Cannot decrement: ItemID {item_id} has no stock")
+                return False
+            self.quantities[item_id - 1] = quantity - 1
+            self._journal([(item_id, -1, quantity - 1, 'pick', None)])
+        logger.info(f"Decremented quantity for ItemID {item_id}")
+        self._notify({item_id: quantity - 1})
+        return True
+
+    def get_quantities(self, item_ids):
+        """Get quantities for many items, returned as {item_id: quantity}"""
+        count = len(self.quantities)
+        return {item_id: self.quantities[item_id - 1] for item_id in set(item_ids) if 1 <= item_id <= count}
+
+    def get_all_quantities(self):
+        """Return a copy of every quantity, indexed by ItemID - 1 (0 for missing items)"""
+        quantities = array('I', self.quantities)
+        quantities.extend([0] * (self.rows * self.cols - len(quantities)))
+        return quantities
+
+    def get_low_stock(self, threshold=LOW_STOCK_THRESHOLD):
+        """Return every position with quantity below threshold as (item_id, row, col, quantity), lowest first"""
+        low_stock = [(index + 1, index // self.cols, index % self.cols, quantity)
+                     for index, quantity in enumerate(self.quantities) if quantity < threshold]
+        low_stock.sort(key=lambda entry: entry[3])
+        return low_stock
+
+    def _journal(self, entries):
+        """Append stock movements as (item_id, delta, quantity, reason, route_id[, sku_id]). Caller holds the lock"""
+        timestamp = time.time()
+        for entry in entries:
+            self.journal.append((self._next_seq, timestamp) + tuple(entry) + (None,) * (6 - len(entry)))
+            self._next_seq += 1
+
+    def _sku_held(self, item_ids):
+        """Item IDs among item_ids whose bins hold SKU stock. Caller holds the lock"""
+        return {item_id for item_id in item_ids if self._location_skus.get(item_id)}
+
+    def _short(self, picks):
+        """Item IDs in picks without enough stock. Caller holds the lock"""
+        count = len(self.quantities)
+        return [item_id for item_id, amount in picks.items()
+                if not (1 <= item_id <= count) or self.quantities[item_id - 1] < amount]
+
+    def _take(self, picks, short=()):
+        """Take picks for every item not in short; returns {item_id: new_quantity}. Caller holds the lock"""
+        changes = {}
+        for item_id, amount in picks.items():
+            if item_id not in short:
+                self.quantities[item_id - 1] -= amount
+                changes[item_id] = self.quantities[item_id - 1]
+        return changes
+
+    def decrement_quantities(self, picks):
+        """Decrement stock for several items at once; returns the item IDs that did not have enough"""
+        with self._lock:
+            self._reject_sku_held(self._sku_held(picks))
+            short = self._short(picks)
+            changes = self._take(picks, short)
+            self._journal([(item_id, -picks[item_id], quantity, 'pick', None) for item_id, quantity in changes.items()])
+        logger.info(f"Decremented stock for {len(changes)} items")
+        self._notify(changes)
+        return short
+
+    def reserve_stock(self, picks):
+        """Atomically reserve stock for a whole pick list, raising InsufficientStockError if any item is short"""
+        wait_start = time.perf_counter()
+        with self._lock:
+            wait = time.perf_counter() - wait_start
+            self.lock_stats['transactions'] += 1
+            self.lock_stats['lock_wait_total'] += wait
+            self.lock_stats['lock_wait_max'] = max(self.lock_stats['lock_wait_max'], wait)
+            self._reject_sku_held(self._sku_held(picks))
+            short = self._short(picks)
+            if short:
+                error = InsufficientStockError(short)
+                logger.warning(f"Reservation failed: {str(error)}")
+                raise error
+            reservation_id = self._next_reservation_id
+            self._next_reservation_id += 1
+            self.reservations[reservation_id] = dict(picks)
+            changes = self._take(picks)
+            self._journal([(item_id, -picks[item_id], quantity, 'reserve', reservation_id)
+                           for item_id, quantity in changes.items()])
+        self._notify(changes)
+        logger.info(f"Reserved {sum(picks.values())} units across {len(picks)} items (reservation {reservation_id})")
+        return reservation_id
+
+    def commit_reservation(self, reservation_id):
+        """Confirm a reservation once its picks are made; the stock stays taken"""
+        with self._lock:
+            found = self.reservations.pop(reservation_id, None) is not None
+        logger.info(f"Committed reservation {reservation_id}")
+        return found
+
+    def release_reservation(self, reservation_id):
+        """Cancel a reservation and return its stock"""
+        with self._lock:
+            picks = self.reservations.pop(reservation_id, None)
+            if picks is None:
+                return False
+            for item_id, amount in picks.items():
+                self.quantities[item_id - 1] += amount
+            changes = {item_id: self.quantities[item_id - 1] for item_id in picks}
+            self._journal([(item_id, picks[item_id], quantity, 'release', reservation_id)
+                           for item_id, quantity in changes.items()])
+        self._notify(changes)
+        logger.info(f"Released reservation {reservation_id}")
+        return True
+
+    def restock(self, picks):
+        """Put units back on the shelf, given {item_id: units}; returns {item_id: new_quantity}"""
+        with self._lock:
+            self._reject_sku_held(self._sku_held(picks))
+            count = len(self.quantities)
+            changes = {}
+            for item_id, amount in picks.items():
+                if 1 <= item_id <= count:
+                    self.quantities[item_id - 1] += amount
+                    changes[item_id] = self.quantities[item_id - 1]
+            self._journal([(item_id, picks[item_id], quantity, 'release', None) for item_id, quantity in changes.items()])
+        self._notify(changes)
+        logger.info(f"Restocked {sum(picks.values())} units across {len(changes)} items")
+        return changes
+
+    def swap_quantities(self, swaps):
+        """Swap the stock of each (item_id, item_id) pair, in order, all at once; returns {item_id: new_quantity}"""
+        with self._lock:
+            count = len(self.quantities)
+            for first, second in swaps:
+                if not (1 <= first <= count and 1 <= second <= count):
+                    raise ValueError(f"Cannot swap ItemIDs {first} and {second}: not in database")
+            self._reject_sku_held(self._sku_held(item_id for pair in swaps for item_id in pair))
+            changes = {}
+            for first, second in swaps:
+                old_first, old_second = self.quantities[first - 1], self.quantities[second - 1]
+                self.quantities[first - 1], self.quantities[second - 1] = old_second, old_first
+                self._journal([(first, old_second - old_first, old_second, 'slot', None),
+                               (second, old_first - old_second, old_first, 'slot', None)])
+                changes[first], changes[second] = old_second, old_first
+        self._notify(changes)
+        logger.info(f"Swapped stock for {len(swaps)} pairs of items")
+        return changes
+
+    def get_position(self, item_id):
+        """Get grid position (row, col) for an item"""
+        if not (1 <= item_id <= len(self.quantities)):
+            return None
+        return divmod(item_id - 1, self.cols)
+
+    def save_layout(self, grid, distance_fields=None):
+        """Keep the layout in memory for load_layout"""
+        self._layout = {
+            'rows': grid.rows,
+            'cols': grid.cols,
+            'mask': bytes(grid.obstacle_mask()),
+            'layout_hash': grid.layout_hash(),
+            'distance_fields': dict(distance_fields or {}),
+        }
+
+    def load_layout(self):
+        """Return the layout saved in this session, or None"""
+        return self._layout
+
+    def save_route_cache(self, cache):
+        """Keep the cached routes in memory for load_route_cache"""
+        self._routes = cache.entries()
+        return len(self._routes)
+
+    def load_route_cache(self, cache):
+        """Fill a spa.RouteCache with the routes saved in this session"""
+        for key, created, order, path in self._routes:
+            cache.put(key, order, path, created=created)
+        return len(self._routes)
+
+    def restore_from_journal(self):
+        """
+        Rebuild the quantities from the latest snapshot plus the journal after it
+
+        Complete quantities are already up to date and are left alone. Returns
+        False if they are incomplete and there is no snapshot.
+        """
+        with self._lock:
+            if len(self.quantities) == self.rows * self.cols:
+                return True
+            if not self.snapshots:
+                return False
+            last_seq, quantities = self.snapshots[-1]
+            quantities = array('I', quantities)
+            for seq, _, item_id, _, quantity, _, _, _ in self.journal:
+                if seq > last_seq and 1 <= item_id <= len(quantities):
+                    quantities[item_id - 1] = quantity
+            self.quantities = quantities
+            changes = {index + 1: quantity for index, quantity in enumerate(quantities)}
+        logger.info(f"Restored stock from snapshot at journal position {last_seq}")
+        self._notify(changes)
+        return True
+
+    def take_snapshot(self, prune_journal=False):
+        """Copy every quantity as a snapshot covering the journal so far; only the two latest are kept"""
+        with self._lock:
+            last_seq = self._next_seq - 1
+            self.snapshots = self.snapshots[-1:] + [(last_seq, array('I', self.quantities))]
+            if prune_journal:
+                self.journal = [entry for entry in self.journal if entry[0] > last_seq]
+        logger.info(f"Took stock snapshot at journal position {last_seq}")
+        return len(self.snapshots)
+
+    def get_route_movements(self, route_id):
+        """Audit trail for one route: journal entries as (timestamp, item_id, delta, reason)"""
+        with self._lock:
+            return [(timestamp, item_id, delta, reason)
+                    for _, timestamp, item_id, delta, _, reason, entry_route, _ in self.journal if entry_route == route_id]
+
+    def get_pick_counts(self, since=None):
+        """Units picked per item from the journal, as {item_id: units}, optionally only after a time.time() value"""
+        since = since if since is not None else 0
+        units = Counter()
+        with self._lock:
+            for _, timestamp, item_id, delta, _, reason, _, _ in self.journal:
+                if reason in ('pick', 'reserve', 'release') and timestamp >= since:
+                    units[item_id] -= delta
+        return {item_id: count for item_id, count in units.items() if count > 0}
+
+    def add_skus(self, skus):
+        """Add SKUs from (code, description) pairs, skipping codes already known; returns the number added"""
+        added = 0
+        with self._lock:
+            for code, description in skus:
+                if code not in self._sku_ids:
+                    sku_id = len(self._sku_ids) + 1
+                    self._sku_ids[code] = sku_id
+                    self._sku_codes[sku_id] = code
+                    self._sku_descriptions[sku_id] = description
+                    added += 1
+        logger.info(f"Added {added} SKUs")
+        return added
+
+    def _sync_locations(self, location_ids):
+        """Set the quantity of each stocked location to the total of its SKU rows; returns (old, totals) like InventoryDB. Caller holds the lock"""
+        old = {}
+        totals = {}
+        for location_id in set(location_ids):
+            if location_id <= len(self.quantities):
+                old[location_id] = self.quantities[location_id - 1]
+                totals[location_id] = sum(self._sku_stock[sku_id][location_id]
+                                          for sku_id in self._location_skus.get(location_id, ()))
+                self.quantities[location_id - 1] = totals[location_id]
+        return old, totals
+
+    def set_sku_stock(self, stock):
+        """
+        Set stock from (sku_id, location_id, quantity) rows, overwriting existing rows; returns the number written
+        
+        Location quantities become the total of their SKU rows and are then
+        refused by the item-level methods, as with InventoryDB.
+        """
+        stock = list(self._check_sku_stock(stock))
+        with self._lock:
+            reserved = {location_id for _, location_id, _ in stock
+                        for picks in self.reservations.values() if location_id in picks}
+            if reserved:
+                raise ValueError(f"ItemIDs {sorted(reserved)} have reserved stock; settle the reservation first")
+            for sku_id, location_id, quantity in stock:
+                self._sku_stock.setdefault(sku_id, {})[location_id] = quantity
+                self._location_skus.setdefault(location_id, set()).add(sku_id)
+            old, totals = self._sync_locations(location_id for _, location_id, _ in stock)
+            changes = {location_id: total for location_id, total in totals.items() if old[location_id] != total}
+            self._journal([(location_id, total - old[location_id], total, 'update', None)
+                           for location_id, total in changes.items()])
+        self._notify(changes)
+        logger.info(f"Set {len(stock)} SKU stock rows")
+        return len(stock)
+
+    def get_sku_ids(self, codes):
+        """Look up many SKU codes, returned as {code: sku_id}; unknown codes are left out"""
+        with self._lock:
+            return {code: self._sku_ids[code] for code in set(codes) if code in self._sku_ids}
+
+    def get_sku_locations(self, sku_ids):
+        """Locations holding stock of many SKUs, returned as {sku_id: [(location_id, quantity), ...]}"""
+        locations = {}
+        with self._lock:
+            for sku_id in set(sku_ids):
+                stocked = [(location_id, quantity) for location_id, quantity in self._sku_stock.get(sku_id, {}).items()
+                           if quantity > 0]
+                if stocked:
+                    locations[sku_id] = stocked
+        return locations
+
+    def get_location_skus(self, location_id):
+        """Every SKU stocked at one location as (sku_id, code, quantity)"""
+        with self._lock:
+            stocked = [(sku_id, self._sku_codes.get(sku_id), self._sku_stock[sku_id][location_id])
+                       for sku_id in self._location_skus.get(location_id, ())]
+        return sorted(entry for entry in stocked if entry[2] > 0)
+
+    def take_sku_stock(self, picks):
+        """Take SKU stock, given {(sku_id, location_id): units}; returns the keys that did not have enough"""
+        short = []
+        taken = []
+        with self._lock:
+            for (sku_id, location_id), amount in picks.items():
+                stock = self._sku_stock.get(sku_id, {})
+                if stock.get(location_id, 0) < amount:
+                    short.append((sku_id, location_id))
+                else:
+                    stock[location_id] -= amount
+                    taken.append((sku_id, location_id))
+            _, totals = self._sync_locations(location_id for _, location_id in taken)
+            self._journal(self._sku_pick_entries(picks, taken, totals))
+        self._notify(totals)
+        logger.info(f"Took SKU stock from {len(taken)} locations")
+        return short
+
+    def close(self):
+        """Nothing to release"""
+
+def open_inventory(rows, cols, backend="sqlite", db_path="inventory.db", pool_size=0):
+    """
+    Create the stock store for a deployment
+    
+    Parameters:
+    rows, cols: Grid dimensions
+    backend: "sqlite" (file at db_path), "memory" (SQLite in memory) or "array" (pure Python)
+    db_path: Database file for the sqlite backend
+    pool_size: Connections to share between threads for the sqlite backend
+    """
+    if backend == "sqlite":
+        return InventoryDB(rows, cols, db_path, pool_size=pool_size)
+    if backend == "memory":
+        return InventoryDB(rows, cols, MEMORY_DB)
+    if backend == "array":
+        return ArrayInventory(rows, cols)
+    raise ValueError(f"Unknown backend '{backend}', expected one of {', '.join(BACKENDS)}")
+
+def _pack_cells(cells, cols):
+    """Serialise (row, col) cells as little-endian uint32 cell indices"""
+    indices = array('I', [row * cols + col for row, col in cells])
+    if sys.byteorder != 'little':
+        indices.byteswap()
+    return indices.tobytes()
+
+def _unpack_cells(data, cols):
+    """Load (row, col) cells from little-endian uint32 cell indices"""
+    indices = array('I')
+    indices.frombytes(data)
+    if sys.byteorder != 'little':
+        indices.byteswap()
+    return [divmod(index, cols) for index in indices]
+
 if __name__ == "__main__":
     try:
         # Initialize database using config dimensions
@@ -1,15 +1,62 @@
 # Import required libraries for GUI, file operations and system functions
 import tkinter as tk
-from tkinter import ttk, Menu, messagebox # Themed widgets for enhanced GUI appearance
+from tkinter import ttk, Menu, messagebox, filedialog # Themed widgets for enhanced GUI appearance
 import spa              # Custom module for pathfinding algorithms
 import io              # For redirecting stdout to capture visualisation
 import sys             # For system-level operations like stdout manipulation
 import threading       # For multi-threading support
 import queue           # For thread-safe data exchange
+from collections import Counter  # For counting units per pick position
 import config
 import database
+import waves
+import trips
+import slotting
+
+# Stock heat-map palette: out of stock and low stock match the legend, stocked cells
+# shade from light to dark green up to HEATMAP_FULL_STOCK units, obstacles are black
+HEATMAP_FULL_STOCK = 10
+HEATMAP_OBSTACLE = 255  # Palette level reserved for obstacles
+
+def heatmap_colour(level):
+    """RGB colour for a palette level: a quantity clamped to 254, or HEATMAP_OBSTACLE"""
+    if level == HEATMAP_OBSTACLE:
+        return (0x00, 0x00, 0x00)
+    if level == 0:
+        return (0xff, 0x33, 0x33)  # Bright red
+    if level < database.LOW_STOCK_THRESHOLD:
+        return (0xff, 0x99, 0x33)  # Bright orange
+    # Light green at the low stock threshold to dark green when full
+    span = max(1, HEATMAP_FULL_STOCK - database.LOW_STOCK_THRESHOLD)
+    fraction = min(1.0, (level - database.LOW_STOCK_THRESHOLD) / span)
+    light, dark = (0xc8, 0xf5, 0xd2), (0x1e, 0x8c, 0x3c)
+    return tuple(int(l + (d - l) * fraction) for l, d in zip(light, dark))
+
+# One translation table per colour channel, mapping a palette level byte to that channel
+HEATMAP_CHANNELS = [bytes(heatmap_colour(level)[channel] for level in range(256)) for channel in range(3)]
+
+def build_heatmap_ppm(quantities, obstacles, rows, cols):
+    """
+    Render one pixel per cell as binary PPM data for tk.PhotoImage
+    
+    Quantities are clamped to one palette byte each and every colour channel is
+    produced with a single bytes.translate, so no per-pixel strings are built.
+    """
+    levels = bytearray(q if q < HEATMAP_OBSTACLE else HEATMAP_OBSTACLE - 1 for q in quantities)
+    for row, col in obstacles:
+        levels[row * cols + col] = HEATMAP_OBSTACLE
+    pixels = bytearray(3 * rows * cols)
+    for channel in range(3):
+        pixels[channel::3] = levels.translate(HEATMAP_CHANNELS[channel])
+    return b"P6\n%d %d\n255\n" % (cols, rows) + bytes(pixels)
 
 class GridVisualiser(tk.Toplevel):
+    # Zoom limits in pixels per cell, and the smallest cells that still get labels and grid lines
+    MIN_CELL_SIZE = 2
+    MAX_CELL_SIZE = 80
+    TEXT_MIN_CELL_SIZE = 24
+    LINES_MIN_CELL_SIZE = 6
+
     def __init__(self, parent, grid_rows, grid_cols, path=None, start=None, end=None, points=None, db=None):
         super().__init__(parent)
         self.title("Path visualisation")
@@ -21,25 +68,68 @@ class GridVisualiser(tk.Toplevel):
         self.out_of_stock_positions = set()
         # Track user-selected points for stock level highlighting
         self.selected_points = set()
+        # Colour and quantity shown for each selected point
+        self.point_styles = {}
         # Track obstacles
         self.obstacles = set()
         
-        # Calculate canvas size based on grid dimensions
+        # Viewport: cell size in pixels (zoom) and the grid position shown at the top-left corner
         cell_size = 40
-        canvas_width = grid_cols * cell_size + 1
-        canvas_height = grid_rows * cell_size + 1
+        self.view_row = 0.0
+        self.view_col = 0.0
+        self._render_pending = False
+        self._drag_origin = None
+        
+        # Stock heat-map: one pixel per cell, scaled to the viewport when drawn
+        self.heatmap_var = tk.BooleanVar(value=False)
+        self._heatmap = None
+        self._heatmap_view = None
+        self._heat_quantities = None
+        
+        # The canvas is sized to the grid up to a screen-friendly maximum; only visible cells are drawn
+        canvas_width = min(grid_cols * cell_size + 1, 800)
+        canvas_height = min(grid_rows * cell_size + 1, 600)
         
         # Create canvas for grid drawing
-        self.canvas = tk.Canvas(self, width=canvas_width, height=canvas_height, bg="white")
-        self.canvas.pack(padx=10, pady=10)
+        self.canvas = tk.Canvas(self, width=canvas_width, height=canvas_height, bg="white", highlightthickness=0)
+        self.canvas.pack(padx=10, pady=(10, 0), fill=tk.BOTH, expand=True)
+        controls = ttk.Frame(self)
+        controls.pack(pady=(2, 8))
+        ttk.Checkbutton(controls, text="Stock heat-map", variable=self.heatmap_var,
+                        command=self.toggle_heatmap).pack(side=tk.LEFT, padx=5)
+        ttk.Label(controls, text="Drag to pan, scroll or +/- to zoom, 0 to fit, H for heat-map").pack(side=tk.LEFT, padx=5)
         
         # Store references for later use
         self.cell_size = cell_size
         self.path = path
+        self._path_cells = set(path) if path else set()
         self.start = start
         self.end = end
         self.points = points
         
+        # Pan with the mouse or arrow keys, zoom with the wheel or +/-
+        self.canvas.bind("<ButtonPress-1>", self.start_drag)
+        self.canvas.bind("<B1-Motion>", self.drag)
+        self.canvas.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.canvas.bind("<Button-4>", lambda event: self.zoom(1.25, event.x, event.y))
+        self.canvas.bind("<Button-5>", lambda event: self.zoom(0.8, event.x, event.y))
+        self.canvas.bind("<Configure>", lambda event: self.schedule_render())
+        self.bind("<Key-plus>", lambda event: self.zoom(1.25))
+        self.bind("<Key-equal>", lambda event: self.zoom(1.25))
+        self.bind("<Key-minus>", lambda event: self.zoom(0.8))
+        self.bind("<Key-0>", lambda event: self.zoom_to_fit())
+        self.bind("<Key-h>", lambda event: (self.heatmap_var.set(not self.heatmap_var.get()), self.toggle_heatmap()))
+        self.bind("<Left>", lambda event: self.pan(-5, 0))
+        self.bind("<Right>", lambda event: self.pan(5, 0))
+        self.bind("<Up>", lambda event: self.pan(0, -5))
+        self.bind("<Down>", lambda event: self.pan(0, 5))
+        
+        # Start from every position that is already out of stock (one indexed query)
+        if db is not None:
+            self.out_of_stock_positions = {(row, col) for _, row, col, _ in db.get_low_stock(1)}
+            # Repaint individual cells when stock changes
+            db.add_listener(self.on_stock_changed)
+        
         # Draw the grid with numbers
         self.draw_grid()
         
@@ -47,121 +137,317 @@ class GridVisualiser(tk.Toplevel):
         if path and start is not None and end is not None and points is not None and db is not None:
             self.visualize_path(path, start, end, points)
     
+    def canvas_size(self):
+        """Current canvas size in pixels, or the requested size before it is first shown"""
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        if width <= 1 or height <= 1:
+            width, height = int(self.canvas.cget("width")), int(self.canvas.cget("height"))
+        return width, height
+    
+    def visible_range(self):
+        """Return the (first_row, last_row, first_col, last_col) cells inside the canvas, end exclusive"""
+        width, height = self.canvas_size()
+        first_row = max(0, int(self.view_row))
+        first_col = max(0, int(self.view_col))
+        last_row = min(self.grid_rows, int(self.view_row + height / self.cell_size) + 1)
+        last_col = min(self.grid_cols, int(self.view_col + width / self.cell_size) + 1)
+        return first_row, last_row, first_col, last_col
+    
+    def cell_origin(self, row, col):
+        """Canvas pixel position of the top-left corner of a cell"""
+        return (col - self.view_col) * self.cell_size, (row - self.view_row) * self.cell_size
+    
+    def schedule_render(self):
+        """Redraw once the current burst of events (drag, zoom, resize) has been handled"""
+        if not self._render_pending:
+            self._render_pending = True
+            self.after_idle(self.draw_grid)
+    
     def draw_grid(self):
-        # Draw horizontal lines
-        for i in range(self.grid_rows + 1):
-            y = i * self.cell_size
-            self.canvas.create_line(0, y, self.grid_cols * self.cell_size, y, fill="gray")
-        
-        # Draw vertical lines
-        for j in range(self.grid_cols + 1):
-            x = j * self.cell_size
-            self.canvas.create_line(x, 0, x, self.grid_rows * self.cell_size, fill="gray")
-            
-        # Add cell numbers
-        for row in range(self.grid_rows):
-            for col in range(self.grid_cols):
-                # Calculate position number (1-based)
-                pos_num = spa.coordinates_to_index(row, col, self.grid_cols)
-                
-                # Calculate text position (center of cell)
-                x = col * self.cell_size + self.cell_size // 2
-                y = row * self.cell_size + self.cell_size // 2
-                
-                # Add text with improved font
-                self.canvas.create_text(x, y, text=str(pos_num), font=("Arial", 10, "bold"))
+        """Draw the visible part of the grid: lines, numbers and every highlighted cell"""
+        self._render_pending = False
+        self.canvas.delete("all")
+        first_row, last_row, first_col, last_col = self.visible_range()
+        size = self.cell_size
+        
+        if self._heatmap is not None:
+            self.draw_heatmap(first_row, last_row, first_col, last_col)
+        
+        # Grid lines are left out when zoomed far out, where they would cover the cells
+        if size >= self.LINES_MIN_CELL_SIZE:
+            x_start, y_start = self.cell_origin(first_row, first_col)
+            x_end, y_end = self.cell_origin(last_row, last_col)
+            # Draw horizontal lines
+            for row in range(first_row, last_row + 1):
+                y = (row - self.view_row) * size
+                self.canvas.create_line(x_start, y, x_end, y, fill="gray")
+            # Draw vertical lines
+            for col in range(first_col, last_col + 1):
+                x = (col - self.view_col) * size
+                self.canvas.create_line(x, y_start, x, y_end, fill="gray")
+        
+        if self._heatmap is not None:
+            # The heat-map already shows stock and obstacles, so only the route goes on top
+            route_cells = self._path_cells | self.selected_points
+            route_cells.update(cell for cell in (self.start, self.end) if cell is not None)
+            for row, col in route_cells:
+                if first_row <= row < last_row and first_col <= col < last_col:
+                    self.draw_styled_cell(row, col, replace=False)
+        elif size >= self.TEXT_MIN_CELL_SIZE:
+            # Few enough cells are visible to label every one
+            for row in range(first_row, last_row):
+                for col in range(first_col, last_col):
+                    self.draw_styled_cell(row, col, replace=False)
+        else:
+            # Level of detail: no numbers, so only highlighted cells in view are drawn
+            for row, col in self.highlighted_cells():
+                if first_row <= row < last_row and first_col <= col < last_col:
+                    self.draw_styled_cell(row, col, replace=False)
+    
+    def toggle_heatmap(self):
+        """Switch the stock heat-map overlay on or off"""
+        if self.heatmap_var.get() and self.db is not None:
+            self.refresh_heatmap()
+        else:
+            self.heatmap_var.set(False)
+            self._heatmap = None
+            self._heatmap_view = None
+            self._heat_quantities = None
+            self.schedule_render()
+    
+    def refresh_heatmap(self, quantities=None):
+        """Rebuild the heat-map image, reading every quantity in one bulk query unless given"""
+        if quantities is None:
+            quantities = self.db.get_all_quantities()
+        self._heat_quantities = quantities
+        self._heatmap = tk.PhotoImage(master=self, format="PPM",
+                                      data=build_heatmap_ppm(quantities, self.obstacles, self.grid_rows, self.grid_cols))
+        self.schedule_render()
+    
+    def draw_heatmap(self, first_row, last_row, first_col, last_col):
+        """Scale the visible part of the heat-map up to the cell size and place it on the canvas"""
+        if last_row <= first_row or last_col <= first_col:
+            return
+        size = int(self.cell_size)
+        self._heatmap_view = tk.PhotoImage(master=self)
+        self._heatmap_view.tk.call(self._heatmap_view, 'copy', self._heatmap,
+                                   '-from', first_col, first_row, last_col, last_row, '-zoom', size, size)
+        x, y = self.cell_origin(first_row, first_col)
+        self.canvas.create_image(x, y, image=self._heatmap_view, anchor='nw')
+    
+    def highlighted_cells(self):
+        """Every cell that is drawn in a colour rather than as a plain number"""
+        cells = self._path_cells | self.obstacles | self.out_of_stock_positions | self.selected_points
+        for cell in (self.start, self.end):
+            if cell is not None:
+                cells.add(cell)
+        return cells
+    
+    def cell_style(self, row, col):
+        """
+        Returns (colour, is_stock_indicator, quantity) for a cell, or None for a plain cell
+        
+        Priority follows the drawing order of a route: start/end over selected
+        points over out-of-stock positions over obstacles over the path.
+        """
+        cell = (row, col)
+        if cell == self.start or cell == self.end:
+            return "#4287f5", False, None  # Bright blue for start and end
+        if cell in self.point_styles:
+            colour, quantity = self.point_styles[cell]
+            return colour, quantity is not None, quantity
+        if cell in self.out_of_stock_positions and cell not in self.obstacles:
+            return "#ff3333", True, 0  # Bright red
+        if cell in self.obstacles:
+            return "#000000", False, None  # Black for obstacles
+        if cell in self._path_cells:
+            return "#42f56f", False, None  # Bright green for path
+        return None
+    
+    def draw_styled_cell(self, row, col, replace=True):
+        """Draw a cell according to its current style; replace=False skips removing an old drawing"""
+        style = self.cell_style(row, col)
+        if style is None:
+            if replace:
+                self.canvas.delete(f"cell_{row}_{col}")
+            if self.cell_size >= self.TEXT_MIN_CELL_SIZE:
+                # Plain cell: just the position number
+                x, y = self.cell_origin(row, col)
+                self.canvas.create_text(x + self.cell_size / 2, y + self.cell_size / 2,
+                                        text=str(spa.coordinates_to_index(row, col, self.grid_cols)),
+                                        font=("Arial", 10, "bold"), tags=f"cell_{row}_{col}")
+        else:
+            self.draw_cell(row, col, *style, replace=replace)
+    
+    def start_drag(self, event):
+        self.canvas.focus_set()
+        self._drag_origin = (event.x, event.y, self.view_row, self.view_col)
+    
+    def drag(self, event):
+        """Pan so the grid follows the mouse"""
+        if self._drag_origin is None:
+            return
+        x, y, view_row, view_col = self._drag_origin
+        self.set_view(view_row - (event.y - y) / self.cell_size, view_col - (event.x - x) / self.cell_size)
+    
+    def pan(self, cols, rows):
+        """Move the view by a number of cells"""
+        self.set_view(self.view_row + rows, self.view_col + cols)
+    
+    def set_view(self, view_row, view_col):
+        """Move the top-left corner of the view, keeping the grid on screen"""
+        width, height = self.canvas_size()
+        visible_rows = height / self.cell_size
+        visible_cols = width / self.cell_size
+        self.view_row = min(max(view_row, 0.0), max(0.0, self.grid_rows - visible_rows))
+        self.view_col = min(max(view_col, 0.0), max(0.0, self.grid_cols - visible_cols))
+        self.schedule_render()
+    
+    def on_mouse_wheel(self, event):
+        self.zoom(1.25 if event.delta > 0 else 0.8, event.x, event.y)
+    
+    def zoom(self, factor, x=None, y=None):
+        """Change the cell size, keeping the grid position under (x, y) in place"""
+        if x is None:
+            width, height = self.canvas_size()
+            x, y = width / 2, height / 2
+        # Whole pixels per cell, so cells and the scaled heat-map line up exactly
+        new_size = int(round(self.cell_size * factor))
+        if new_size == self.cell_size:
+            new_size += 1 if factor > 1 else -1
+        new_size = min(self.MAX_CELL_SIZE, max(self.MIN_CELL_SIZE, new_size))
+        if new_size == self.cell_size:
+            return
+        # Grid coordinates under the cursor stay fixed
+        row_at = self.view_row + y / self.cell_size
+        col_at = self.view_col + x / self.cell_size
+        self.cell_size = new_size
+        self.set_view(row_at - y / new_size, col_at - x / new_size)
+    
+    def zoom_to_fit(self):
+        """Show the whole grid"""
+        width, height = self.canvas_size()
+        self.cell_size = min(self.MAX_CELL_SIZE, max(self.MIN_CELL_SIZE,
+                                                     int(min(width / self.grid_cols, height / self.grid_rows))))
+        self.set_view(0.0, 0.0)
+    
+    def destroy(self):
+        # Stop listening for stock changes once the window closes
+        if self.db is not None:
+            self.db.remove_listener(self.on_stock_changed)
+        super().destroy()
+    
+    def on_stock_changed(self, changes):
+        """Repaint only the cells whose stock changed"""
+        if not self.winfo_exists():
+            return
+        for item_id, quantity in changes.items():
+            row, col = spa.index_to_coordinates(item_id, self.grid_cols)
+            self.repaint_cell(row, col, quantity)
+    
+    def repaint_cell(self, row, col, quantity):
+        """Redraw one cell to match its stock level, path membership and obstacle state"""
+        cell = (row, col)
+        if quantity == 0:
+            self.out_of_stock_positions.add(cell)
+        else:
+            self.out_of_stock_positions.discard(cell)
+        
+        if cell in self.selected_points:
+            if quantity == 0:
+                self.point_styles[cell] = ("#ff3333", quantity)  # Bright red
+            elif quantity < database.LOW_STOCK_THRESHOLD:
+                self.point_styles[cell] = ("#ff9933", quantity)  # Bright orange
+            else:
+                self.point_styles[cell] = ("#f5d742", None)  # Bright yellow
+        
+        # Keep the heat-map pixel in step; the scaled view is redrawn once the events settle
+        if self._heatmap is not None:
+            self._heat_quantities[row * self.grid_cols + col] = quantity
+            if cell not in self.obstacles:
+                level = min(quantity, HEATMAP_OBSTACLE - 1)
+                self._heatmap.put("#%02x%02x%02x" % heatmap_colour(level), to=(col, row))
+            self.schedule_render()
+            return
+        
+        # Cells outside the viewport are drawn when they scroll into view
+        first_row, last_row, first_col, last_col = self.visible_range()
+        if first_row <= row < last_row and first_col <= col < last_col:
+            self.draw_styled_cell(row, col)
     
     def visualize_path(self, path, start, end, points):
+        self.path = path
+        self._path_cells = set(path)
+        self.start = start
+        self.end = end
+        self.points = points
+        
         # Update selected points for stock level highlighting
-        self.selected_points = set()
-        for x, y in points:
-            self.selected_points.add((x, y))
-            
-            # Check if this point is out of stock and add to tracking set
-            pos_num = spa.coordinates_to_index(x, y, self.grid_cols)
+        self.selected_points = set(points)
+        self.point_styles = {}
+        quantities = {}
+        for point in points:
+            pos_num = spa.coordinates_to_index(point[0], point[1], self.grid_cols)
             quantity = self.db.get_quantity(pos_num)
+            quantities[point] = quantity
             # Only add to out-of-stock if it was already at 0 before this run
             if quantity == 0:
-                self.out_of_stock_positions.add((x, y))
-        
-        # First draw the path (lowest priority)
-        for x, y in path:
-            # Skip start, end, intermediate points, and obstacles to avoid overwriting
-            if ((x, y) != start and (x, y) != end and (x, y) not in points 
-                    and (x, y) not in self.obstacles):
-                self.draw_cell(x, y, "#42f56f")  # Bright green for path
+                self.out_of_stock_positions.add(point)
         
-        # Draw obstacles (higher priority than path, lower than points)
-        for x, y in self.obstacles:
-            if (x, y) != start and (x, y) != end and (x, y) not in points:
-                self.draw_cell(x, y, "#000000")  # Black for obstacles
-        
-        # Draw intermediate points (medium priority)
         for point in points:
-            pos_num = spa.coordinates_to_index(point[0], point[1], self.grid_cols)
-            quantity = self.db.get_quantity(pos_num)
-            
+            quantity = quantities[point]
             if quantity == 0:
                 # Check if it was already in out-of-stock before this run
-                if (point[0], point[1]) in self.out_of_stock_positions:
+                if point in self.out_of_stock_positions:
                     # Was already out of stock - red
-                    self.draw_cell(point[0], point[1], "#ff3333", True)  # Bright red
+                    self.point_styles[point] = ("#ff3333", quantity)  # Bright red
                 else:
                     # Just became out of stock in this run - orange
-                    self.draw_cell(point[0], point[1], "#ff9933", True)  # Bright orange
-            elif quantity < 2:
+                    self.point_styles[point] = ("#ff9933", quantity)  # Bright orange
+            elif quantity < database.LOW_STOCK_THRESHOLD:
                 # Low stock - orange
-                self.draw_cell(point[0], point[1], "#ff9933", True)  # Bright orange
+                self.point_styles[point] = ("#ff9933", quantity)  # Bright orange
             else:
                 # Normal stock - yellow
-                self.draw_cell(point[0], point[1], "#f5d742")  # Bright yellow
-        
-        # Draw start and end points (higher priority)
-        self.draw_cell(start[0], start[1], "#4287f5")  # Bright blue for start
-        self.draw_cell(end[0], end[1], "#4287f5")      # Bright blue for end
+                self.point_styles[point] = ("#f5d742", None)  # Bright yellow
         
-        # Draw any out-of-stock positions that aren't in the current path
-        for x, y in self.out_of_stock_positions:
-            if (x, y) not in self.selected_points and (x, y) != start and (x, y) != end:
-                self.draw_cell(x, y, "#ff3333", True)  # Bright red
+        self.schedule_render()
     
     def clear_visualisation(self):
-        # Clear all colored cells but keep the grid and numbers
-        self.canvas.delete("all")
-        self.draw_grid()
-        
-        # Redraw obstacles first
-        for x, y in self.obstacles:
-            self.draw_cell(x, y, "#000000")  # Black for obstacles
-        
-        # Then redraw out-of-stock positions
-        if self.db:
-            for x, y in self.out_of_stock_positions:
-                # Only draw if not an obstacle
-                if (x, y) not in self.obstacles:
-                    self.draw_cell(x, y, "#ff3333", True)  # Bright red
-        
-        # Reset selected points but keep out-of-stock tracking
+        # Reset selected points but keep out-of-stock tracking and obstacles
         self.selected_points = set()
+        self.point_styles = {}
         self.path = None
+        self._path_cells = set()
         self.start = None
         self.end = None
         self.points = None
+        self.schedule_render()
     
-    def draw_cell(self, row, col, color, is_stock_indicator=False):
+    def draw_cell(self, row, col, color, is_stock_indicator=False, quantity=None, replace=True):
         """Draw a colored cell on the grid with position number on top"""
-        x1 = col * self.cell_size + 1
-        y1 = row * self.cell_size + 1
-        x2 = x1 + self.cell_size - 2
-        y2 = y1 + self.cell_size - 2
+        # Replace anything previously drawn on this cell
+        tag = f"cell_{row}_{col}"
+        if replace:
+            self.canvas.delete(tag)
+        
+        x, y = self.cell_origin(row, col)
+        size = self.cell_size
+        # Leave a one pixel gap for the grid lines when they are shown
+        inset = 1 if size >= self.LINES_MIN_CELL_SIZE else 0
         
         # Create rectangle with improved transparency to keep numbers visible
-        rect_id = self.canvas.create_rectangle(x1, y1, x2, y2, fill=color, outline="")
+        self.canvas.create_rectangle(x + inset, y + inset, x + size - inset, y + size - inset,
+                                     fill=color, outline="", tags=tag)
+        
+        # Level of detail: no text when the cells are too small to read
+        if size < self.TEXT_MIN_CELL_SIZE:
+            return
         
         # Add the position number on top with contrasting color
         pos_num = spa.coordinates_to_index(row, col, self.grid_cols)
-        x = col * self.cell_size + self.cell_size // 2
-        y = row * self.cell_size + self.cell_size // 2
+        x += size / 2
+        y += size / 2
         
         # Determine text color based on background brightness
         text_color = "black"
@@ -170,38 +456,25 @@ class GridVisualiser(tk.Toplevel):
             
         # For stock indicators, add stock quantity if available
         if is_stock_indicator and self.db:
-            quantity = self.db.get_quantity(pos_num)
+            if quantity is None:
+                quantity = self.db.get_quantity(pos_num)
             if quantity is not None:
                 # Draw position number
-                self.canvas.create_text(x, y - 5, text=str(pos_num), font=("Arial", 8, "bold"), fill=text_color)
+                self.canvas.create_text(x, y - 5, text=str(pos_num), font=("Arial", 8, "bold"), fill=text_color, tags=tag)
                 # Draw quantity below
-                self.canvas.create_text(x, y + 8, text=f"Qty: {quantity}", font=("Arial", 7), fill=text_color)
+                self.canvas.create_text(x, y + 8, text=f"Qty: {quantity}", font=("Arial", 7), fill=text_color, tags=tag)
         else:
             # Just draw the position number
-            self.canvas.create_text(x, y, text=str(pos_num), font=("Arial", 10, "bold"), fill=text_color)
+            self.canvas.create_text(x, y, text=str(pos_num), font=("Arial", 10, "bold"), fill=text_color, tags=tag)
 
     def update_obstacles(self, obstacles):
         """Update the obstacles and redraw the grid"""
         self.obstacles = obstacles.copy() if obstacles else set()
-        
-        # Redraw everything to ensure proper layering
-        self.canvas.delete("all")
-        self.draw_grid()
-        
-        # Redraw obstacles
-        for x, y in self.obstacles:
-            self.draw_cell(x, y, "#000000")  # Black for obstacles
-        
-        # Redraw out-of-stock positions
-        if self.db:
-            for x, y in self.out_of_stock_positions:
-                # Only draw if not an obstacle
-                if (x, y) not in self.obstacles:
-                    self.draw_cell(x, y, "#ff3333", True)  # Bright red
-        
-        # Redraw path if exists
-        if self.path and self.start is not None and self.end is not None and self.points is not None:
-            self.visualize_path(self.path, self.start, self.end, self.points)
+        if self._heatmap is not None:
+            # Obstacles are part of the image; the quantities are already known
+            self.refresh_heatmap(self._heat_quantities)
+        else:
+            self.schedule_render()
 
 class PathfinderGUI:
     def __init__(self, root, rows=10, cols=10):  # Modified to accept dimensions
@@ -224,6 +497,12 @@ class PathfinderGUI:
         # Set default algorithm
         self.algorithm = "bfs"  # Default algorithm
         
+        # Last route found, for export, and the output stream currently writing it
+        self.last_path = None
+        self._path_stream = None
+        # Editor for the last route, so picks can be added or cancelled without replanning
+        self.route_editor = None
+        
         # Create menu bar
         self.create_menu_bar()
         
@@ -255,7 +534,7 @@ class PathfinderGUI:
         ttk.Label(legend_frame, text="Out of Stock").grid(row=3, column=1, padx=5, pady=2, sticky='w')
         
         ttk.Label(legend_frame, text="O", foreground="#ff9933", font=("Arial", 10, "bold")).grid(row=4, column=0, padx=5, pady=2, sticky='w')
-        ttk.Label(legend_frame, text="Low Stock (<2)").grid(row=4, column=1, padx=5, pady=2, sticky='w')
+        ttk.Label(legend_frame, text=f"Low Stock (<{database.LOW_STOCK_THRESHOLD})").grid(row=4, column=1, padx=5, pady=2, sticky='w')
         
         # Create main output area for displaying messages
         self.output_text = tk.Text(root, height=5, width=50)
@@ -287,7 +566,16 @@ class PathfinderGUI:
         
         # initialise database with the same dimensions as the grid
         self.db = database.InventoryDB(rows, cols)
-        self.db.populate_random_data()  # initialise with random stock levels
+        # Restore stock from the last snapshot and journal, or start with random stock levels
+        if not self.db.restore_from_journal():
+            self.db.populate_random_data()
+        
+        # Restore the saved obstacle layout and distance tables
+        self.load_saved_layout()
+        
+        # Remember routes for pick lists that are submitted again, including from earlier sessions
+        self.path_finder.route_cache = spa.RouteCache()
+        self.db.load_route_cache(self.path_finder.route_cache)
 
     def create_menu_bar(self):
         """Create the menu bar with options"""
@@ -297,6 +585,10 @@ class PathfinderGUI:
         # Create File menu
         file_menu = Menu(menu_bar, tearoff=0)
         menu_bar.add_cascade(label="File", menu=file_menu)
+        file_menu.add_command(label="Save Layout", command=self.save_layout)
+        file_menu.add_command(label="Import Layout...", command=self.import_layout)
+        file_menu.add_command(label="Export Route...", command=self.export_route)
+        file_menu.add_separator()
         file_menu.add_command(label="Exit", command=self.root.quit)
         
         # Create Algorithm menu
@@ -317,6 +609,24 @@ class PathfinderGUI:
             value="astar",
             command=self.set_algorithm
         )
+        algorithm_menu.add_radiobutton(
+            label="A* with Landmarks (ALT)", 
+            variable=self.algorithm_var,
+            value="alt",
+            command=self.set_algorithm
+        )
+        algorithm_menu.add_radiobutton(
+            label="Dijkstra (weighted costs)", 
+            variable=self.algorithm_var,
+            value="dijkstra",
+            command=self.set_algorithm
+        )
+        algorithm_menu.add_radiobutton(
+            label="Fewest Turns (travel time)", 
+            variable=self.algorithm_var,
+            value="turns",
+            command=self.set_algorithm
+        )
         
         # Create Options menu
         options_menu = Menu(menu_bar, tearoff=0)
@@ -330,11 +640,66 @@ class PathfinderGUI:
             command=self.toggle_optimisation
         )
         
+        # Create Orders menu
+        orders_menu = Menu(menu_bar, tearoff=0)
+        menu_bar.add_cascade(label="Orders", menu=orders_menu)
+        orders_menu.add_command(label="Plan Pick Waves...", command=self.plan_waves)
+        orders_menu.add_command(label="Plan Multi-Trip Order...", command=self.plan_trips)
+        orders_menu.add_command(label="Edit Current Route...", command=self.edit_route)
+        orders_menu.add_command(label="Low Stock Report", command=self.show_low_stock)
+        orders_menu.add_command(label="Slotting Plan...", command=self.plan_slotting)
+        
         # Create Help menu
         help_menu = Menu(menu_bar, tearoff=0)
         menu_bar.add_cascade(label="Help", menu=help_menu)
         help_menu.add_command(label="About", command=self.show_about)
 
+    def load_saved_layout(self):
+        """Restore obstacles and precomputed distance tables from the database"""
+        layout = self.db.load_layout()
+        if layout is None:
+            return
+        
+        # Only use the layout if it was saved for the same grid size
+        if (layout['rows'], layout['cols']) != (self.grid.rows, self.grid.cols):
+            self.output_text.insert(tk.END, f"Saved layout is for a {layout['rows']}x{layout['cols']} grid, ignoring it\n")
+            return
+        
+        self.grid.load_obstacle_mask(layout['mask'])
+        self.path_finder.load_distance_fields(layout['distance_fields'], layout['layout_hash'])
+        self.output_text.insert(tk.END, f"Loaded saved layout with {len(self.grid.obstacles)} obstacles\n")
+
+    def save_layout(self):
+        """Save obstacles together with the distance tables computed so far"""
+        distance_fields = self.path_finder.cached_distance_fields()
+        self.db.save_layout(self.grid, distance_fields)
+        self.output_text.insert(tk.END, f"Saved layout with {len(distance_fields)} distance tables\n")
+
+    def import_layout(self):
+        """Replace the obstacles with a layout drawn in a CSV file or a PBM/PGM bitmap"""
+        path = filedialog.askopenfilename(
+            title="Import Layout",
+            filetypes=[("Layout files", "*.csv *.pbm *.pgm"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        try:
+            mask = spa.read_layout_file(path, self.grid.rows, self.grid.cols)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Could not import layout: {str(e)}")
+            return
+        
+        self.grid.load_obstacle_mask(mask)
+        self.refresh_obstacles()
+        self.output_text.insert(tk.END, f"Imported layout with {len(self.grid.obstacles)} obstacles\n")
+    
+    def refresh_obstacles(self):
+        """Keep the docks clear, save the layout and redraw once after a batch of obstacle changes"""
+        self.grid.set_obstacles([(0, 0), (self.grid.rows - 1, self.grid.cols - 1)], blocked=False)
+        self.db.save_layout(self.grid)
+        if hasattr(self, 'viz_window') and self.viz_window and self.viz_window.winfo_exists():
+            self.viz_window.update_obstacles(self.grid.obstacles)
+
     def set_algorithm(self):
         """Set the pathfinding algorithm"""
         algorithm = self.algorithm_var.get()
@@ -342,7 +707,10 @@ class PathfinderGUI:
         self.path_finder.set_algorithm(algorithm)
         
         # Display message about algorithm change
-        algorithm_name = "Breadth-First Search" if algorithm == "bfs" else "A* Search"
+        algorithm_names = {"bfs": "Breadth-First Search", "astar": "A* Search", "alt": "A* with Landmarks (ALT)",
+                           "dijkstra": "Dijkstra (weighted costs)",
+                           "turns": f"Fewest Turns (each turn costs {self.path_finder.turn_cost} steps)"}
+        algorithm_name = algorithm_names.get(algorithm, algorithm)
         self.output_text.insert(tk.END, f"Pathfinding algorithm set to: {algorithm_name}\n")
         
     def toggle_optimisation(self):
@@ -391,7 +759,7 @@ class PathfinderGUI:
             return
             
         # Clear previous output
-        self.output_text.delete(1.0, tk.END)
+        self.clear_output()
         self.output_text.insert(tk.END, "Processing path...\n")
         
         # Split input by spaces
@@ -447,6 +815,9 @@ class PathfinderGUI:
             return
             
         # Process valid points for pathfinding
+        reservation_id = None
+        route_cache = self.path_finder.route_cache
+        cache_hits = route_cache.stats['hits'] if route_cache is not None else 0
         try:
             # Define start and end points of the grid
             start_node = (0, 0)
@@ -476,6 +847,15 @@ class PathfinderGUI:
                 path = self.path_finder.find_path_through_points(start_node, [], end_node)
                 valid_points = []  # Empty list for visualisation
             else:
+                # Reserve the stock for the whole pick list before routing
+                picks = Counter(spa.coordinates_to_index(x, y, self.grid.cols) for x, y in valid_points)
+                try:
+                    reservation_id = self.db.reserve_stock(picks)
+                except ValueError as e:
+                    # Short stock, or a bin whose stock is kept per SKU
+                    self.output_text.insert(tk.END, f"Error: {str(e)}\n")
+                    return
+                
                 # Only use optimisation if we have more than 1 point and it's enabled
                 use_optimisation = self.optimise_order and len(valid_points) > 1
                 
@@ -493,27 +873,27 @@ class PathfinderGUI:
                     path = self.path_finder.find_path_through_points(start_node, valid_points, end_node, optimise_order=False)
             
             if path:
-                # Decrement stock for each valid intermediate point
-                for x, y in valid_points:
-                    item_id = spa.coordinates_to_index(x, y, self.grid.cols)
-                    self.db.decrement_quantity(item_id)
+                # The route exists, so the reserved stock is taken for good
+                if reservation_id is not None:
+                    self.db.commit_reservation(reservation_id)
+                    reservation_id = None
                 
                 # Display path length
                 path_length = len(path) - 1
-                self.output_text.delete(1.0, tk.END)
-                self.output_text.insert(tk.END, f"Total path length: {path_length} steps\n")
+                self.clear_output()
+                self.output_text.insert(tk.END, f"Total path length: {path_length} steps with {path.turns()} turns\n")
                 
                 # If optimisation was used, show that in the output
                 if self.optimise_order and len(valid_points) > 1:
                     self.output_text.insert(tk.END, "Point order was optimised for shortest path\n")
+                if route_cache is not None and route_cache.stats['hits'] > cache_hits:
+                    self.output_text.insert(tk.END, f"Route reused from cache (hit rate {route_cache.hit_rate:.0%})\n")
                 
-                # Convert path to position numbers
-                path_indices = [spa.coordinates_to_index(x, y, self.grid.cols) 
-                              for x, y in path]
-                
-                # Show path as position numbers
-                path_str = " -> ".join([str(idx) for idx in path_indices])
-                self.output_text.insert(tk.END, f"Path: {path_str}\n")
+                # Show path as position numbers, streamed in chunks so long routes don't stall Tk
+                self.last_path = path
+                self.route_editor = spa.RouteEditor.from_path(self.path_finder, path, valid_points)
+                self.output_text.insert(tk.END, "Path: ")
+                self.stream_path_text(path)
                 
                 # If visualisation window doesn't exist, create it
                 if not hasattr(self, 'viz_window') or not self.viz_window or not self.viz_window.winfo_exists():
@@ -537,21 +917,300 @@ class PathfinderGUI:
                     self.viz_window.db = self.db
                     self.viz_window.visualize_path(path, start_node, end_node, valid_points)
             else:
-                self.output_text.delete(1.0, tk.END)
-                self.output_text.insert(tk.END, "Error: No valid path found\n")
+                # No route, so hand the reserved stock back
+                if reservation_id is not None:
+                    self.db.release_reservation(reservation_id)
+                    reservation_id = None
+                self.clear_output()
+                unreachable = self.path_finder.last_unreachable
+                if unreachable:
+                    positions = [spa.coordinates_to_index(x, y, self.grid.cols) for x, y in unreachable]
+                    self.output_text.insert(tk.END, f"Error: Positions walled off from the start: {', '.join(map(str, positions))}\n")
+                else:
+                    self.output_text.insert(tk.END, "Error: No valid path found\n")
                 
             # Clear points after finding path
             self.points = []
             
         except Exception as e:
-            self.output_text.delete(1.0, tk.END)
+            if reservation_id is not None:
+                self.db.release_reservation(reservation_id)
+            self.clear_output()
             self.output_text.insert(tk.END, f"Error: {str(e)}\n")
 
+    def clear_output(self):
+        """Empty the output box, stopping any path text still being streamed into it"""
+        self._path_stream = None
+        self.output_text.delete(1.0, tk.END)
+
+    def stream_path_text(self, path):
+        """Insert a path into the output one chunk per event loop pass"""
+        # A newer route replaces the output, so any stream still running stops
+        stream = object()
+        self._path_stream = stream
+        chunks = spa.iter_path_text(path, self.grid.cols)
+        
+        def insert_next():
+            if self._path_stream is not stream:
+                return
+            chunk = next(chunks, None)
+            if chunk is None:
+                self.output_text.insert(tk.END, "\n")
+                return
+            self.output_text.insert(tk.END, chunk)
+            self.root.after(1, insert_next)
+        
+        insert_next()
+
+    def edit_route(self):
+        """Popup for adding an urgent pick to the current route, or cancelling one, without replanning it"""
+        if self.route_editor is None:
+            messagebox.showinfo("Edit Route", "Find a path first")
+            return
+        edit_popup = tk.Toplevel(self.root)
+        edit_popup.title("Edit Current Route")
+        edit_popup.geometry("300x150")
+        
+        ttk.Label(edit_popup, text="Enter the position to add or cancel:", wraplength=250).pack(pady=5)
+        position_entry = ttk.Entry(edit_popup)
+        position_entry.pack(pady=5)
+        
+        def edit(add):
+            try:
+                index = int(position_entry.get())
+            except ValueError:
+                messagebox.showerror("Error", "Please enter a valid number")
+                return
+            if not (1 <= index <= self.grid.rows * self.grid.cols):
+                messagebox.showerror("Error", f"Position {index} out of range (1-{self.grid.rows * self.grid.cols})")
+                return
+            point = spa.index_to_coordinates(index, self.grid.cols)
+            
+            try:
+                if add:
+                    # Take the unit first so a pick is never routed without stock
+                    if self.db.decrement_quantities({index: 1}):
+                        messagebox.showerror("Error", f"Position {index} has no stock")
+                        return
+                    try:
+                        change = self.route_editor.insert_point(point)
+                    except ValueError:
+                        self.db.restock({index: 1})
+                        raise
+                    self.output_text.insert(tk.END, f"Added position {index} to the route (+{change} steps)\n")
+                else:
+                    change = self.route_editor.remove_point(point)
+                    # The cancelled unit goes back on the shelf
+                    self.db.restock({index: 1})
+                    self.output_text.insert(tk.END, f"Cancelled position {index} (-{change} steps)\n")
+            except ValueError as e:
+                messagebox.showerror("Error", str(e))
+                return
+            
+            editor = self.route_editor
+            self.last_path = editor.path()
+            self.output_text.insert(tk.END, f"Total path length: {len(self.last_path) - 1} steps with {self.last_path.turns()} turns\n")
+            if hasattr(self, 'viz_window') and self.viz_window and self.viz_window.winfo_exists():
+                self.viz_window.clear_visualisation()
+                self.viz_window.visualize_path(self.last_path, editor.start, editor.end, editor.points)
+        
+        button_frame = ttk.Frame(edit_popup)
+        button_frame.pack(pady=5)
+        ttk.Button(button_frame, text="Add Pick", command=lambda: edit(True)).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Cancel Pick", command=lambda: edit(False)).pack(side=tk.LEFT, padx=5)
+
+    def export_route(self):
+        """Write the last route to a text file without building it in the output box"""
+        if not self.last_path:
+            messagebox.showinfo("Export Route", "Find a path first")
+            return
+        filename = filedialog.asksaveasfilename(
+            title="Export Route",
+            defaultextension=".txt",
+            filetypes=[("Text files", "*.txt"), ("All files", "*.*")]
+        )
+        if not filename:
+            return
+        try:
+            with open(filename, "w") as f:
+                spa.write_path_text(self.last_path, self.grid.cols, f)
+                # The run-length form robots are commanded in
+                f.write(f"Moves: {self.last_path.moves()}\n")
+            self.output_text.insert(tk.END, f"Exported route of {len(self.last_path) - 1} steps to {filename}\n")
+        except OSError as e:
+            self.output_text.insert(tk.END, f"Error exporting route: {str(e)}\n")
+
+    def plan_waves(self):
+        """Popup for entering several orders and picking them in waves"""
+        wave_popup = tk.Toplevel(self.root)
+        wave_popup.title("Plan Pick Waves")
+        wave_popup.geometry("350x300")
+        
+        ttk.Label(wave_popup, text="Enter one order per line (space-separated positions):", wraplength=320).pack(pady=5)
+        orders_text = tk.Text(wave_popup, height=10, width=40)
+        orders_text.pack(padx=10, pady=5)
+        
+        def do_plan():
+            orders = []
+            for line_number, line in enumerate(orders_text.get(1.0, tk.END).splitlines(), 1):
+                order = []
+                for point_str in line.split():
+                    try:
+                        index = int(point_str)
+                    except ValueError:
+                        self.output_text.insert(tk.END, f"Error: '{point_str}' on line {line_number} is not a valid number\n")
+                        continue
+                    if not (1 <= index <= self.grid.rows * self.grid.cols):
+                        self.output_text.insert(tk.END, f"Error: Position {index} out of range (1-{self.grid.rows * self.grid.cols})\n")
+                        continue
+                    x, y = spa.index_to_coordinates(index, self.grid.cols)
+                    valid, error = spa.validate_point(x, y, self.grid.rows, self.grid.cols, obstacles=self.grid.obstacles)
+                    if not valid:
+                        self.output_text.insert(tk.END, f"Error: Position {index}: {error}\n")
+                        continue
+                    order.append(index)
+                if order:
+                    orders.append(order)
+            
+            if not orders:
+                self.output_text.insert(tk.END, "Error: No valid orders entered\n")
+                return
+            
+            start_node = (0, 0)
+            end_node = (self.grid.rows - 1, self.grid.cols - 1)
+            planner = waves.WavePlanner(self.db, self.path_finder)
+            plan = planner.plan(orders, start_node, end_node)
+            
+            # Take the stock for every routed wave, noting what was picked elsewhere since planning
+            shortfalls = []
+            for number, wave in enumerate(plan.waves, 1):
+                if wave.path:
+                    try:
+                        short = planner.dispatch(wave)
+                    except ValueError as e:
+                        shortfalls.append(f"Wave {number} not picked: {str(e)}")
+                        continue
+                    if short:
+                        shortfalls.append(f"Wave {number} not picked at positions: {', '.join(map(str, sorted(short)))}")
+            
+            self.clear_output()
+            self.output_text.insert(tk.END, plan.summary() + "\n")
+            for line in shortfalls:
+                self.output_text.insert(tk.END, line + "\n")
+            wave_popup.destroy()
+        
+        ttk.Button(wave_popup, text="Plan", command=do_plan).pack(pady=5)
+
+    def plan_trips(self):
+        """Popup for splitting one large order into trips that each fit on the bot"""
+        trip_popup = tk.Toplevel(self.root)
+        trip_popup.title("Plan Multi-Trip Order")
+        trip_popup.geometry("350x300")
+        
+        ttk.Label(trip_popup, text="Enter the positions to pick, repeating a position for each unit:", wraplength=320).pack(pady=5)
+        picks_text = tk.Text(trip_popup, height=8, width=40)
+        picks_text.pack(padx=10, pady=5)
+        
+        capacity_frame = ttk.Frame(trip_popup)
+        capacity_frame.pack(pady=5)
+        ttk.Label(capacity_frame, text="Bot capacity (units):").pack(side=tk.LEFT, padx=5)
+        capacity_var = tk.IntVar(value=10)
+        ttk.Spinbox(capacity_frame, from_=1, to=100, textvariable=capacity_var, width=5).pack(side=tk.LEFT)
+        
+        def do_plan():
+            picks = Counter()
+            for point_str in picks_text.get(1.0, tk.END).split():
+                try:
+                    index = int(point_str)
+                except ValueError:
+                    self.output_text.insert(tk.END, f"Error: '{point_str}' is not a valid number\n")
+                    continue
+                if not (1 <= index <= self.grid.rows * self.grid.cols):
+                    self.output_text.insert(tk.END, f"Error: Position {index} out of range (1-{self.grid.rows * self.grid.cols})\n")
+                    continue
+                x, y = spa.index_to_coordinates(index, self.grid.cols)
+                valid, error = spa.validate_point(x, y, self.grid.rows, self.grid.cols, obstacles=self.grid.obstacles)
+                if not valid:
+                    self.output_text.insert(tk.END, f"Error: Position {index}: {error}\n")
+                    continue
+                picks[index] += 1
+            
+            if not picks:
+                self.output_text.insert(tk.END, "Error: No valid positions entered\n")
+                return
+            try:
+                planner = trips.TripPlanner(self.path_finder, capacity=capacity_var.get())
+            except (ValueError, tk.TclError):
+                self.output_text.insert(tk.END, "Error: Bot capacity must be a whole number of at least 1\n")
+                return
+            
+            # Only plan the units that are in stock, so every trip shown can be picked
+            available = self.db.get_quantities(picks)
+            short = {index: units - available.get(index, 0) for index, units in picks.items()
+                     if units > available.get(index, 0)}
+            picks = Counter({index: min(units, available[index]) for index, units in picks.items()
+                             if available.get(index, 0) > 0})
+            
+            start_node = (0, 0)
+            end_node = (self.grid.rows - 1, self.grid.cols - 1)
+            plan = planner.plan(picks, start_node, end_node)
+            
+            # Reserve the stock for every planned trip in one transaction before showing them
+            taken = Counter()
+            for trip in plan.trips:
+                for (x, y), units in trip.stops:
+                    taken[spa.coordinates_to_index(x, y, self.grid.cols)] += units
+            if taken:
+                try:
+                    self.db.commit_reservation(self.db.reserve_stock(dict(taken)))
+                except database.InsufficientStockError as e:
+                    # Stock was picked elsewhere while planning
+                    self.output_text.insert(tk.END, f"Error: {str(e)}, plan again\n")
+                    return
+                except ValueError as e:
+                    self.output_text.insert(tk.END, f"Error: {str(e)}\n")
+                    return
+            
+            self.clear_output()
+            self.output_text.insert(tk.END, plan.summary(self.grid.cols) + "\n")
+            if short:
+                shortages = ", ".join(f"{index} ({units} short)" for index, units in sorted(short.items()))
+                self.output_text.insert(tk.END, f"Not enough stock at positions: {shortages}\n")
+            trip_popup.destroy()
+        
+        ttk.Button(trip_popup, text="Plan", command=do_plan).pack(pady=5)
+
+    def plan_slotting(self):
+        """Suggest bin swaps that bring the most picked items closer to the docks, and apply them if confirmed"""
+        optimiser = slotting.SlottingOptimiser(self.db, self.path_finder)
+        start_node = (0, 0)
+        end_node = (self.grid.rows - 1, self.grid.cols - 1)
+        plan = optimiser.plan(start_node, end_node)
+        self.clear_output()
+        self.output_text.insert(tk.END, plan.summary() + "\n")
+        if plan.moves and messagebox.askyesno("Slotting Plan", f"Apply {len(plan.moves)} swaps now?"):
+            try:
+                optimiser.apply(plan)
+            except ValueError as e:
+                # Bins whose stock is kept per SKU cannot be swapped as a whole
+                self.output_text.insert(tk.END, f"Error: {str(e)}\n")
+                return
+            self.output_text.insert(tk.END, f"Applied {len(plan.moves)} swaps\n")
+
+    def show_low_stock(self):
+        """List every position that needs restocking"""
+        low_stock = self.db.get_low_stock()
+        if not low_stock:
+            self.output_text.insert(tk.END, "No positions are low on stock\n")
+            return
+        positions = ", ".join(f"{item_id} (qty {quantity})" for item_id, _, _, quantity in low_stock)
+        self.output_text.insert(tk.END, f"Low stock (<{database.LOW_STOCK_THRESHOLD}): {positions}\n")
+
     def clear_all(self):
         # Reset all components to initial state
         self.points = []
         self.point_entry.delete(0, tk.END)
-        self.output_text.delete(1.0, tk.END)
+        self.clear_output()
         self.output_text.insert(tk.END, "Cleared all points\n")
         
         # Clear visualisation but keep window open
@@ -614,29 +1273,10 @@ class PathfinderGUI:
                 def do_update():
                     try:
                         new_qty = int(qty_entry.get())
+                        # The visualisation repaints the changed cell through its stock listener
                         self.db.update_quantity(index, new_qty)
                         self.output_text.insert(tk.END, f"Updated stock for position {index} to {new_qty}\n")
                         
-                        # Update visualisation if window exists
-                        if hasattr(self, 'viz_window') and self.viz_window and self.viz_window.winfo_exists():
-                            x, y = spa.index_to_coordinates(index, self.grid.cols)
-                            
-                            if new_qty == 0:
-                                self.viz_window.out_of_stock_positions.add((x, y))
-                            else:
-                                self.viz_window.out_of_stock_positions.discard((x, y))
-                            
-                            if self.viz_window.path:
-                                self.viz_window.clear_visualisation()
-                                self.viz_window.visualize_path(
-                                    self.viz_window.path,
-                                    self.viz_window.start,
-                                    self.viz_window.end,
-                                    self.viz_window.points
-                                )
-                            else:
-                                self.viz_window.clear_visualisation()
-                        
                         qty_popup.destroy()
                     except ValueError:
                         self.output_text.insert(tk.END, "Error: Please enter a valid number\n")
@@ -675,7 +1315,7 @@ class PathfinderGUI:
         # Create popup for obstacle input
         obstacle_popup = tk.Toplevel(self.root)
         obstacle_popup.title("Obstacle Mode")
-        obstacle_popup.geometry("300x150")
+        obstacle_popup.geometry("300x300")
         
         ttk.Label(
             obstacle_popup, 
@@ -711,9 +1351,8 @@ class PathfinderGUI:
                     self.grid.add_obstacle(x, y)
                     self.output_text.insert(tk.END, f"Added obstacle at position {index}\n")
                 
-                # Update visualization if window exists
-                if hasattr(self, 'viz_window') and self.viz_window and self.viz_window.winfo_exists():
-                    self.viz_window.update_obstacles(self.grid.obstacles)
+                # Persist the new layout so it survives a restart and update the visualisation
+                self.refresh_obstacles()
                 
             except ValueError:
                 messagebox.showerror("Error", "Please enter a valid number")
@@ -724,6 +1363,40 @@ class PathfinderGUI:
             command=toggle_obstacle
         ).pack(pady=5)
         
+        ttk.Label(
+            obstacle_popup, 
+            text="Or enter two corner positions to block or clear a whole area:",
+            wraplength=250
+        ).pack(pady=5)
+        
+        area_entry = ttk.Entry(obstacle_popup)
+        area_entry.pack(pady=5)
+        
+        def set_area(blocked):
+            try:
+                first, second = (int(value) for value in area_entry.get().split())
+            except ValueError:
+                messagebox.showerror("Error", "Please enter two position numbers separated by a space")
+                return
+            for index in (first, second):
+                if not (1 <= index <= self.grid.rows * self.grid.cols):
+                    messagebox.showerror("Error", f"Position {index} out of range (1-{self.grid.rows * self.grid.cols})")
+                    return
+            
+            # The corners can be given in any order
+            (row1, col1), (row2, col2) = (spa.index_to_coordinates(index, self.grid.cols) for index in (first, second))
+            changed = self.grid.set_rectangle(min(row1, row2), min(col1, col2), max(row1, row2), max(col1, col2), blocked)
+            
+            # One save and one redraw for the whole area
+            self.refresh_obstacles()
+            action = "Added" if blocked else "Removed"
+            self.output_text.insert(tk.END, f"{action} {changed} obstacles between positions {first} and {second}\n")
+        
+        area_frame = ttk.Frame(obstacle_popup)
+        area_frame.pack(pady=5)
+        ttk.Button(area_frame, text="Block Area", command=lambda: set_area(True)).pack(side=tk.LEFT, padx=5)
+        ttk.Button(area_frame, text="Clear Area", command=lambda: set_area(False)).pack(side=tk.LEFT, padx=5)
+        
         ttk.Button(
             obstacle_popup, 
             text="Close", 
@@ -740,6 +1413,9 @@ def main():
     root = tk.Tk()
     app = PathfinderGUI(root, rows, cols)
     root.mainloop()
+    # Keep cached routes for the next session
+    app.db.save_route_cache(app.path_finder.route_cache)
+    app.db.close()
 
 if __name__ == "__main__":
     main()
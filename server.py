@@ -0,0 +1,317 @@
+# Asyncio routing service exposing PathFinder and InventoryDB over a local socket
+# Run with: python server.py --rows 10 --cols 10 [--port 8765 | --unix /tmp/stockbot.sock]
+#
+# Endpoints (JSON over HTTP/1.1):
+#   POST /route                          {"points": [12, 45], "optimise": true, "algorithm": "bfs", "time_budget": 0.2}
+#   GET  /stock/<position>
+#   POST /stock/<position>               {"quantity": 5}
+#   POST /reservations                   {"picks": {"12": 2, "45": 1}}
+#   POST /reservations/<id>/commit
+#   POST /reservations/<id>/release
+#   GET  /stats
+import argparse
+import asyncio
+import json
+import logging
+import re
+import signal
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import database
+import spa
+
+# Get the main logger
+logger = logging.getLogger(__name__)
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 422: "Unprocessable Entity", 500: "Internal Server Error"}
+
+# Path finder owned by each worker process, built once by _init_worker
+_worker_path_finder = None
+
+def _init_worker(rows, cols, mask, distance_fields, layout_hash):
+    """Build the worker's own grid and path finder from the server's layout"""
+    global _worker_path_finder
+    logging.getLogger('spa').setLevel(logging.WARNING)
+    grid = spa.Grid(rows, cols)
+    grid.load_obstacle_mask(mask)
+    _worker_path_finder = spa.PathFinder(grid)
+    # Repeated pick lists (standard kits) are answered from the worker's own cache
+    _worker_path_finder.route_cache = spa.RouteCache()
+    if distance_fields:
+        _worker_path_finder.load_distance_fields(distance_fields, layout_hash)
+
+def _route_worker(start, points, end, optimise, algorithm, time_budget):
+    """Run a route search inside a worker process"""
+    _worker_path_finder.set_algorithm(algorithm)
+    return _worker_path_finder.find_path_through_points(start, points, end, optimise_order=optimise,
+                                                        time_budget=time_budget)
+
+class HTTPError(Exception):
+    """Error returned to the client with an HTTP status code"""
+    def __init__(self, status, message, **details):
+        super().__init__(message)
+        self.status = status
+        self.details = details
+
+class RoutingService:
+    def __init__(self, rows, cols, db, workers=None):
+        """Serve routes for a rows x cols grid and stock from db (an InventoryDB with a pool)"""
+        self.grid = spa.Grid(rows, cols)
+        self.db = db
+        self.start_node = (0, 0)
+        self.end_node = (rows - 1, cols - 1)
+
+        # Use the saved obstacle layout when it matches the grid size
+        distance_fields, layout_hash = {}, None
+        layout = db.load_layout()
+        if layout and (layout['rows'], layout['cols']) == (rows, cols):
+            self.grid.load_obstacle_mask(layout['mask'])
+            distance_fields, layout_hash = layout['distance_fields'], layout['layout_hash']
+        # Used here only to turn away walled-off picks before they reach a worker
+        self.path_finder = spa.PathFinder(self.grid)
+        self.grid.component_labels()
+
+        # CPU-bound searches run in worker processes, blocking database calls in threads
+        self.route_executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(rows, cols, bytes(self.grid.obstacle_mask()), distance_fields, layout_hash),
+        )
+        self.db_executor = ThreadPoolExecutor(max_workers=db.pool.size if db.pool else 1)
+
+        # Route searches in progress, so identical concurrent requests share one search
+        self._inflight = {}
+        self.stats = {'requests': 0, 'route_searches': 0, 'coalesced': 0, 'errors': 0}
+
+        self.routes = [
+            ("POST", re.compile(r"^/route$"), self.handle_route),
+            ("GET", re.compile(r"^/stock/(\d+)$"), self.handle_get_stock),
+            ("POST", re.compile(r"^/stock/(\d+)$"), self.handle_update_stock),
+            ("POST", re.compile(r"^/reservations$"), self.handle_reserve),
+            ("POST", re.compile(r"^/reservations/(\d+)/(commit|release)$"), self.handle_settle),
+            ("GET", re.compile(r"^/stats$"), self.handle_stats),
+        ]
+
+    async def run_db(self, function, *args):
+        """Run a blocking InventoryDB call on the database thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.db_executor, function, *args)
+
+    def parse_position(self, value):
+        """Convert a position number to coordinates, rejecting start/end, obstacles and bad input"""
+        try:
+            index = int(value)
+        except (TypeError, ValueError):
+            raise HTTPError(400, f"'{value}' is not a valid position")
+        if not (1 <= index <= self.grid.rows * self.grid.cols):
+            raise HTTPError(400, f"Position {index} out of range (1-{self.grid.rows * self.grid.cols})")
+        x, y = spa.index_to_coordinates(index, self.grid.cols)
+        valid, error = spa.validate_point(x, y, self.grid.rows, self.grid.cols, obstacles=self.grid.obstacles)
+        if not valid:
+            raise HTTPError(400, f"Position {index}: {error}")
+        return x, y
+
+    async def handle_route(self, body):
+        points = [self.parse_position(value) for value in body.get('points', [])]
+        optimise = bool(body.get('optimise', True)) and len(points) > 1
+        algorithm = body.get('algorithm', 'bfs')
+        if algorithm not in spa.ALGORITHMS:
+            raise HTTPError(400, f"Unknown algorithm '{algorithm}'")
+        # Optional cap in seconds on order optimisation, trading route quality for latency
+        time_budget = body.get('time_budget')
+        if time_budget is not None and (not isinstance(time_budget, (int, float)) or time_budget < 0):
+            raise HTTPError(400, "time_budget must be a non-negative number of seconds")
+
+        unreachable = self.path_finder.unreachable_points(self.start_node, points, self.end_node)
+        if unreachable:
+            raise HTTPError(422, "Positions cannot be reached from the start",
+                            positions=[spa.coordinates_to_index(x, y, self.grid.cols) for x, y in unreachable])
+
+        key = (tuple(points), optimise, algorithm, time_budget)
+        future = self._inflight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.route_executor, _route_worker,
+                                          self.start_node, points, self.end_node, optimise, algorithm, time_budget)
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+            self.stats['route_searches'] += 1
+        else:
+            self.stats['coalesced'] += 1
+
+        # Shield the shared search so one client disconnecting does not cancel it for the others
+        path = await asyncio.shield(future)
+        if not path:
+            raise HTTPError(422, "No valid path found")
+        return {
+            'length': len(path) - 1,
+            'path': path.positions(),
+            # Run-length compass moves, the form robots are commanded in
+            'moves': path.moves(),
+        }
+
+    async def handle_get_stock(self, body, position):
+        item_id = int(position)
+        try:
+            quantity = await self.run_db(self.db.get_quantity, item_id)
+        except ValueError as e:
+            raise HTTPError(404, str(e))
+        return {'position': item_id, 'quantity': quantity}
+
+    async def handle_update_stock(self, body, position):
+        item_id = int(position)
+        try:
+            await self.run_db(self.db.update_quantity, item_id, body.get('quantity'))
+        except (TypeError, ValueError) as e:
+            raise HTTPError(400, str(e))
+        return {'position': item_id, 'quantity': body['quantity']}
+
+    async def handle_reserve(self, body):
+        try:
+            picks = {int(position): int(amount) for position, amount in body.get('picks', {}).items()}
+        except (TypeError, ValueError, AttributeError):
+            raise HTTPError(400, "picks must map position numbers to quantities")
+        try:
+            reservation_id = await self.run_db(self.db.reserve_stock, picks)
+        except database.InsufficientStockError as e:
+            raise HTTPError(409, str(e), positions=e.item_ids)
+        except ValueError as e:
+            raise HTTPError(409, str(e))
+        return {'reservation_id': reservation_id}
+
+    async def handle_settle(self, body, reservation_id, action):
+        settle = self.db.commit_reservation if action == "commit" else self.db.release_reservation
+        if not await self.run_db(settle, int(reservation_id)):
+            raise HTTPError(404, f"Reservation {reservation_id} not found")
+        return {'reservation_id': int(reservation_id), 'status': action}
+
+    async def handle_stats(self, body):
+        return {'service': self.stats, 'database_locks': self.db.lock_stats}
+
+    async def dispatch(self, method, target, body):
+        """Find the handler for a request and return (status, payload)"""
+        path = target.split('?', 1)[0]
+        allowed = False
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(path)
+            if not match:
+                continue
+            allowed = True
+            if route_method != method:
+                continue
+            try:
+                data = json.loads(body) if body else {}
+                if not isinstance(data, dict):
+                    raise HTTPError(400, "Request body must be a JSON object")
+                return 200, await handler(data, *match.groups())
+            except json.JSONDecodeError:
+                return 400, {'error': "Request body is not valid JSON"}
+            except HTTPError as e:
+                return e.status, dict({'error': str(e)}, **e.details)
+            except Exception as e:
+                logger.error(f"Error handling {method} {path}: {str(e)}")
+                self.stats['errors'] += 1
+                return 500, {'error': str(e)}
+        if allowed:
+            return 405, {'error': f"{method} not allowed on {path}"}
+        return 404, {'error': f"No endpoint at {path}"}
+
+    async def handle_connection(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection, keeping it open between requests"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                parts = request_line.decode('latin-1').split()
+                length = int(headers.get('content-length', 0) or 0)
+                body = await reader.readexactly(length) if length else b''
+                self.stats['requests'] += 1
+                if len(parts) != 3:
+                    status, payload = 400, {'error': "Malformed request line"}
+                else:
+                    status, payload = await self.dispatch(parts[0], parts[1], body)
+
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def close(self):
+        """Shut down the worker pools"""
+        self.route_executor.shutdown(cancel_futures=True)
+        self.db_executor.shutdown()
+
+async def serve(args):
+    db = database.open_inventory(args.rows, args.cols, args.backend, args.db, pool_size=args.pool_size)
+    # Restore saved stock, or fill a new database so the service has something to serve
+    if not db.restore_from_journal() and db.get_position(1) is None:
+        db.populate_random_data()
+
+    service = RoutingService(args.rows, args.cols, db, workers=args.workers)
+    if args.unix:
+        server = await asyncio.start_unix_server(service.handle_connection, path=args.unix)
+        logger.info(f"StockBot service listening on {args.unix}")
+    else:
+        server = await asyncio.start_server(service.handle_connection, args.host, args.port)
+        logger.info(f"StockBot service listening on http://{args.host}:{args.port}")
+    # Stop cleanly on SIGTERM/SIGINT so the worker processes are shut down too
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(signal_number, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Signal handlers are not available on this platform
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        service.close()
+        db.close()
+        logger.info("StockBot service stopped")
+
+def main():
+    parser = argparse.ArgumentParser(description="StockBot routing service")
+    parser.add_argument("--rows", type=int, default=10)
+    parser.add_argument("--cols", type=int, default=10)
+    parser.add_argument("--db", default="inventory.db", help="SQLite database file")
+    parser.add_argument("--backend", choices=database.BACKENDS, default="sqlite", help="stock storage backend")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="listen on this Unix socket path instead of TCP")
+    parser.add_argument("--workers", type=int, default=None, help="route search processes")
+    parser.add_argument("--pool-size", type=int, default=4, help="database connections")
+    parser.add_argument("--verbose", action="store_true", help="log every search and query")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger('spa').setLevel(logging.WARNING)
+        logging.getLogger('database').setLevel(logging.WARNING)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# Seeded warehouse simulation: runs streams of pick orders through routing and stock headlessly
+# Run with: python simulation.py [--rows 30 --cols 30 --density 0.15 --orders 200] [--output results.json]
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+from collections import Counter
+
+import database
+import spa
+from workloads import percentile, quiet_logging, rack_grid, random_grid
+
+def generate_orders(grid, count, picks_per_order, seed):
+    """
+    Create a reproducible stream of pick orders
+
+    Each order is a list of item IDs (one per unit) drawn from open cells,
+    never the start or end dock. Popular bins are picked more often, following
+    a simple 80/20 split.
+    """
+    rng = random.Random(seed)
+    docks = ((0, 0), (grid.rows - 1, grid.cols - 1))
+    cells = [(row, col) for row in range(grid.rows) for col in range(grid.cols)
+             if not grid.is_obstacle(row, col) and (row, col) not in docks]
+    rng.shuffle(cells)
+    popular = cells[:max(1, len(cells) // 5)]
+
+    orders = []
+    for _ in range(count):
+        order = []
+        for _ in range(rng.randint(1, picks_per_order)):
+            row, col = rng.choice(popular if rng.random() < 0.8 else cells)
+            order.append(spa.coordinates_to_index(row, col, grid.cols))
+        orders.append(order)
+    return orders
+
+def summarise(values):
+    """Mean, percentiles and extremes of a list of numbers"""
+    if not values:
+        return None
+    return {
+        'count': len(values),
+        'mean': sum(values) / len(values),
+        'p50': percentile(values, 0.5),
+        'p90': percentile(values, 0.9),
+        'p99': percentile(values, 0.99),
+        'min': min(values),
+        'max': max(values),
+    }
+
+def git_commit():
+    """Current commit hash so results can be compared between commits, or None outside a checkout"""
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        return result.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def process_order(path_finder, db, order, start, end, optimise, time_budget=None):
+    """
+    Reserve, route and settle one order
+
+    Returns (route_seconds, db_seconds, db_operations, path). route_seconds is
+    None if the stock was short, and path is None if no route was found.
+    """
+    cols = path_finder.grid.cols
+    picks = Counter(order)
+    db_seconds = 0.0
+
+    op_start = time.perf_counter()
+    try:
+        reservation_id = db.reserve_stock(picks)
+    except database.InsufficientStockError:
+        return None, time.perf_counter() - op_start, 1, None
+    db_seconds += time.perf_counter() - op_start
+
+    points = [spa.index_to_coordinates(item_id, cols) for item_id in sorted(picks)]
+    route_start = time.perf_counter()
+    path = path_finder.find_path_through_points(start, points, end, optimise_order=optimise and len(points) > 1,
+                                                time_budget=time_budget)
+    route_seconds = time.perf_counter() - route_start
+
+    op_start = time.perf_counter()
+    if path:
+        db.commit_reservation(reservation_id)
+    else:
+        db.release_reservation(reservation_id)
+    db_seconds += time.perf_counter() - op_start
+    return route_seconds, db_seconds, 2, path
+
+def run_simulation(args):
+    """Run the configured simulation and return the results as a dictionary"""
+    if args.layout == "racks":
+        grid = rack_grid(args.rows, args.cols, args.seed)
+    else:
+        grid = random_grid(args.rows, args.cols, args.density, args.seed)
+    path_finder = spa.PathFinder(grid)
+    path_finder.set_algorithm(args.algorithm)
+    db = database.open_inventory(args.rows, args.cols, args.backend, args.db)
+    orders = generate_orders(grid, args.orders, args.picks, args.seed)
+    start, end = (0, 0), (args.rows - 1, args.cols - 1)
+
+    # Seeded random stock; popular bins can run out, which is recorded as short orders
+    random.seed(args.seed)
+    db.populate_random_data()
+
+    route_latencies = []
+    route_lengths = []
+    db_seconds = 0.0
+    db_operations = 0
+    short_orders = 0
+    failed_routes = 0
+    run_start = time.perf_counter()
+    for order in orders:
+        route_seconds, order_db_seconds, operations, path = process_order(
+            path_finder, db, order, start, end, args.optimise, args.time_budget)
+        db_seconds += order_db_seconds
+        db_operations += operations
+        if route_seconds is None:
+            short_orders += 1
+            continue
+        route_latencies.append(route_seconds * 1000)
+        if path:
+            route_lengths.append(len(path) - 1)
+        else:
+            failed_routes += 1
+    elapsed = time.perf_counter() - run_start
+
+    # Memory is measured on a separate pass so tracing does not distort the timings
+    tracemalloc.start()
+    for order in orders[:args.memory_orders]:
+        process_order(path_finder, db, order, start, end, args.optimise, args.time_budget)
+    _, memory_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    db.close()
+
+    return {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'config': {
+            'rows': args.rows,
+            'cols': args.cols,
+            'layout': args.layout,
+            'density': args.density,
+            'obstacles': len(grid.obstacles),
+            'orders': args.orders,
+            'picks_per_order': args.picks,
+            'algorithm': args.algorithm,
+            'optimise': args.optimise,
+            'time_budget': args.time_budget,
+            'backend': args.backend,
+            'seed': args.seed,
+        },
+        'elapsed_seconds': elapsed,
+        'orders_per_second': len(orders) / elapsed if elapsed else None,
+        'route_latency_ms': summarise(route_latencies),
+        'route_length': summarise(route_lengths),
+        'failed_routes': failed_routes,
+        'short_orders': short_orders,
+        'db_operations': db_operations,
+        'db_operations_per_second': db_operations / db_seconds if db_seconds else None,
+        'db_lock_stats': db.lock_stats,
+        'memory_peak_bytes': memory_peak,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="StockBot warehouse simulation")
+    parser.add_argument("--rows", type=int, default=30)
+    parser.add_argument("--cols", type=int, default=30)
+    parser.add_argument("--layout", choices=("random", "racks"), default="random")
+    parser.add_argument("--density", type=float, default=0.15, help="obstacle density for random layouts")
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--picks", type=int, default=5, help="maximum units per order")
+    parser.add_argument("--algorithm", choices=spa.ALGORITHMS, default="astar")
+    parser.add_argument("--no-optimise", dest="optimise", action="store_false", help="visit picks in order given")
+    parser.add_argument("--time-budget", type=float, help="seconds allowed for each order optimisation")
+    parser.add_argument("--backend", choices=database.BACKENDS, default="array")
+    parser.add_argument("--db", default="simulation.db", help="database file for the sqlite backend")
+    parser.add_argument("--memory-orders", type=int, default=20, help="orders replayed to measure peak memory")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    quiet_logging()
+    results = run_simulation(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    else:
+        print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# SKU resolution: turns orders for SKU codes into picks from the nearest locations that hold stock
+import logging
+from collections import Counter
+
+import spa
+
+# Get the main logger
+logger = logging.getLogger(__name__)
+
+class OrderAllocation:
+    """Where the units of one order come from, and what could not be found"""
+    def __init__(self, allocations, unfilled, unknown):
+        # (code, sku_id, location_id, units, distance) nearest first for each SKU
+        self.allocations = allocations
+        # {code: units} the stock could not cover
+        self.unfilled = unfilled
+        # Codes that are not in the catalogue
+        self.unknown = unknown
+
+    def picks(self):
+        """
+        Units to take per location as {location_id: units}, the form TripPlanner.plan takes
+
+        This is for routing only. Take the stock with SkuResolver.take, which
+        updates the SKU rows and keeps each location's items quantity in step.
+        """
+        picks = Counter()
+        for _, _, location_id, units, _ in self.allocations:
+            picks[location_id] += units
+        return picks
+
+    def stock_picks(self):
+        """Units to take as {(sku_id, location_id): units}, the form take_sku_stock takes"""
+        return {(sku_id, location_id): units for _, sku_id, location_id, units, _ in self.allocations}
+
+    def positions(self):
+        """Distinct locations to visit, in ascending order"""
+        return sorted({location_id for _, _, location_id, _, _ in self.allocations})
+
+    def summary(self):
+        """Human readable report of the allocation"""
+        lines = [f"{code}: {units} from position {location_id} ({distance} steps away)"
+                 for code, _, location_id, units, distance in self.allocations]
+        for code, units in self.unfilled.items():
+            lines.append(f"{code}: {units} units short")
+        if self.unknown:
+            lines.append(f"Unknown SKUs: {', '.join(self.unknown)}")
+        if not lines:
+            lines.append("Nothing to pick")
+        return "\n".join(lines)
+
+class SkuResolver:
+    def __init__(self, db, path_finder):
+        """Resolve SKUs held in db (an InventoryDB or ArrayInventory) using distances from path_finder"""
+        self.db = db
+        self.path_finder = path_finder
+
+    def distances(self, origin):
+        """Travel cost from origin to every cell, from the path finder's cached field for its algorithm"""
+        if self.path_finder.algorithm == "turns":
+            return self.path_finder.turn_field(origin)
+        return self.path_finder.distance_field(origin)
+
+    def resolve(self, order, origin):
+        """Resolve one order, {code: units}, to the locations nearest origin; see resolve_orders"""
+        return self.resolve_orders([order], origin)[0]
+
+    def resolve_orders(self, orders, origin):
+        """
+        Resolve a batch of orders, each {code: units}, to in-stock locations nearest origin
+
+        The whole batch costs two indexed queries (codes to SKU IDs, SKU IDs
+        to stocked locations) and one distance field, however many orders and
+        lines it holds. Each line takes units from its SKU's nearest reachable
+        location first and moves on to the next while it is short. Orders are
+        served in the order given and share the stock, so two orders never
+        count on the same units. Nothing is taken from the database; pass an
+        allocation's stock_picks() to take_sku_stock for that.
+        """
+        for order in orders:
+            for code, units in order.items():
+                if units < 1:
+                    raise ValueError(f"Order line for SKU {code} must be for at least 1 unit")
+        codes = {code for order in orders for code in order}
+        sku_ids = self.db.get_sku_ids(codes)
+        locations = self.db.get_sku_locations(sku_ids.values())
+        field = self.distances(origin)
+
+        # Reachable locations of each SKU, nearest first, with the stock not yet promised to an order
+        candidates = {}
+        for sku_id, stocked in locations.items():
+            reachable = [(field[location_id - 1], location_id, quantity) for location_id, quantity in stocked
+                         if 1 <= location_id <= len(field) and field[location_id - 1] != spa.UNREACHABLE]
+            reachable.sort()
+            candidates[sku_id] = [[distance, location_id, quantity] for distance, location_id, quantity in reachable]
+
+        results = []
+        for order in orders:
+            allocations = []
+            unfilled = {}
+            unknown = []
+            for code, units in order.items():
+                sku_id = sku_ids.get(code)
+                if sku_id is None:
+                    unknown.append(code)
+                    continue
+                for candidate in candidates.get(sku_id, []):
+                    if units == 0:
+                        break
+                    distance, location_id, quantity = candidate
+                    taken = min(units, quantity)
+                    if taken:
+                        allocations.append((code, sku_id, location_id, taken, distance))
+                        candidate[2] -= taken
+                        units -= taken
+                if units:
+                    unfilled[code] = units
+            results.append(OrderAllocation(allocations, unfilled, unknown))
+
+        logger.debug(f"Resolved {sum(len(order) for order in orders)} order lines in {len(orders)} orders "
+                     f"against {len(locations)} stocked SKUs")
+        return results
+
+    def take(self, allocation):
+        """Take an allocation's units from the SKU stock; returns the (sku_id, location_id) keys that were short"""
+        return self.db.take_sku_stock(allocation.stock_picks())
@@ -0,0 +1,139 @@
+# Slotting: moves frequently picked items into the bins that are quickest to reach from the docks
+import logging
+
+import spa
+
+# Get the main logger
+logger = logging.getLogger(__name__)
+
+class SlottingPlan:
+    """Result of slotting: the bin swaps to make and the expected dock distance per pick before and after"""
+    def __init__(self, moves, picks, cost_before, cost_after):
+        # (from_position, to_position, saving) in the order they should be made
+        self.moves = moves
+        self.picks = picks
+        self.cost_before = cost_before
+        self.cost_after = cost_after
+
+    @property
+    def reduction(self):
+        """Fraction of pick travel saved by the plan"""
+        return 1 - self.cost_after / self.cost_before if self.cost_before else 0.0
+
+    def summary(self, limit=20):
+        """Human readable report of the plan, listing at most limit moves"""
+        lines = []
+        for from_position, to_position, saving in self.moves[:limit]:
+            lines.append(f"Swap position {from_position} with {to_position} (saves {saving} steps)")
+        if len(self.moves) > limit:
+            lines.append(f"... and {len(self.moves) - limit} more swaps")
+        if self.picks:
+            lines.append(f"Average distance from a dock per pick: {self.cost_before / self.picks:.1f} steps now, "
+                         f"{self.cost_after / self.picks:.1f} after {len(self.moves)} swaps "
+                         f"({self.reduction:.0%} less)")
+        else:
+            lines.append("No pick history to slot from")
+        return "\n".join(lines)
+
+class SlottingOptimiser:
+    def __init__(self, db, path_finder):
+        """Slot items using the pick history in db (an InventoryDB) and distances from path_finder"""
+        self.db = db
+        self.path_finder = path_finder
+
+    def dock_costs(self, start, end):
+        """
+        Travel cost from every cell to its nearest dock, read from one distance field per dock
+
+        Summing both legs would not do: between opposite corner docks every
+        cell on an open grid costs the same start-to-cell-to-end. Reversing a
+        path swaps which end cell's entry cost is paid, so the cost from a cell
+        to the end dock is field(end)[cell] - cost of the cell + cost of the end.
+        Unreachable cells get None.
+        """
+        grid = self.path_finder.grid
+        if self.path_finder.algorithm == "turns":
+            from_start, from_end = self.path_finder.turn_field(start), self.path_finder.turn_field(end)
+        else:
+            from_start, from_end = self.path_finder.distance_field(start), self.path_finder.distance_field(end)
+        end_cost = grid.get_cost(*end)
+        costs = []
+        for cell in range(grid.rows * grid.cols):
+            reachable = [from_start[cell]] if from_start[cell] != spa.UNREACHABLE else []
+            if from_end[cell] != spa.UNREACHABLE:
+                reachable.append(from_end[cell] - grid.costs[cell] + end_cost)
+            costs.append(min(reachable) if reachable else None)
+        return costs
+
+    def plan(self, start, end, max_moves=None, since=None):
+        """
+        Plan bin swaps so the most picked items sit in the cheapest bins
+
+        Items are ranked by units picked (see InventoryDB.get_pick_counts) and
+        bins by dock cost; pairing them in rank order gives the lowest total
+        travel. The swaps that realise this are made for the busiest items
+        first, so cutting the plan short at max_moves keeps the biggest wins.
+        """
+        cols = self.path_finder.grid.cols
+        velocity = self.db.get_pick_counts(since)
+        costs = self.dock_costs(start, end)
+        # Bins by cost, and where each item currently is (indexed by cell)
+        slots = sorted((cell for cell, cost in enumerate(costs) if cost is not None), key=lambda cell: (costs[cell], cell))
+        items = sorted((item_id - 1 for item_id, units in velocity.items()
+                        if 0 <= item_id - 1 < len(costs) and costs[item_id - 1] is not None),
+                       key=lambda cell: (-velocity[cell + 1], cell))
+        # holder[cell] is the original cell of the item now in cell, location the inverse
+        holder = list(range(len(costs)))
+        location = list(range(len(costs)))
+
+        def units(original_cell):
+            return velocity.get(original_cell + 1, 0)
+
+        cost_before = sum(units(cell) * costs[cell] for cell in items)
+        picks = sum(units(cell) for cell in items)
+        moves = []
+        # Cells whose item is settled, so no later (less busy) item may take them
+        claimed = set()
+        position = 0
+        for item in items:
+            if max_moves is not None and len(moves) >= max_moves:
+                break
+            while True:
+                while slots[position] in claimed:
+                    position += 1
+                slot = slots[position]
+                current = location[item]
+                if costs[current] <= costs[slot]:
+                    # Already in a bin as good as the best one left
+                    claimed.add(current)
+                    break
+                displaced = holder[slot]
+                if units(displaced) >= units(item):
+                    # An item just as busy holds the slot; leave it there and look further
+                    claimed.add(slot)
+                    continue
+                # Swap the item into the slot, sending the slot's item to where it was
+                saving = (units(item) - units(displaced)) * (costs[current] - costs[slot])
+                holder[slot], holder[current] = item, displaced
+                location[item], location[displaced] = slot, current
+                moves.append((current + 1, slot + 1, saving))
+                claimed.add(slot)
+                break
+
+        cost_after = cost_before - sum(saving for _, _, saving in moves)
+        plan = SlottingPlan(moves, picks, cost_before, cost_after)
+        logger.info(f"Slotting plan: {len(moves)} swaps for {len(items)} picked items on a {len(costs) // cols}x{cols} grid, "
+                    f"{plan.reduction:.1%} less travel")
+        return plan
+
+    def apply(self, plan):
+        """
+        Swap the stock of each pair of bins in the plan, all in one transaction
+
+        The journal stays keyed by position, so the moved items' history does
+        not follow them; plan again once new history has built up.
+        """
+        if plan.moves:
+            self.db.swap_quantities([(from_position, to_position) for from_position, to_position, _ in plan.moves])
+        logger.info(f"Applied {len(plan.moves)} slotting swaps")
+        return len(plan.moves)
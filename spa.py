@@ -3,6 +3,15 @@ import logging
 import random  # For genetic algorithm
 import math
 import time
+import heapq  # Priority queues for weighted searches
+import hashlib  # For layout version hashes
+import struct
+import sys
+import csv  # For importing obstacle layouts drawn in a spreadsheet
+import itertools
+import mmap  # For sharing on-disk distance tables between processes
+from array import array  # Compact storage for distance tables
+from collections import Counter, OrderedDict  # Units per route stop; least-recently-used order for the route cache
 
 # Configure logging settings for output formatting
 logging.basicConfig(
@@ -16,6 +25,26 @@ file_handler = logging.FileHandler('stockbot_log.txt')
 file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
 logger.addHandler(file_handler)
 
+# Marker stored in distance tables for cells that cannot be reached
+UNREACHABLE = 0xFFFF
+
+# Cost of a (cell, heading) state the turn-aware search has not reached
+TURN_UNVISITED = 0xFFFFFFFF
+
+# Highest traversal cost a cell can be given
+MAX_CELL_COST = 1000
+
+# Pathfinding algorithms accepted by PathFinder.set_algorithm
+ALGORITHMS = ("bfs", "astar", "alt", "dijkstra", "turns")
+
+# Default time penalty for a 90 degree turn, in units of one normal step
+DEFAULT_TURN_COST = 2
+
+# Distance table file header: magic, format version, rows, cols, cell count, layout hash
+DISTANCE_TABLE_MAGIC = b'SBDT'
+DISTANCE_TABLE_VERSION = 1
+DISTANCE_TABLE_HEADER = struct.Struct('<4sHxxIII20s')
+
 # Grid class represents the warehouse structure
 class Grid:
     def __init__(self, rows_grid, cols_grid):
@@ -26,11 +55,29 @@ class Grid:
         self.grid = [[0 for _ in range(cols_grid)] for _ in range(rows_grid)]
         # Track obstacles
         self.obstacles = set()
+        # Layout version, bumped whenever the obstacles change so cached tables can be invalidated
+        self.version = 0
+        # Cost of entering each cell (1 = normal), indexed by row * cols + col
+        self.costs = array('H', [1]) * (rows_grid * cols_grid)
+        self.max_cost = 1
+        # Bumped whenever the costs change, separately from the obstacle layout
+        self.cost_version = 0
+        # Last layout hash, reused until the obstacles or costs change
+        self._hash_cache = (None, None)
+        # Connected component label of each cell (-1 for obstacles), built on first use and
+        # then kept up to date as obstacles are added and removed
+        self._labels = None
+        self._component_sizes = {}
+        self._next_label = 0
         
     def add_obstacle(self, row, col):
         """Add an obstacle at the specified position"""
         if 0 <= row < self.rows and 0 <= col < self.cols:
-            self.obstacles.add((row, col))
+            if (row, col) not in self.obstacles:
+                self.obstacles.add((row, col))
+                self.version += 1
+                if self._labels is not None:
+                    self._split_components(row, col)
             return True
         return False
         
@@ -38,6 +85,9 @@ class Grid:
         """Remove an obstacle from the specified position"""
         if (row, col) in self.obstacles:
             self.obstacles.remove((row, col))
+            self.version += 1
+            if self._labels is not None:
+                self._merge_components(row, col)
             return True
         return False
         
@@ -45,16 +95,308 @@ class Grid:
         """Check if a position contains an obstacle"""
         return (row, col) in self.obstacles
 
+    def obstacle_mask(self):
+        """Return the obstacles as a bytearray with one byte per cell (1 = obstacle)"""
+        mask = bytearray(self.rows * self.cols)
+        for row, col in self.obstacles:
+            mask[row * self.cols + col] = 1
+        return mask
+
+    def load_obstacle_mask(self, mask):
+        """Replace all obstacles with those set in a one-byte-per-cell mask"""
+        if len(mask) != self.rows * self.cols:
+            raise ValueError(f"Obstacle mask has {len(mask)} cells, expected {self.rows * self.cols}")
+        self.obstacles = {divmod(i, self.cols) for i, blocked in enumerate(mask) if blocked}
+        self.version += 1
+        # A whole new layout is cheaper to relabel from scratch when next needed
+        self._labels = None
+
+    def set_obstacles(self, cells, blocked=True):
+        """
+        Add many obstacles in one batch, or remove them with blocked=False
+        
+        The layout version is bumped once and the component labels are rebuilt
+        when next needed, so cached distance tables and other precomputation are
+        invalidated once per batch rather than once per cell. Returns the number
+        of cells that changed.
+        """
+        cells = set(cells)
+        for row, col in cells:
+            if not (0 <= row < self.rows and 0 <= col < self.cols):
+                raise ValueError(f"Cell {(row, col)} is outside the grid")
+        changed = cells - self.obstacles if blocked else cells & self.obstacles
+        if changed:
+            if blocked:
+                self.obstacles |= changed
+            else:
+                self.obstacles -= changed
+            self.version += 1
+            self._labels = None
+        return len(changed)
+
+    def set_rectangle(self, top, left, bottom, right, blocked=True):
+        """Block or clear every cell from (top, left) to (bottom, right) inclusive, e.g. a rack"""
+        if top > bottom or left > right:
+            raise ValueError(f"Rectangle ({top}, {left})-({bottom}, {right}) is empty")
+        return self.set_obstacles(((row, col) for row in range(top, bottom + 1)
+                                   for col in range(left, right + 1)), blocked)
+
+    def set_rows(self, rows, blocked=True, first_col=0, last_col=None):
+        """Block or clear the span first_col..last_col (default the whole width) of each given row"""
+        if last_col is None:
+            last_col = self.cols - 1
+        return self.set_obstacles(((row, col) for row in rows for col in range(first_col, last_col + 1)), blocked)
+
+    def apply_obstacle_mask(self, mask, blocked=True):
+        """Block (or clear) the cells set in a one-byte-per-cell mask, leaving every other cell as it is"""
+        if len(mask) != self.rows * self.cols:
+            raise ValueError(f"Obstacle mask has {len(mask)} cells, expected {self.rows * self.cols}")
+        return self.set_obstacles((divmod(i, self.cols) for i, set_cell in enumerate(mask) if set_cell), blocked)
+
+    def component_labels(self):
+        """
+        Return the connected component label of every cell, indexed by row * cols + col
+        
+        Cells share a label exactly when a path joins them; obstacles are -1.
+        The labels are built by one flood fill and then updated incrementally.
+        """
+        if self._labels is None:
+            # -2 marks an open cell that has not been labelled yet
+            labels = array('i', [-2]) * (self.rows * self.cols)
+            for row, col in self.obstacles:
+                labels[row * self.cols + col] = -1
+            self._labels = labels
+            self._component_sizes = {}
+            self._next_label = 0
+            for index in range(len(labels)):
+                if labels[index] == -2:
+                    self._component_sizes[self._next_label] = self._flood(index, -2, self._next_label)
+                    self._next_label += 1
+        return self._labels
+
+    def component_of(self, row, col):
+        """Component label of a cell, or None for obstacles and positions outside the grid"""
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            return None
+        label = self.component_labels()[row * self.cols + col]
+        return None if label < 0 else label
+
+    def component_count(self):
+        """Number of separate open regions in the grid"""
+        self.component_labels()
+        return len(self._component_sizes)
+
+    def connected(self, a, b):
+        """True if a path exists between cells a and b, answered without searching"""
+        label = self.component_of(*a)
+        return label is not None and label == self.component_of(*b)
+
+    def _neighbours(self, index):
+        """Flat indices of the cells above, below, left and right of a cell"""
+        row, col = divmod(index, self.cols)
+        if row > 0:
+            yield index - self.cols
+        if row < self.rows - 1:
+            yield index + self.cols
+        if col > 0:
+            yield index - 1
+        if col < self.cols - 1:
+            yield index + 1
+
+    def _flood(self, seed, old_label, new_label):
+        """Relabel the region of old_label cells around seed as new_label, returning its size"""
+        labels = self._labels
+        labels[seed] = new_label
+        stack = [seed]
+        size = 0
+        while stack:
+            index = stack.pop()
+            size += 1
+            for neighbour in self._neighbours(index):
+                if labels[neighbour] == old_label:
+                    labels[neighbour] = new_label
+                    stack.append(neighbour)
+        return size
+
+    def _split_components(self, row, col):
+        """Update the labels after (row, col) became an obstacle, which may cut its component in two"""
+        labels = self._labels
+        index = row * self.cols + col
+        label = labels[index]
+        if label < 0:
+            return
+        labels[index] = -1
+        self._component_sizes[label] -= 1
+        if not self._component_sizes[label]:
+            del self._component_sizes[label]
+            return
+        
+        open_neighbours = [n for n in self._neighbours(index) if labels[n] >= 0]
+        if len(open_neighbours) < 2 or self._locally_connected(row, col):
+            return
+        
+        # Flood out from each neighbour in turn; any neighbour still carrying the
+        # old label afterwards was cut off and becomes a component of its own
+        for neighbour in open_neighbours:
+            if labels[neighbour] == label:
+                new_label = self._next_label
+                self._next_label += 1
+                self._component_sizes[new_label] = self._flood(neighbour, label, new_label)
+        del self._component_sizes[label]
+
+    def _locally_connected(self, row, col):
+        """
+        True if the open cells beside (row, col) are still joined through its eight surrounding cells
+        
+        The ring is walked in order; if every open side neighbour falls in one run
+        of open ring cells, blocking the centre cannot split the component.
+        """
+        ring = [(-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1)]
+        open_cells = [0 <= row + dr < self.rows and 0 <= col + dc < self.cols
+                      and (row + dr, col + dc) not in self.obstacles for dr, dc in ring]
+        # Start the walk just after a blocked cell so no run wraps around the end
+        if all(open_cells):
+            return True
+        first = open_cells.index(False)
+        runs = 0
+        touches_side = False
+        for step in range(1, 9):
+            position = (first + step) % 8
+            if open_cells[position]:
+                # Even positions are the side neighbours; corners only join them
+                touches_side = touches_side or position % 2 == 0
+            else:
+                runs += touches_side
+                touches_side = False
+        return runs <= 1
+
+    def _merge_components(self, row, col):
+        """Update the labels after the obstacle at (row, col) was removed, joining any components it separated"""
+        labels = self._labels
+        index = row * self.cols + col
+        neighbour_labels = {labels[n]: n for n in self._neighbours(index) if labels[n] >= 0}
+        if not neighbour_labels:
+            labels[index] = self._next_label
+            self._component_sizes[self._next_label] = 1
+            self._next_label += 1
+            return
+        
+        # Keep the largest component's label and relabel the smaller ones into it
+        keep = max(neighbour_labels, key=self._component_sizes.get)
+        labels[index] = keep
+        self._component_sizes[keep] += 1
+        for label, neighbour in neighbour_labels.items():
+            if label != keep:
+                self._component_sizes[keep] += self._flood(neighbour, label, keep)
+                del self._component_sizes[label]
+
+    @property
+    def weighted(self):
+        """True if any cell costs more than a normal step"""
+        return self.max_cost > 1
+
+    def get_cost(self, row, col):
+        """Cost of entering the cell at the specified position"""
+        return self.costs[row * self.cols + col]
+
+    def set_cost(self, row, col, cost):
+        """Set the cost of entering one cell, e.g. for a slow or congested aisle"""
+        return self.set_costs({(row, col): cost})
+
+    def set_costs(self, costs):
+        """
+        Update traversal costs in bulk
+        
+        costs is either a mapping of (row, col) to cost, or a sequence with one
+        cost per cell (row * cols + col) replacing every cost at once, as for a
+        live congestion heat-map. Costs must be between 1 and MAX_CELL_COST.
+        """
+        if hasattr(costs, 'items'):
+            for (row, col), cost in costs.items():
+                if not (0 <= row < self.rows and 0 <= col < self.cols):
+                    raise ValueError(f"Cell {(row, col)} is outside the grid")
+                if not (1 <= cost <= MAX_CELL_COST):
+                    raise ValueError(f"Cell cost must be between 1 and {MAX_CELL_COST}")
+                self.costs[row * self.cols + col] = cost
+        else:
+            new_costs = array('H', costs)
+            if len(new_costs) != self.rows * self.cols:
+                raise ValueError(f"Cost map has {len(new_costs)} cells, expected {self.rows * self.cols}")
+            if new_costs and (min(new_costs) < 1 or max(new_costs) > MAX_CELL_COST):
+                raise ValueError(f"Cell cost must be between 1 and {MAX_CELL_COST}")
+            self.costs = new_costs
+        self.max_cost = max(self.costs) if self.costs else 1
+        self.cost_version += 1
+        return True
+
+    def reset_costs(self):
+        """Return every cell to the normal cost of 1"""
+        self.set_costs(array('H', [1]) * (self.rows * self.cols))
+
+    def layout_hash(self):
+        """Return a hash identifying the grid dimensions, obstacle layout and any cell costs"""
+        version = (self.version, self.cost_version)
+        if self._hash_cache[0] == version:
+            return self._hash_cache[1]
+        digest = hashlib.sha1(struct.pack('<II', self.rows, self.cols))
+        digest.update(self.obstacle_mask())
+        # Uniform grids keep the same hash as before costs were introduced
+        if self.weighted:
+            digest.update(pack_distance_field(self.costs))
+        self._hash_cache = (version, digest.hexdigest())
+        return self._hash_cache[1]
+
 # PathFinder class implements the pathfinding algorithm
 class PathFinder:
     def __init__(self, grid_in=None):
         # Store reference to the grid
         self.grid = grid_in
         # Default algorithm
-        self.algorithm = "bfs"  # Options: "bfs", "astar"
+        self.algorithm = "bfs"  # Options: see ALGORITHMS
     
         # Define possible movement directions (up, down, left, right)
         self.directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+        
+        # Cache of distance fields keyed by source cell, valid for a single grid version and cost map
+        self.distance_fields = {}
+        self._fields_version = (grid_in.version, grid_in.cost_version) if grid_in else None
+        
+        # Optional memory-mapped distance table for the storage cells
+        self.distance_table = None
+        self._table_version = None
+        
+        # Landmarks for the ALT heuristic, rebuilt whenever the obstacles change
+        self.landmark_count = 4
+        self.landmarks = []
+        self._landmark_fields = []
+        self._landmark_version = None
+        
+        # Number of nodes expanded by the last A* search, for benchmarking heuristics
+        self.last_expanded = 0
+        
+        # Point order optimiser limits: seconds allowed by default, and generations
+        # without improvement before it stops early
+        self.optimise_time_budget = 5.0
+        self.stall_generations = 25
+        # Vectorised GA settings, used when numpy is installed
+        self.use_numpy = True
+        self.vector_population_size = 2000
+        self.max_vectorised_points = 40
+        # Generations run by the last optimisation, for benchmarking
+        self.last_generations = 0
+        # Whether the last optimisation was cut off by its deadline rather than converging
+        self.last_stopped_early = False
+        
+        # Optional RouteCache consulted by find_path_through_points
+        self.route_cache = None
+        
+        # Extra travel time per 90 degree turn for the "turns" algorithm (a U-turn counts twice),
+        # with its travel-time fields kept apart from the step-count distance fields
+        self.turn_cost = DEFAULT_TURN_COST
+        self.turn_fields = {}
+        self._turn_fields_version = None
+        # Positions that made the last find_path_through_points call fail without searching
+        self.last_unreachable = []
         if grid_in:
             logger.info(f"PathFinder initialised with grid size {grid_in.rows}x{grid_in.cols}")
 
@@ -108,25 +450,64 @@ class PathFinder:
 
     def set_algorithm(self, algorithm):
         """Set the pathfinding algorithm to use"""
-        if algorithm in ["bfs", "astar"]:
+        if algorithm in ALGORITHMS:
             self.algorithm = algorithm
             return True
         return False
     
     def find_path(self, start, end):
         """Find path using the selected algorithm"""
+        # Cells in different components can never be joined, so there is nothing to search
+        if self.grid and not self.grid.connected(start, end):
+            logger.warning(f"No path from {start} to {end}: they are not connected")
+            return None
         if self.algorithm == "astar":
             return self.astar(start, end)
+        elif self.algorithm == "alt":
+            return self.astar(start, end, heuristic=self.alt_heuristic)
+        elif self.algorithm == "turns":
+            return self.turn_path(start, end)
+        elif self.algorithm == "dijkstra" or self.grid.weighted:
+            # BFS only counts steps, so cell costs need Dijkstra
+            return self.dijkstra(start, end)
         else:
             return self.bfs(start, end)
+
+    def turn_path(self, start, end):
+        """
+        Fastest path when every turn costs turn_cost extra steps, as the bots slow down to turn
+        
+        Searches (cell, heading) states, so among equally long paths the one with
+        the fewest turns wins, and a longer path is taken if it saves enough
+        turns. Cell costs are included.
+        """
+        if not self.grid or not self.grid.connected(start, end):
+            return None
+        _, parent, state = turn_search(self.grid, start, self.turn_cost, target=end)
+        if state is None:
+            return None
+        
+        # Follow the parent states back to the start
+        path = []
+        while state != -1:
+            path.append(divmod(state >> 2, self.grid.cols))
+            state = parent[state]
+        path.reverse()
+        logger.info(f"Turn-aware path found with length {len(path)}")
+        return path
+
+    def dijkstra(self, start, end):
+        """Lowest-cost path using the cell costs, searching outwards with no heuristic"""
+        return self.astar(start, end, heuristic=lambda a, b: 0)
     
-    def astar(self, start, end):
+    def astar(self, start, end, heuristic=None):
         """
         A* pathfinding algorithm implementation
         
         Parameters:
         - start: Starting position (row, col)
         - end: End position (row, col)
+        - heuristic: Lower bound function h(a, b), defaults to Manhattan distance
         
         Returns:
         - List of positions forming the path from start to end, or None if no path found
@@ -142,17 +523,20 @@ class PathFinder:
             return None
             
         # Check if start and end are the same
+        self.last_expanded = 0
         if start == end:
             return [start]
+        
+        if heuristic is None:
+            heuristic = self.heuristic
             
         # Priority queue for A* (f_score, position)
-        import heapq
         open_set = []
         heapq.heappush(open_set, (0, start))
         
         # Dictionaries to store g_score and f_score
         g_score = {start: 0}  # Cost from start to current node
-        f_score = {start: self.heuristic(start, end)}  # Estimated total cost
+        f_score = {start: heuristic(start, end)}  # Estimated total cost
         
         # Dictionary to reconstruct path
         came_from = {}
@@ -164,6 +548,10 @@ class PathFinder:
             # Get node with lowest f_score
             current_f, current = heapq.heappop(open_set)
             
+            # Skip stale queue entries for nodes that were already expanded
+            if current in closed_set:
+                continue
+            
             # If we reached the end, reconstruct and return the path
             if current == end:
                 path = [current]
@@ -175,14 +563,18 @@ class PathFinder:
                 
             # Add current to closed set
             closed_set.add(current)
+            self.last_expanded += 1
             
             # Check all neighbors (up, down, left, right)
+            costs = self.grid.costs
+            cols = self.grid.cols
             directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
             for dr, dc in directions:
                 neighbor_row, neighbor_col = current[0] + dr, current[1] + dc
                 
                 # Use validate_point to check if neighbor is valid
-                valid, _ = validate_point(neighbor_row, neighbor_col, self.grid.rows, self.grid.cols, allow_start_end=True)
+                valid, _ = validate_point(neighbor_row, neighbor_col, self.grid.rows, self.grid.cols,
+                                          allow_start_end=True, obstacles=self.grid.obstacles)
                 if not valid:
                     continue
                     
@@ -192,19 +584,18 @@ class PathFinder:
                 if neighbor in closed_set:
                     continue
                     
-                # Calculate tentative g_score
-                tentative_g = g_score[current] + 1  # Assuming uniform cost of 1
+                # Calculate tentative g_score from the cost of entering the neighbour
+                tentative_g = g_score[current] + costs[neighbor_row * cols + neighbor_col]
                 
                 # If neighbor not in open set or has better g_score
                 if neighbor not in g_score or tentative_g < g_score[neighbor]:
                     # Update path and scores
                     came_from[neighbor] = current
                     g_score[neighbor] = tentative_g
-                    f_score[neighbor] = tentative_g + self.heuristic(neighbor, end)
+                    f_score[neighbor] = tentative_g + heuristic(neighbor, end)
                     
-                    # Add to open set if not already there
-                    if neighbor not in [item[1] for item in open_set]:
-                        heapq.heappush(open_set, (f_score[neighbor], neighbor))
+                    # Push the improved entry; any older entry is skipped when popped
+                    heapq.heappush(open_set, (f_score[neighbor], neighbor))
         
         # No path found
         return None
@@ -212,10 +603,153 @@ class PathFinder:
     def heuristic(self, a, b):
         """
         Manhattan distance heuristic for A*
+        
+        Every cell costs at least 1, so this never overestimates on a weighted grid.
         """
         return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+    def select_landmarks(self):
+        """
+        Chooses landmark cells for the ALT heuristic by farthest-point selection
+        
+        The first landmark is the open cell farthest from the start corner; each
+        further landmark is the reachable cell farthest from all landmarks so far.
+        """
+        self.landmarks = []
+        self._landmark_fields = []
+        self._landmark_version = self.grid.version
+        
+        open_cells = [(row, col) for row in range(self.grid.rows) for col in range(self.grid.cols)
+                      if not self.grid.is_obstacle(row, col)]
+        if not open_cells:
+            return []
+        
+        # Landmark fields count steps, ignoring cell costs: a step bound is still a
+        # lower bound on a weighted grid and does not go stale when costs change
+        nearest = compute_distance_field(self.grid, open_cells[0], use_costs=False)
+        while len(self.landmarks) < min(self.landmark_count, len(open_cells)):
+            farthest = max(range(len(nearest)), key=lambda i: -1 if nearest[i] == UNREACHABLE else nearest[i])
+            if nearest[farthest] in (0, UNREACHABLE):
+                break
+            landmark = divmod(farthest, self.grid.cols)
+            field = compute_distance_field(self.grid, landmark, use_costs=False)
+            self.landmarks.append(landmark)
+            self._landmark_fields.append(field)
+            for i, steps in enumerate(field):
+                if steps < nearest[i]:
+                    nearest[i] = steps
+        
+        logger.info(f"Selected ALT landmarks {self.landmarks}")
+        return self.landmarks
+
+    def alt_heuristic(self, a, b):
+        """
+        ALT (A*, landmarks, triangle inequality) heuristic
+        
+        For each landmark L, |d(L, b) - d(L, a)| is a lower bound on d(a, b); the
+        largest bound is used, and never less than the Manhattan distance. Both
+        count steps, so the bound also holds when cells cost more than one step.
+        """
+        if self._landmark_version != self.grid.version:
+            self.select_landmarks()
+        
+        a_index = a[0] * self.grid.cols + a[1]
+        b_index = b[0] * self.grid.cols + b[1]
+        best = abs(a[0] - b[0]) + abs(a[1] - b[1])
+        for field in self._landmark_fields:
+            da = field[a_index]
+            db = field[b_index]
+            if da != UNREACHABLE and db != UNREACHABLE:
+                bound = da - db if da > db else db - da
+                if bound > best:
+                    best = bound
+        return best
+
+    def _check_distance_fields(self):
+        """Drop cached distance fields if the obstacles have changed since they were built"""
+        version = (self.grid.version, self.grid.cost_version)
+        if self._fields_version != version:
+            self.distance_fields = {}
+            self._fields_version = version
+
+    def cached_distance_fields(self):
+        """Return the distance fields that are valid for the current layout"""
+        self._check_distance_fields()
+        return self.distance_fields
+
+    def distance_field(self, source):
+        """
+        Returns the path cost from source to every cell, indexed by row * cols + col
+        
+        The field is computed once per grid layout and cost map and reused for
+        every later query.
+        """
+        self._check_distance_fields()
+        field = self.distance_fields.get(source)
+        if field is None:
+            field = compute_distance_field(self.grid, source)
+            self.distance_fields[source] = field
+        return field
+
+    def turn_field(self, source):
+        """Travel time including turn penalties from source to every cell, cached like distance_field"""
+        version = (self.grid.version, self.grid.cost_version, self.turn_cost)
+        if self._turn_fields_version != version:
+            self.turn_fields = {}
+            self._turn_fields_version = version
+        field = self.turn_fields.get(source)
+        if field is None:
+            field = compute_turn_field(self.grid, source, self.turn_cost)
+            self.turn_fields[source] = field
+        return field
+
+    def distance(self, a, b):
+        """
+        Lowest path cost between two cells (the step count on a uniform grid), or None if no path exists
+        
+        With the "turns" algorithm this is the travel time including turn
+        penalties, so the point order optimiser minimises real travel time.
+        """
+        if self.algorithm == "turns":
+            if not self.grid.connected(a, b):
+                return None
+            steps = self.turn_field(a)[b[0] * self.grid.cols + b[1]]
+            return None if steps == UNREACHABLE else steps
+        # Use the shared on-disk table when both cells are in it and the layout is unchanged
+        if self.distance_table is not None and self._table_version == (self.grid.version, self.grid.cost_version):
+            if a in self.distance_table and b in self.distance_table:
+                return self.distance_table.distance(a, b)
+        if not self.grid.connected(a, b):
+            return None
+        steps = self.distance_field(a)[b[0] * self.grid.cols + b[1]]
+        return None if steps == UNREACHABLE else steps
+
+    def attach_distance_table(self, table):
+        """Use a DistanceTable for distance lookups if it was built for the current layout"""
+        if (table.rows, table.cols) != (self.grid.rows, self.grid.cols) or table.layout_hash != self.grid.layout_hash():
+            logger.warning("Distance table was built for a different layout, ignoring it")
+            return False
+        self.distance_table = table
+        self._table_version = (self.grid.version, self.grid.cost_version)
+        logger.info(f"Attached distance table for {len(table)} storage cells")
+        return True
+
+    def load_distance_fields(self, fields, layout_hash):
+        """
+        Installs precomputed distance fields, e.g. from a saved layout
+        
+        The fields are only used if layout_hash matches the current grid layout.
+        """
+        if layout_hash != self.grid.layout_hash():
+            logger.warning("Saved distance tables do not match the current layout, ignoring them")
+            return False
+        self._check_distance_fields()
+        self.distance_fields.update(fields)
+        logger.info(f"Loaded {len(fields)} precomputed distance tables")
+        return True
     
-    def find_path_through_points(self, start, points, end, optimise_order=False):
+    def find_path_through_points(self, start, points, end, optimise_order=False, time_budget=None,
+                                 on_improvement=None):
         """
         Finds a path that visits all intermediate points
         
@@ -224,38 +758,61 @@ class PathFinder:
         - points: List of intermediate points to visit
         - end: End position
         - optimise_order: Whether to optimise the order of points using genetic algorithm
+        - time_budget: Seconds the optimiser may spend, defaults to optimise_time_budget
+        - on_improvement: Called as on_improvement(order, cost) each time a better order is found
         """
         logger.info(f"Finding path through {len(points)} intermediate points")
         
+        # Reject walled-off picks up front rather than paying for failed searches in every GA leg
+        self.last_unreachable = self.unreachable_points(start, points, end)
+        if self.last_unreachable:
+            logger.warning(f"Cannot reach {len(self.last_unreachable)} position(s) from {start}: {self.last_unreachable}")
+            return None
+        
         if not points:
             logger.warning("No intermediate points provided")
-            return self.bfs(start, end)
+            path = self.bfs(start, end)
+            return Route.from_coordinates(path, self.grid.cols) if path else None
+        
+        # Reuse the stored route for a pick list that has been routed before
+        cache_key = None
+        if self.route_cache is not None:
+            # Turn-aware routes depend on the turn cost as well as the algorithm
+            algorithm = self.algorithm if self.algorithm != "turns" else f"turns/{self.turn_cost}"
+            cache_key = RouteCache.make_key(start, points, end, optimise_order and len(points) > 1,
+                                            algorithm, self.grid.layout_hash())
+            cached = self.route_cache.get(cache_key)
+            if cached is not None:
+                order, path = cached
+                logger.info(f"Route through {len(points)} points served from cache")
+                if on_improvement:
+                    on_improvement(order, self.route_cost(start, order, end))
+                return path
                 
+        # Orders cut short by the time budget are not cached, so a later request
+        # with a bigger budget is not handed a worse route
+        cacheable = True
+        
         # If optimise_order is True, find the optimal order to visit points
         if optimise_order and len(points) > 1:
             try:
-                # Add timeout for optimisation
-                import time
-                start_time = time.time()
+                if time_budget is None:
+                    time_budget = self.optimise_time_budget
+                deadline = time.monotonic() + time_budget
                 
                 # Make a copy of points to avoid modifying the original
-                points_copy = list(points)
-                optimised_points = self.optimise_point_order(start, points_copy, end)
-                
-                # Check if optimisation took too long
-                if time.time() - start_time > 10.0:  # 10 seconds max
-                    logger.warning("Optimisation took too long, using original order")
-                    # Continue with original points
-                else:
-                    points = optimised_points
-                    logger.info(f"Optimised point order: {points}")
+                points = self.optimise_point_order(start, list(points), end, deadline=deadline,
+                                                   on_improvement=on_improvement)
+                logger.info(f"Optimised point order: {points}")
+                cacheable = not self.last_stopped_early
             except Exception as e:
+                cacheable = False
                 logger.error(f"Optimisation failed: {str(e)}")
                 # Continue with original points
                 logger.info("Using original point order")
 
-        # Initialize path construction
-        full_path = []
+        # Initialize path construction, stored compactly as cell indices
+        full_path = Route(self.grid.cols)
         current_start = start
 
         # Find path segments between consecutive points
@@ -278,133 +835,128 @@ class PathFinder:
         else:
             return None
 
+        if cache_key is not None and cacheable:
+            self.route_cache.put(cache_key, points, full_path)
         return full_path
 
-    def optimise_point_order(self, start, points, end):
+    def unreachable_points(self, start, points, end=None):
+        """
+        Returns the points (and end, if given) that no path from start can reach
+        
+        Each check is a comparison of component labels, so no searching is done.
+        If start itself is blocked or outside the grid, every position is returned.
+        """
+        label = self.grid.component_of(*start)
+        positions = list(points) if end is None else list(points) + [end]
+        if label is None:
+            return positions
+        return [point for point in positions if self.grid.component_of(*point) != label]
+
+    def route_cost(self, start, order, end):
+        """Total distance of visiting order between start and end, with a penalty per unreachable leg"""
+        total_length = 0
+        
+        # Legs from start, between consecutive points and to end
+        legs = [start] + order + [end]
+        for i in range(len(legs) - 1):
+            steps = self.distance(legs[i], legs[i + 1])
+            if steps is not None:
+                total_length += steps
+            else:
+                # If no path found, assign a high penalty
+                total_length += 1000
+        return total_length
+
+    def optimise_point_order(self, start, points, end, deadline=None, on_improvement=None):
         """
         Optimizes the order of points to minimize total path length
         using a genetic algorithm approach
+        
+        This is an anytime search: it stops at the deadline (a time.monotonic()
+        value, defaulting to optimise_time_budget from now) or once
+        stall_generations pass without improvement, and returns the best order
+        found so far. on_improvement(order, cost) is called for every new best.
         """
         logger.info("Optimising point order using genetic algorithm")
+        self.last_stopped_early = False
         
         # If only one point, no optimisation needed
         if len(points) <= 1:
             return points
+        
+        if deadline is None:
+            deadline = time.monotonic() + self.optimise_time_budget
+            
+        # Use the vectorised GA when numpy is installed; it can handle more points
+        numpy = _import_numpy() if self.use_numpy else None
+        limit = self.max_vectorised_points if numpy is not None else 10
             
         # Safety check - limit the number of points to optimise
-        if len(points) > 10:
-            logger.warning(f"Too many points ({len(points)}) for optimisation, limiting to first 10")
-            points = points[:10]
+        # The remaining points are visited afterwards in their original order
+        remaining = []
+        if len(points) > limit:
+            logger.warning(f"Too many points ({len(points)}) for optimisation, limiting to first {limit}")
+            points, remaining = points[:limit], points[limit:]
+        
+        if numpy is not None:
+            return self._optimise_order_numpy(numpy, start, points, end, deadline, on_improvement, remaining)
+        
+        # Permutations are of point indices, so repeated points are handled by the crossover
+        def order_of(perm):
+            return [points[i] for i in perm]
+        
+        # The original order is always evaluated, so there is a result even with no time left
+        best_perm = list(range(len(points)))
+        best_cost = self.route_cost(start, order_of(best_perm), end)
+        if on_improvement:
+            on_improvement(order_of(best_perm) + remaining, best_cost)
             
         # Create initial population (different permutations of points)
         population_size = min(50, math.factorial(len(points)))
-        population = []
-        
-        # Add the original order
-        population.append(list(points))
+        population = [best_perm]
         
-        # Add random permutations with a timeout
-        start_time = time.time()
-        timeout = 2.0  # 2 seconds maximum for population generation
-        
-        while len(population) < population_size:
-            # Check for timeout
-            if time.time() - start_time > timeout:
-                logger.warning(f"Timeout reached during population generation, using {len(population)} permutations")
-                break
-                
-            perm = list(points)
+        while len(population) < population_size and time.monotonic() < deadline:
+            perm = list(best_perm)
             random.shuffle(perm)
             if perm not in population:
                 population.append(perm)
-                
-        # Number of generations - reduced for performance
-        generations = min(10, 20 if len(points) <= 5 else 10)
-        
-        # For each generation
-        for gen in range(generations):
-            # Check for timeout - overall optimisation should not take more than 5 seconds
-            if time.time() - start_time > 5.0:
-                logger.warning(f"Timeout reached during optimisation at generation {gen}")
-                break
-                
+        
+        generation = 0
+        stalled = 0
+        while stalled < self.stall_generations:
             # Calculate fitness for each permutation (total path length)
             fitness_scores = []
-            
             for perm in population:
-                try:
-                    # Calculate total path length for this permutation
-                    total_length = 0
-                    
-                    # Path from start to first point
-                    path = self.bfs(start, perm[0])
-                    if path:
-                        total_length += len(path) - 1
-                    else:
-                        # If no path found, assign a high penalty
-                        total_length += 1000
-                    
-                    # Paths between consecutive points
-                    for i in range(len(perm) - 1):
-                        path = self.bfs(perm[i], perm[i + 1])
-                        if path:
-                            total_length += len(path) - 1
-                        else:
-                            # If no path found, assign a high penalty
-                            total_length += 1000
-                    
-                    # Path from last point to end
-                    path = self.bfs(perm[-1], end)
-                    if path:
-                        total_length += len(path) - 1
-                    else:
-                        # If no path found, assign a high penalty
-                        total_length += 1000
-                    
-                    fitness_scores.append((total_length, perm))
-                except Exception as e:
-                    # If any error occurs, assign a high penalty
-                    logger.error(f"Error calculating fitness: {str(e)}")
-                    fitness_scores.append((10000, perm))
+                if time.monotonic() >= deadline:
+                    break
+                fitness_scores.append((self.route_cost(start, order_of(perm), end), perm))
             
             # Sort by fitness (shorter paths are better)
             fitness_scores.sort()
+            if fitness_scores and fitness_scores[0][0] < best_cost:
+                best_cost, best_perm = fitness_scores[0][0], list(fitness_scores[0][1])
+                stalled = 0
+                if on_improvement:
+                    on_improvement(order_of(best_perm) + remaining, best_cost)
+            else:
+                stalled += 1
             
-            # If we have a good solution, stop early
-            if fitness_scores[0][0] < 1000:
-                best_perm = fitness_scores[0][1]
-                logger.info(f"Found good solution at generation {gen}: {best_perm}")
-                return best_perm
+            if time.monotonic() >= deadline:
+                logger.info(f"Deadline reached at generation {generation}, best cost {best_cost}")
+                self.last_stopped_early = True
+                break
+            generation += 1
             
             # Select top performers (elitism)
             elite_size = max(2, population_size // 5)
             new_population = [score[1] for score in fitness_scores[:elite_size]]
             
             # Fill the rest with crossover and mutation
+            tournament_size = 3
             while len(new_population) < population_size:
                 # Select two parents using tournament selection
-                tournament_size = 3
-                parent1 = None
-                parent2 = None
-                
-                # Simple timeout check for tournament selection
-                selection_start = time.time()
-                
-                while parent1 is None or parent2 is None:
-                    if time.time() - selection_start > 0.5:  # Half second timeout
-                        # Just pick random parents if taking too long
-                        parent1 = random.choice(population)
-                        parent2 = random.choice(population)
-                        break
-                        
-                    # Tournament selection
-                    tournament = random.sample(fitness_scores, min(tournament_size, len(fitness_scores)))
-                    tournament.sort()
-                    
-                    if parent1 is None:
-                        parent1 = tournament[0][1]
-                    else:
-                        parent2 = tournament[0][1]
+                parent1 = min(random.sample(fitness_scores, min(tournament_size, len(fitness_scores))))[1]
+                parent2 = min(random.sample(fitness_scores, min(tournament_size, len(fitness_scores))))[1]
                 
                 # Perform crossover (ordered crossover)
                 try:
@@ -412,9 +964,7 @@ class PathFinder:
                     
                     # Perform mutation with low probability
                     if random.random() < 0.1:
-                        # Swap mutation - swap two random positions
-                        idx1, idx2 = random.sample(range(len(child)), 2)
-                        child[idx1], child[idx2] = child[idx2], child[idx1]
+                        self._mutate(child)
                     
                     new_population.append(child)
                 except Exception as e:
@@ -425,13 +975,109 @@ class PathFinder:
             # Update population for next generation
             population = new_population
         
-        # Return the best permutation found
-        if fitness_scores:
-            return fitness_scores[0][1]
-        else:
-            # If something went wrong, return original order
-            logger.warning("Optimisation failed, returning original order")
-            return points
+        self.last_generations = generation
+        logger.info(f"Best order after {generation} generations has cost {best_cost}")
+        return order_of(best_perm) + remaining
+
+    def distance_matrix(self, cells):
+        """Distances between every pair of cells as a list of rows, with 1000 for unreachable pairs"""
+        matrix = []
+        for a in cells:
+            row = []
+            for b in cells:
+                steps = self.distance(a, b)
+                row.append(1000 if steps is None else steps)
+            matrix.append(row)
+        return matrix
+
+    def _optimise_order_numpy(self, numpy, start, points, end, deadline, on_improvement, remaining):
+        """
+        Genetic algorithm over a whole population at once using numpy
+        
+        The population is a 2-D array of permutations of node numbers (0 is the
+        start, 1..n the points, n + 1 the end). Fitness is one gather-and-sum
+        over the distance matrix, and selection, ordered crossover and swap
+        mutation are applied to every child in the same array operations.
+        """
+        n = len(points)
+        matrix = numpy.array(self.distance_matrix([start] + points + [end]), dtype=numpy.int64)
+        # Seeded from random so random.seed() keeps runs reproducible
+        rng = numpy.random.default_rng(random.getrandbits(64))
+        
+        def fitness(population):
+            return (matrix[0, population[:, 0]]
+                    + matrix[population[:, :-1], population[:, 1:]].sum(axis=1)
+                    + matrix[population[:, -1], n + 1])
+        
+        def order_of(perm):
+            return [points[node - 1] for node in perm]
+        
+        # The original order is always evaluated, so there is a result even with no time left
+        identity = numpy.arange(1, n + 1)
+        best_perm = identity
+        best_cost = int(fitness(identity[None, :])[0])
+        if on_improvement:
+            on_improvement(order_of(best_perm) + remaining, best_cost)
+        
+        # Initial population: the original order plus random permutations
+        population_size = min(self.vector_population_size, math.factorial(n))
+        population = numpy.argsort(rng.random((population_size, n)), axis=1) + 1
+        population[0] = identity
+        elite_size = max(2, population_size // 5)
+        children = population_size - elite_size
+        rows = numpy.arange(children)[:, None]
+        positions = numpy.arange(n)
+        
+        generation = 0
+        stalled = 0
+        while stalled < self.stall_generations:
+            scores = fitness(population)
+            ranking = numpy.argsort(scores, kind='stable')
+            if scores[ranking[0]] < best_cost:
+                best_cost, best_perm = int(scores[ranking[0]]), population[ranking[0]].copy()
+                stalled = 0
+                if on_improvement:
+                    on_improvement(order_of(best_perm) + remaining, best_cost)
+            else:
+                stalled += 1
+            
+            if time.monotonic() >= deadline:
+                logger.info(f"Deadline reached at generation {generation}, best cost {best_cost}")
+                self.last_stopped_early = True
+                break
+            generation += 1
+            
+            # Tournament selection of both parents of every child, three contenders each
+            contenders = rng.integers(population_size, size=(2, children, 3))
+            winners = numpy.take_along_axis(contenders, scores[contenders].argmin(axis=2)[..., None], axis=2)[..., 0]
+            parent1 = population[winners[0]]
+            parent2 = population[winners[1]]
+            
+            # Ordered crossover: keep a segment of parent1 and fill the other slots
+            # with the remaining nodes in parent2's order. A stable argsort moves the
+            # free slots and the unused parent2 nodes to the front, in order, so they
+            # line up; the segment slots are then overwritten from parent1.
+            cuts = numpy.sort(rng.integers(n, size=(children, 2)), axis=1)
+            in_segment = (positions >= cuts[:, :1]) & (positions <= cuts[:, 1:])
+            taken = numpy.zeros((children, n + 1), dtype=bool)
+            taken[rows, parent1] = in_segment
+            unused = numpy.take_along_axis(parent2, numpy.argsort(taken[rows, parent2], axis=1, kind='stable'), axis=1)
+            slots = numpy.argsort(in_segment, axis=1, kind='stable')
+            offspring = numpy.empty_like(parent1)
+            offspring[rows, slots] = unused
+            offspring = numpy.where(in_segment, parent1, offspring)
+            
+            # Swap mutation on about one child in ten
+            mutants = numpy.nonzero(rng.random(children) < 0.1)[0]
+            first = rng.integers(n, size=len(mutants))
+            second = rng.integers(n, size=len(mutants))
+            offspring[mutants, first], offspring[mutants, second] = offspring[mutants, second], offspring[mutants, first]
+            
+            population = numpy.concatenate([population[ranking[:elite_size]], offspring])
+        
+        self.last_generations = generation
+        logger.info(f"Best order after {generation} generations of {population_size} has cost {best_cost}")
+        return order_of(best_perm.tolist()) + remaining
             
     def ordered_crossover(self, parent1, parent2):
         """
@@ -447,27 +1093,13 @@ class PathFinder:
         for i in range(start, end + 1):
             child[i] = parent1[i]
         
-        # Fill remaining positions with values from parent2 in order
-        parent2_idx = 0
+        # Fill remaining positions with values from parent2 in order, using a set
+        # so each membership check is O(1)
+        taken = set(parent1[start:end + 1])
+        unused = (value for value in parent2 if value not in taken)
         for i in range(size):
             if child[i] is None:
-                # Find next value from parent2 that's not already in child
-                while parent2[parent2_idx] in child:
-                    parent2_idx += 1
-                    if parent2_idx >= size:
-                        # This shouldn't happen with valid permutations, but just in case
-                        remaining = [p for p in parent2 if p not in child]
-                        if remaining:
-                            child[i] = remaining[0]
-                            break
-                        else:
-                            # Emergency fallback - should never reach here
-                            child[i] = parent2[0]
-                            break
-                
-                if child[i] is None:  # Still None, means we didn't break from the while loop
-                    child[i] = parent2[parent2_idx]
-                    parent2_idx += 1
+                child[i] = next(unused)
         
         return child
     
@@ -478,6 +1110,762 @@ class PathFinder:
         permutation[idx1], permutation[idx2] = permutation[idx2], permutation[idx1]
 
 
+class Route:
+    """
+    A path stored as cell indices (row * cols + col) in an array('I')
+    
+    It can be used like a list of (row, col) cells (len, indexing, slicing and
+    iteration) but keeps 4 bytes per step, building coordinates only when they
+    are read. moves() gives the run-length form sent to robots, e.g. "N3 E7 S2".
+    """
+    __slots__ = ('cols', 'cells')
+    
+    def __init__(self, cols, cells=()):
+        self.cols = cols
+        self.cells = array('I', cells)
+    
+    @classmethod
+    def from_coordinates(cls, path, cols):
+        """Build a route from a list of (row, col) cells"""
+        return cls(cols, (row * cols + col for row, col in path))
+    
+    @classmethod
+    def from_bytes(cls, data, cols):
+        """Load a route saved by to_bytes"""
+        route = cls(cols)
+        route.cells.frombytes(data)
+        if sys.byteorder != 'little':
+            route.cells.byteswap()
+        return route
+    
+    @classmethod
+    def from_moves(cls, start, moves, rows, cols):
+        """Rebuild a route on a rows x cols grid from its start cell and run-length moves as given by moves()"""
+        steps = {'N': (-1, 0), 'S': (1, 0), 'E': (0, 1), 'W': (0, -1)}
+        row, col = start
+        if not (0 <= row < rows and 0 <= col < cols):
+            raise ValueError(f"Start {start} is outside the {rows}x{cols} grid")
+        route = cls(cols, [row * cols + col])
+        for move in moves.split():
+            letter, count = move[:1].upper(), move[1:]
+            if letter not in steps or not count.isdigit():
+                raise ValueError(f"Invalid move '{move}'")
+            d_row, d_col = steps[letter]
+            for _ in range(int(count)):
+                row, col = row + d_row, col + d_col
+                if not (0 <= row < rows and 0 <= col < cols):
+                    raise ValueError(f"Move '{move}' leaves the grid")
+                route.cells.append(row * cols + col)
+        return route
+    
+    def to_bytes(self):
+        """Serialise the route as little-endian uint32 cell indices"""
+        cells = array('I', self.cells)
+        if sys.byteorder != 'little':
+            cells.byteswap()
+        return cells.tobytes()
+    
+    def moves(self):
+        """Run-length compass moves along the route, e.g. "N3 E7 S2" (empty for a single cell)"""
+        # Later keys win, so a one-column grid reads +1 as south
+        letters = {1: 'E', -1: 'W', -self.cols: 'N', self.cols: 'S'}
+        runs = []
+        letter, count = None, 0
+        for current, following in zip(self.cells, itertools.islice(self.cells, 1, None)):
+            step = letters.get(following - current)
+            if step is None:
+                raise ValueError(f"Route jumps from cell {current} to {following}")
+            if step == letter:
+                count += 1
+            else:
+                if letter:
+                    runs.append(f"{letter}{count}")
+                letter, count = step, 1
+        if letter:
+            runs.append(f"{letter}{count}")
+        return " ".join(runs)
+    
+    def turns(self):
+        """
+        Quarter turns along the route, counting a reversal as two
+
+        This matches turn_search, which charges a U-turn twice the turn cost.
+        """
+        turns = 0
+        heading = None
+        for current, following in zip(self.cells, itertools.islice(self.cells, 1, None)):
+            step = following - current
+            if heading is not None and step != heading:
+                turns += 2 if step == -heading else 1
+            heading = step
+        return turns
+    
+    def travel_time(self, turn_cost, costs=None):
+        """Cost of driving the route: one per step (or the entry cost of each cell in costs) plus turn_cost per quarter turn"""
+        if costs is None:
+            entry = len(self.cells) - 1 if self.cells else 0
+        else:
+            entry = sum(costs[index] for index in itertools.islice(self.cells, 1, None))
+        return entry + self.turns() * turn_cost
+    
+    def positions(self):
+        """Position numbers (1-based, as shown to users) along the route"""
+        return [index + 1 for index in self.cells]
+    
+    def extend(self, path):
+        """Append the cells of another Route or a list of (row, col) cells"""
+        if isinstance(path, Route) and path.cols == self.cols:
+            self.cells.extend(path.cells)
+        else:
+            self.cells.extend(row * self.cols + col for row, col in path)
+    
+    def copy(self):
+        return Route(self.cols, self.cells)
+    
+    def __len__(self):
+        return len(self.cells)
+    
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return Route(self.cols, self.cells[key])
+        return divmod(self.cells[key], self.cols)
+    
+    def __iter__(self):
+        cols = self.cols
+        for index in self.cells:
+            yield divmod(index, cols)
+    
+    def __eq__(self, other):
+        if isinstance(other, Route):
+            return self.cols == other.cols and self.cells == other.cells
+        if isinstance(other, (list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+    
+    __hash__ = None
+    
+    def __repr__(self):
+        return f"Route({len(self.cells)} cells: {self.moves()!r})"
+
+class RouteEditor:
+    """
+    An ordered route from start through picks to end, kept as one path per leg
+    
+    Picks can be inserted at their cheapest position or cancelled while the
+    route is being driven. Only the legs next to the change are searched
+    again. Choosing the position reads one distance field, from the new pick,
+    so an edit costs at most one field and two leg searches.
+    """
+    def __init__(self, path_finder, start, points, end, path=None, units=None):
+        """
+        Parameters:
+        - path_finder: PathFinder used for distances and leg searches
+        - start, end: Route end points
+        - points: Picks in visiting order
+        - path: The route already found through those points, split into legs
+          instead of searching them again
+        - units: Units to take at each pick as {point: units}, one each by default
+        """
+        self.path_finder = path_finder
+        self.start = start
+        self.end = end
+        self.points = list(points)
+        self.units = Counter(units) if units is not None else Counter(self.points)
+        # Picks already collected; the route cannot change before them
+        self.visited = 0
+        
+        stops = self.stops()
+        if path is None:
+            self.legs = [self._search_leg(stops[i], stops[i + 1]) for i in range(len(stops) - 1)]
+        else:
+            self.legs = self._split_path(path, stops)
+        self.leg_costs = [self.leg_cost(leg) for leg in self.legs]
+    
+    @classmethod
+    def from_path(cls, path_finder, path, points):
+        """Edit a route returned by find_path_through_points, visiting points in the order the path reaches them"""
+        cols = path_finder.grid.cols
+        cells = path.cells if isinstance(path, Route) else array('I', (row * cols + col for row, col in path))
+        units = Counter(points)
+        order = sorted(units, key=lambda point: cells.index(point[0] * cols + point[1]))
+        return cls(path_finder, path[0], order, path[-1], path=path, units=units)
+    
+    def stops(self):
+        return [self.start] + self.points + [self.end]
+    
+    @property
+    def cost(self):
+        return sum(self.leg_costs)
+    
+    def path(self):
+        """The whole route as one Route"""
+        route = self.legs[0].copy()
+        for leg in self.legs[1:]:
+            route.cells.extend(leg.cells[1:])
+        return route
+    
+    def leg_cost(self, leg):
+        """Cost of driving one leg: cell entry costs, plus turn penalties with the "turns" algorithm"""
+        turn_cost = self.path_finder.turn_cost if self.path_finder.algorithm == "turns" else 0
+        return leg.travel_time(turn_cost, self.path_finder.grid.costs)
+    
+    def distances_to(self, point, stops):
+        """
+        Path cost from each stop to point, read from the single field of point
+        
+        Reversing a path swaps which end cell's entry cost is paid and keeps
+        its turns, so cost(a, p) = cost(p, a) - cost of a + cost of p.
+        """
+        grid = self.path_finder.grid
+        point_cost = grid.get_cost(*point)
+        distances = []
+        for stop in stops:
+            steps = self.path_finder.distance(point, stop)
+            distances.append(None if steps is None else steps - grid.get_cost(*stop) + point_cost)
+        return distances
+    
+    def mark_visited(self, count=1):
+        """Record that the next count picks have been collected"""
+        self.visited = min(len(self.points), self.visited + count)
+    
+    def insert_point(self, point):
+        """
+        Add a unit to pick at the position that lengthens the remaining route least
+        
+        A point already waiting on the route just takes one more unit there.
+        Returns the added cost. Raises ValueError if the pick cannot be reached.
+        """
+        if point in self.points[self.visited:]:
+            self.units[point] += 1
+            logger.info(f"Added a unit at {point}, now {self.units[point]}")
+            return 0
+        if self.path_finder.unreachable_points(self.start, [point]):
+            raise ValueError(f"Position {point} cannot be reached")
+        stops = self.stops()
+        # Only legs after the last collected pick can change
+        first_leg = self.visited
+        from_stops = self.distances_to(point, stops[first_leg:-1])
+        best_leg, best_added = None, None
+        for offset, to_point in enumerate(from_stops):
+            leg = first_leg + offset
+            from_point = self.path_finder.distance(point, stops[leg + 1])
+            if to_point is None or from_point is None:
+                continue
+            added = to_point + from_point - self.leg_costs[leg]
+            if best_added is None or added < best_added:
+                best_leg, best_added = leg, added
+        if best_leg is None:
+            raise ValueError(f"Position {point} cannot be reached")
+        
+        # Replace the one leg with two, searching just those
+        new_legs = [self._search_leg(stops[best_leg], point), self._search_leg(point, stops[best_leg + 1])]
+        self.legs[best_leg:best_leg + 1] = new_legs
+        self.leg_costs[best_leg:best_leg + 1] = [self.leg_cost(leg) for leg in new_legs]
+        self.points.insert(best_leg, point)
+        self.units[point] = 1
+        logger.info(f"Inserted {point} as stop {best_leg + 1}, adding {best_added}")
+        return best_added
+    
+    def remove_point(self, point):
+        """
+        Cancel one unit of a pick that has not been collected yet
+        
+        The stop is only dropped, joining the legs either side, once its last
+        unit is cancelled. Returns the cost saved. Raises ValueError if the
+        pick is not waiting on the route.
+        """
+        try:
+            index = self.points.index(point, self.visited)
+        except ValueError:
+            raise ValueError(f"Position {point} is not a pending pick on this route")
+        if self.units[point] > 1:
+            self.units[point] -= 1
+            logger.info(f"Cancelled a unit at {point}, {self.units[point]} left")
+            return 0
+        stops = self.stops()
+        new_leg = self._search_leg(stops[index], stops[index + 2])
+        new_cost = self.leg_cost(new_leg)
+        saved = self.leg_costs[index] + self.leg_costs[index + 1] - new_cost
+        self.legs[index:index + 2] = [new_leg]
+        self.leg_costs[index:index + 2] = [new_cost]
+        del self.points[index]
+        del self.units[point]
+        logger.info(f"Removed {point}, saving {saved}")
+        return saved
+    
+    def _search_leg(self, a, b):
+        path = self.path_finder.find_path(a, b)
+        if not path:
+            raise ValueError(f"No path from {a} to {b}")
+        return Route.from_coordinates(path, self.path_finder.grid.cols)
+    
+    def _split_path(self, path, stops):
+        """Cut a whole route into one Route per leg at the stops"""
+        cols = self.path_finder.grid.cols
+        cells = path.cells if isinstance(path, Route) else array('I', (row * cols + col for row, col in path))
+        if not cells or cells[0] != stops[0][0] * cols + stops[0][1]:
+            raise ValueError("Path does not begin at the start")
+        if cells[-1] != stops[-1][0] * cols + stops[-1][1]:
+            raise ValueError("Path does not finish at the end")
+        legs = []
+        begin = 0
+        for number, (row, col) in enumerate(stops[1:], 1):
+            # The last leg runs to the end of the path even if it crossed the end cell earlier
+            try:
+                finish = len(cells) - 1 if number == len(stops) - 1 else cells.index(row * cols + col, begin)
+            except ValueError:
+                raise ValueError(f"Path does not pass through {(row, col)} in order")
+            legs.append(Route(cols, cells[begin:finish + 1]))
+            begin = finish
+        return legs
+
+class RouteCache:
+    """
+    Least-recently-used cache of routes through a list of pick cells
+    
+    Keys combine the pick cells (sorted when the order is optimised, since any
+    ordering of the same picks gives the same route), start, end, algorithm and
+    layout hash, so changing obstacles or costs never returns a stale route.
+    Entries are evicted beyond max_entries or once older than max_age seconds.
+    """
+    def __init__(self, max_entries=256, max_age=3600.0):
+        self.max_entries = max_entries
+        self.max_age = max_age  # None keeps entries until they are evicted by size
+        # key -> (created timestamp, point order, full path), least recently used first
+        self._entries = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0}
+
+    @staticmethod
+    def make_key(start, points, end, optimise_order, algorithm, layout_hash):
+        """Build the cache key for a route request"""
+        cells = tuple(sorted(points)) if optimise_order else tuple(points)
+        return (tuple(start), cells, tuple(end), bool(optimise_order), algorithm, layout_hash)
+
+    def get(self, key):
+        """Return (order, path) for key, or None if it is not cached or has expired"""
+        entry = self._entries.get(key)
+        if entry is not None and self.max_age is not None and time.time() - entry[0] > self.max_age:
+            del self._entries[key]
+            self.stats['expired'] += 1
+            entry = None
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats['hits'] += 1
+        return list(entry[1]), entry[2].copy()
+
+    def put(self, key, order, path, created=None):
+        """Store a route (a Route or list of cells), evicting the least recently used entries beyond max_entries"""
+        self._entries[key] = (time.time() if created is None else created, list(order), path.copy())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def entries(self):
+        """Every entry as (key, created, order, path), least recently used first"""
+        return [(key, created, order, path) for key, (created, order, path) in self._entries.items()]
+
+    @property
+    def hit_rate(self):
+        """Fraction of lookups answered from the cache"""
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups else 0.0
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+def _import_numpy():
+    """Return the numpy module, or None if it is not installed"""
+    try:
+        import numpy
+        return numpy
+    except ImportError:
+        return None
+
+def compute_distance_field(grid, source, use_costs=True):
+    """
+    Returns the path cost from source to every cell as an array('H')
+    
+    Uniform grids (or use_costs=False) use a breadth-first flood fill counting
+    steps; weighted grids use Dijkstra over the cell costs. Costs are clamped
+    to stay below UNREACHABLE.
+    """
+    rows, cols = grid.rows, grid.cols
+    field = array('H', [UNREACHABLE]) * (rows * cols)
+    blocked = grid.obstacle_mask()
+    start = source[0] * cols + source[1]
+    if not (0 <= source[0] < rows and 0 <= source[1] < cols) or blocked[start]:
+        return field
+    if use_costs and grid.weighted:
+        return _weighted_distance_field(grid, start, blocked, field)
+    
+    # Expand one BFS level at a time; seen starts as the obstacle mask so
+    # obstacles and visited cells are rejected by a single byte lookup
+    seen = bytearray(blocked)
+    seen[start] = 1
+    field[start] = 0
+    frontier = [start]
+    size = rows * cols
+    steps = 0
+    limit = UNREACHABLE - 1
+    while frontier:
+        # Long serpentine layouts can need more steps than fit in an 'H'
+        steps = min(steps + 1, limit)
+        next_frontier = []
+        append = next_frontier.append
+        for current in frontier:
+            col = current % cols
+            neighbour = current - cols
+            if neighbour >= 0 and not seen[neighbour]:
+                seen[neighbour] = 1
+                append(neighbour)
+            neighbour = current + cols
+            if neighbour < size and not seen[neighbour]:
+                seen[neighbour] = 1
+                append(neighbour)
+            if col > 0 and not seen[current - 1]:
+                seen[current - 1] = 1
+                append(current - 1)
+            if col < cols - 1 and not seen[current + 1]:
+                seen[current + 1] = 1
+                append(current + 1)
+        for cell in next_frontier:
+            field[cell] = steps
+        frontier = next_frontier
+    return field
+
+def _weighted_distance_field(grid, start, blocked, field):
+    """Dijkstra from the start index, filling field with clamped path costs"""
+    cols = grid.cols
+    size = grid.rows * cols
+    costs = grid.costs
+    limit = UNREACHABLE - 1
+    # Exact costs while searching; field only receives the clamped values
+    best = {start: 0}
+    done = bytearray(blocked)
+    heap = [(0, start)]
+    while heap:
+        cost, current = heapq.heappop(heap)
+        if done[current]:
+            continue
+        done[current] = 1
+        field[current] = cost if cost < limit else limit
+        col = current % cols
+        for neighbour in (current - cols, current + cols,
+                          current - 1 if col > 0 else -1,
+                          current + 1 if col < cols - 1 else -1):
+            if 0 <= neighbour < size and not done[neighbour]:
+                new_cost = cost + costs[neighbour]
+                if new_cost < best.get(neighbour, new_cost + 1):
+                    best[neighbour] = new_cost
+                    heapq.heappush(heap, (new_cost, neighbour))
+    return field
+
+def turn_search(grid, source, turn_cost, target=None):
+    """
+    Dial's algorithm over (cell, heading) states with a penalty for each turn
+    
+    States are indexed by cell * 4 + heading, with headings in PathFinder
+    direction order (up, down, left, right), and kept in flat arrays. Step and
+    turn costs are small integers, so a circular array of buckets replaces the
+    heap. The source may be left in any heading. A U-turn costs two turns.
+    
+    Returns (cost, parent, found): the cost and parent state of every state,
+    and the first state reached at target (None if not reached or no target).
+    """
+    if turn_cost < 0:
+        raise ValueError("Turn cost cannot be negative")
+    rows, cols = grid.rows, grid.cols
+    row, col = source
+    if not (0 <= row < rows and 0 <= col < cols) or grid.is_obstacle(row, col):
+        return None, None, None
+    blocked = grid.obstacle_mask()
+    costs = grid.costs
+    target_cell = target[0] * cols + target[1] if target is not None else -1
+    directions = ((-1, 0), (1, 0), (0, -1), (0, 1))
+    
+    cost = array('I', [TURN_UNVISITED]) * (rows * cols * 4)
+    parent = array('i', [-1]) * (rows * cols * 4)
+    # Every edge costs less than width, so pending states always fit in the ring
+    width = grid.max_cost + 2 * turn_cost + 1
+    buckets = [[] for _ in range(width)]
+    source_cell = row * cols + col
+    for heading in range(4):
+        cost[source_cell * 4 + heading] = 0
+        buckets[0].append(source_cell * 4 + heading)
+    pending = 4
+    current = 0
+    
+    while pending:
+        bucket = buckets[current % width]
+        while not bucket:
+            current += 1
+            bucket = buckets[current % width]
+        state = bucket.pop()
+        pending -= 1
+        if cost[state] != current:
+            continue  # Superseded by a cheaper entry
+        cell, heading = state >> 2, state & 3
+        if cell == target_cell:
+            return cost, parent, state
+        row, col = divmod(cell, cols)
+        for new_heading, (d_row, d_col) in enumerate(directions):
+            new_row, new_col = row + d_row, col + d_col
+            if not (0 <= new_row < rows and 0 <= new_col < cols):
+                continue
+            new_cell = new_row * cols + new_col
+            if blocked[new_cell]:
+                continue
+            # Opposite headings differ only in the lowest bit
+            if new_heading == heading:
+                turn = 0
+            elif new_heading == heading ^ 1:
+                turn = 2 * turn_cost
+            else:
+                turn = turn_cost
+            new_cost = current + costs[new_cell] + turn
+            new_state = new_cell * 4 + new_heading
+            if new_cost < cost[new_state]:
+                cost[new_state] = new_cost
+                parent[new_state] = state
+                buckets[new_cost % width].append(new_state)
+                pending += 1
+    return cost, parent, None
+
+def compute_turn_field(grid, source, turn_cost):
+    """Travel time from source to every cell in any heading, as a distance field clamped below UNREACHABLE"""
+    field = array('H', [UNREACHABLE]) * (grid.rows * grid.cols)
+    cost, _, _ = turn_search(grid, source, turn_cost)
+    if cost is None:
+        return field
+    limit = UNREACHABLE - 1
+    for cell in range(len(field)):
+        best = min(cost[cell * 4:cell * 4 + 4])
+        if best != TURN_UNVISITED:
+            field[cell] = min(best, limit)
+    return field
+
+def pack_distance_field(field):
+    """Serialise a distance field as little-endian uint16 bytes"""
+    if sys.byteorder != 'little':
+        field = array('H', field)
+        field.byteswap()
+    return field.tobytes()
+
+def unpack_distance_field(data):
+    """Load a distance field from little-endian uint16 bytes"""
+    field = array('H')
+    field.frombytes(data)
+    if sys.byteorder != 'little':
+        field.byteswap()
+    return field
+
+def build_distance_table(grid, cells, path):
+    """
+    Writes a fixed-width uint16 distance table between the given storage cells to a file
+    
+    The file holds a header, the cell indices (uint32) and a row-major matrix of
+    distances (uint16), all little-endian, so it can be memory-mapped by DistanceTable.
+    Only one distance field is held in memory at a time.
+    """
+    cells = list(cells)
+    indices = array('I', [row * grid.cols + col for row, col in cells])
+    if sys.byteorder != 'little':
+        indices.byteswap()
+    
+    with open(path, 'wb') as f:
+        f.write(DISTANCE_TABLE_HEADER.pack(DISTANCE_TABLE_MAGIC, DISTANCE_TABLE_VERSION, grid.rows,
+                                           grid.cols, len(cells), bytes.fromhex(grid.layout_hash())))
+        f.write(indices.tobytes())
+        if sys.byteorder != 'little':
+            indices.byteswap()
+        
+        # One matrix row per source cell, gathered from its full distance field
+        for row, col in cells:
+            field = compute_distance_field(grid, (row, col))
+            f.write(pack_distance_field(array('H', [field[i] for i in indices])))
+    
+    logger.info(f"Built distance table for {len(cells)} cells at {path}")
+    return path
+
+class DistanceTable:
+    """
+    Read-only view of a distance table file built by build_distance_table
+    
+    The matrix is read straight from a memory map without copying, so several
+    processes opening the same file share one copy in the page cache.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        magic, version, self.rows, self.cols, count, layout_hash = DISTANCE_TABLE_HEADER.unpack_from(self._mmap)
+        if magic != DISTANCE_TABLE_MAGIC or version != DISTANCE_TABLE_VERSION:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a supported distance table file")
+        self.count = count
+        self.layout_hash = layout_hash.hex()
+        
+        # Slice the map into the cell index list and the distance matrix
+        self._matrix_offset = DISTANCE_TABLE_HEADER.size + 4 * count
+        view = memoryview(self._mmap)
+        cells = view[DISTANCE_TABLE_HEADER.size:self._matrix_offset].cast('I')
+        self.matrix = view[self._matrix_offset:self._matrix_offset + 2 * count * count].cast('H')
+        if sys.byteorder != 'little':
+            # Fall back to byte-swapped copies on big-endian machines
+            cells = array('I', cells)
+            cells.byteswap()
+            self.matrix = array('H', self.matrix)
+            self.matrix.byteswap()
+        
+        # Map (row, col) to its position in the matrix
+        self.index = {divmod(cell, self.cols): i for i, cell in enumerate(cells)}
+        
+    def __len__(self):
+        return self.count
+    
+    def __contains__(self, cell):
+        return cell in self.index
+    
+    def distance(self, a, b):
+        """Shortest path length between two storage cells, or None if no path exists"""
+        steps = self.matrix[self.index[a] * self.count + self.index[b]]
+        return None if steps == UNREACHABLE else steps
+    
+    def as_numpy(self):
+        """Return the matrix as a zero-copy numpy array (requires numpy)"""
+        import numpy
+        return numpy.frombuffer(self._mmap, dtype='<u2', count=self.count * self.count,
+                                offset=self._matrix_offset).reshape(self.count, self.count)
+    
+    def close(self):
+        """Release the memory map"""
+        if isinstance(self.matrix, memoryview):
+            self.matrix.release()
+        self._mmap.close()
+
+def iter_path_text(path, cols, chunk_size=500, separator=" -> "):
+    """
+    Yields a path as position numbers joined by separator, chunk_size positions
+    at a time, so a long route is never built into one large string
+    """
+    chunk = []
+    first = True
+    # A Route already holds cell indices, so no coordinates are built
+    numbers = (index + 1 for index in path.cells) if isinstance(path, Route) else \
+        (row * cols + col + 1 for row, col in path)
+    for number in numbers:
+        chunk.append(str(number))
+        if len(chunk) == chunk_size:
+            yield ("" if first else separator) + separator.join(chunk)
+            first = False
+            chunk = []
+    if chunk:
+        yield ("" if first else separator) + separator.join(chunk)
+
+def write_path_text(path, cols, file):
+    """Write a path as position numbers to an open text file, one chunk at a time"""
+    for chunk in iter_path_text(path, cols):
+        file.write(chunk)
+    file.write("\n")
+
+def read_layout_csv(file, rows, cols):
+    """
+    Reads an obstacle layout from CSV text, one line per grid row
+    
+    A cell is an obstacle unless it is empty, 0 or '.', so layouts can be drawn
+    with 1s or #s in a spreadsheet. Returns a one-byte-per-cell mask.
+    """
+    layout = [line for line in csv.reader(file) if any(value.strip() for value in line)]
+    if len(layout) != rows:
+        raise ValueError(f"Layout has {len(layout)} rows, expected {rows}")
+    mask = bytearray(rows * cols)
+    for row, line in enumerate(layout):
+        if len(line) > cols:
+            raise ValueError(f"Layout row {row + 1} has {len(line)} cells, expected {cols}")
+        for col, value in enumerate(line):
+            if value.strip() not in ("", "0", "."):
+                mask[row * cols + col] = 1
+    return mask
+
+def _pnm_header(data):
+    """Parse a PBM/PGM header, returning (magic, width, height, maxval, raster offset)"""
+    magic = data[:2]
+    fields = []
+    count = 2 if magic in (b'P1', b'P4') else 3
+    position = 2
+    while len(fields) < count:
+        # Skip whitespace and comments between header fields
+        while position < len(data) and data[position:position + 1].isspace():
+            position += 1
+        if data[position:position + 1] == b'#':
+            position = data.find(b'\n', position) + 1 or len(data)
+            continue
+        end = position
+        while end < len(data) and data[end:end + 1].isdigit():
+            end += 1
+        if end == position:
+            raise ValueError("Bitmap header is incomplete")
+        fields.append(int(data[position:end]))
+        position = end
+    maxval = fields[2] if count == 3 else 1
+    # Binary rasters start after exactly one whitespace byte
+    return magic, fields[0], fields[1], maxval, position + 1
+
+def read_layout_bitmap(data, rows, cols):
+    """
+    Reads an obstacle layout from PBM or PGM image bytes with one pixel per cell
+    
+    Black pixels (dark grey for PGM) are obstacles. Returns a one-byte-per-cell mask.
+    """
+    magic, width, height, maxval, offset = _pnm_header(data)
+    if magic not in (b'P1', b'P2', b'P4', b'P5'):
+        raise ValueError("Bitmap must be a PBM or PGM image")
+    if (height, width) != (rows, cols):
+        raise ValueError(f"Bitmap is {height}x{width}, expected {rows}x{cols}")
+    
+    if magic == b'P1':
+        # ASCII bits may be written with or without spaces between them
+        bits = bytes(data[offset:]).translate(None, b' \t\r\n')
+        if len(bits) < rows * cols:
+            raise ValueError("Bitmap is truncated")
+        return bytearray(bits[:rows * cols].translate(bytes.maketrans(b'01', b'\x00\x01')))
+    if magic == b'P2':
+        values = [int(value) for value in data[offset:].split()]
+    elif magic == b'P5':
+        if maxval > 255:
+            raise ValueError("16-bit PGM bitmaps are not supported")
+        values = data[offset:offset + rows * cols]
+    else:
+        # P4 packs eight cells per byte, with each row padded to whole bytes
+        row_bytes = (cols + 7) // 8
+        if len(data) - offset < rows * row_bytes:
+            raise ValueError("Bitmap is truncated")
+        values = bytearray(rows * cols)
+        for row in range(rows):
+            packed = data[offset + row * row_bytes:offset + (row + 1) * row_bytes]
+            for col in range(cols):
+                values[row * cols + col] = (packed[col >> 3] >> (7 - (col & 7))) & 1
+        return values
+    if len(values) < rows * cols:
+        raise ValueError("Bitmap is truncated")
+    threshold = maxval / 2
+    return bytearray(value < threshold for value in values[:rows * cols])
+
+def read_layout_file(path, rows, cols):
+    """Read an obstacle mask from a .csv layout or a .pbm/.pgm bitmap, chosen by file extension"""
+    if path.lower().endswith(".csv"):
+        with open(path, newline="") as f:
+            return read_layout_csv(f, rows, cols)
+    with open(path, "rb") as f:
+        return read_layout_bitmap(f.read(), rows, cols)
+
 def validate_point(x, y, rows, cols, allow_start_end=False, obstacles=None):
     """Validates if a point is within bounds and optionally checks for start/end points and obstacles"""
     # Check if point is start/end when not allowed
@@ -0,0 +1,121 @@
+# Behaviour shared by both stock backends: journal restores and SKU stock kept in step with bin totals
+import sqlite3
+from array import array
+
+import pytest
+
+import database
+
+@pytest.fixture(params=["sqlite", "array"])
+def db(request, tmp_path):
+    """A populated 4x5 store on each backend"""
+    store = database.open_inventory(4, 5, backend=request.param, db_path=str(tmp_path / "inventory.db"))
+    store.populate_random_data()
+    yield store
+    store.close()
+
+@pytest.fixture
+def skus(db):
+    """Two SKUs sharing bin 4, five units each, as {code: sku_id}"""
+    db.add_skus([("A", "Widget"), ("B", "Gadget")])
+    sku_ids = db.get_sku_ids(["A", "B"])
+    db.set_sku_stock([(sku_ids["A"], 4, 5), (sku_ids["B"], 4, 5)])
+    return sku_ids
+
+def test_sku_stock_sets_bin_total(db, skus):
+    assert db.get_quantity(4) == 10
+
+def test_item_level_changes_refuse_sku_bins(db, skus):
+    with pytest.raises(ValueError):
+        db.decrement_quantities({4: 8})
+    with pytest.raises(ValueError):
+        db.update_quantity(4, 3)
+    with pytest.raises(ValueError):
+        db.decrement_quantity(4)
+    with pytest.raises(ValueError):
+        db.reserve_stock({4: 1})
+    with pytest.raises(ValueError):
+        db.restock({4: 1})
+    with pytest.raises(ValueError):
+        db.swap_quantities([(4, 5)])
+    assert db.get_quantity(4) == 10
+
+def test_taken_units_stay_taken(db, skus):
+    assert db.take_sku_stock({(skus["A"], 4): 8}) == [(skus["A"], 4)]
+    assert db.take_sku_stock({(skus["A"], 4): 4, (skus["B"], 4): 4}) == []
+    assert db.get_quantity(4) == 2
+    assert db.take_sku_stock({(skus["A"], 4): 1}) == []
+    assert db.get_quantity(4) == 1
+    assert db.get_pick_counts() == {4: 9}
+
+def test_sku_stock_refused_where_units_are_reserved(db):
+    db.add_skus([("A", "Widget")])
+    sku_id = db.get_sku_ids(["A"])["A"]
+    db.update_quantity(6, 3)
+    reservation_id = db.reserve_stock({6: 1})
+    with pytest.raises(ValueError):
+        db.set_sku_stock([(sku_id, 6, 5)])
+    assert db.get_quantity(6) == 2
+    db.release_reservation(reservation_id)
+    db.set_sku_stock([(sku_id, 6, 5)])
+    assert db.get_quantity(6) == 5
+
+def test_repopulating_keeps_sku_totals(db, skus):
+    db.populate_random_data()
+    assert db.get_quantity(4) == 10
+
+def test_location_skus(db, skus):
+    db.take_sku_stock({(skus["B"], 4): 5})
+    assert db.get_location_skus(4) == [(skus["A"], "A", 5)]
+    assert db.get_location_skus(5) == []
+
+def test_restore_after_losing_the_stock_table(db):
+    db.update_quantity(3, 42)
+    db.decrement_quantities({5: 1})
+    expected = db.get_all_quantities()
+    if isinstance(db, database.ArrayInventory):
+        db.quantities = array('I')
+    else:
+        with sqlite3.connect(db.db_path) as conn:
+            conn.execute('DELETE FROM items WHERE ItemID > 2')
+    assert db.restore_from_journal()
+    assert db.get_all_quantities() == expected
+    assert db.get_quantity(3) == 42
+
+def test_restore_rebuilds_a_table_saved_for_another_grid(tmp_path):
+    path = str(tmp_path / "inventory.db")
+    wide = database.InventoryDB(10, 20, db_path=path)
+    wide.populate_random_data()
+    wide.update_quantity(200, 42)
+    wide.close()
+    # Same number of cells, different shape, and no snapshot of that shape
+    tall = database.InventoryDB(20, 10, db_path=path)
+    assert not tall.restore_from_journal()
+    tall.populate_random_data()
+    tall.close()
+    # Back to the first shape: rebuilt from its snapshot plus the journal after it
+    wide = database.InventoryDB(10, 20, db_path=path)
+    assert wide.restore_from_journal()
+    assert wide.get_position(200) == (9, 19)
+    assert wide.get_quantity(200) == 42
+    wide.close()
+
+def test_reservation_is_all_or_nothing(db):
+    db.update_quantity(7, 2)
+    db.update_quantity(8, 1)
+    with pytest.raises(database.InsufficientStockError) as error:
+        db.reserve_stock({7: 2, 8: 2})
+    assert error.value.item_ids == [8]
+    assert db.get_quantities([7, 8]) == {7: 2, 8: 1}
+
+def test_release_returns_stock_and_commit_keeps_it_taken(db):
+    db.update_quantity(7, 5)
+    released = db.reserve_stock({7: 3})
+    assert db.get_quantity(7) == 2
+    assert db.release_reservation(released)
+    assert db.get_quantity(7) == 5
+    assert not db.release_reservation(released)
+    committed = db.reserve_stock({7: 4})
+    assert db.commit_reservation(committed)
+    assert db.get_quantity(7) == 1
+    assert db.get_route_movements(committed)[0][1:] == (7, -4, 'reserve')
@@ -0,0 +1,38 @@
+# Routing grid behaviour: incremental connected-component labels
+import random
+
+import spa
+
+def partition(grid):
+    """Cells grouped by component, independent of the label numbers"""
+    groups = {}
+    for index, label in enumerate(grid.component_labels()):
+        if label >= 0:
+            groups.setdefault(label, set()).add(index)
+    return sorted(sorted(cells) for cells in groups.values())
+
+def test_incremental_labels_match_a_full_relabel():
+    rng = random.Random(5)
+    grid = spa.Grid(12, 12)
+    grid.component_labels()
+    for _ in range(400):
+        row, col = rng.randrange(12), rng.randrange(12)
+        if rng.random() < 0.6:
+            grid.add_obstacle(row, col)
+        else:
+            grid.remove_obstacle(row, col)
+        fresh = spa.Grid(12, 12)
+        fresh.load_obstacle_mask(grid.obstacle_mask())
+        assert partition(grid) == partition(fresh)
+        assert grid.component_count() == fresh.component_count()
+
+def test_wall_makes_picks_unreachable_until_opened():
+    grid = spa.Grid(5, 5)
+    path_finder = spa.PathFinder(grid)
+    for row in range(5):
+        grid.add_obstacle(row, 2)
+    assert not grid.connected((0, 0), (0, 4))
+    assert path_finder.unreachable_points((0, 0), [(1, 1), (3, 3)]) == [(3, 3)]
+    grid.remove_obstacle(4, 2)
+    assert grid.connected((0, 0), (0, 4))
+    assert path_finder.unreachable_points((0, 0), [(1, 1), (3, 3)]) == []
@@ -0,0 +1,37 @@
+# Trip planning: 2-opt on asymmetric distances and the shared time budget
+import random
+import time
+
+import spa
+import trips
+
+def make_planner():
+    return trips.TripPlanner(spa.PathFinder(spa.Grid(5, 5)))
+
+def random_matrix(rng, count):
+    """Asymmetric distances between the start, end and count demands"""
+    return [[0 if a == b else rng.randint(1, 20) for b in range(count + 2)] for a in range(count + 2)]
+
+def test_improve_route_leaves_no_improving_reversal():
+    planner = make_planner()
+    rng = random.Random(7)
+    for _ in range(50):
+        count = rng.randint(1, 8)
+        matrix = random_matrix(rng, count)
+        start_route = rng.sample(range(count), count)
+        route, cost = planner.improve_route(matrix, start_route, time.monotonic() + 5)
+        assert sorted(route) == list(range(count))
+        assert cost == planner.route_cost(matrix, route) <= planner.route_cost(matrix, start_route)
+        for i in range(count - 1):
+            for j in range(i + 1, count):
+                reversed_route = route[:i] + route[i:j + 1][::-1] + route[j + 1:]
+                assert planner.route_cost(matrix, reversed_route) >= cost
+
+def test_improve_route_stops_within_a_pass_at_the_deadline():
+    planner = make_planner()
+    matrix = random_matrix(random.Random(3), 1500)
+    started = time.monotonic()
+    route, cost = planner.improve_route(matrix, list(range(1500)), started + 0.2)
+    assert time.monotonic() - started < 1.0
+    assert sorted(route) == list(range(1500))
+    assert cost == planner.route_cost(matrix, route)
@@ -0,0 +1,28 @@
+# Wave planning against an in-memory store: the order-by-order baseline and dispatch shortfalls
+import database
+import spa
+import waves
+
+def make_planner(rows=5, cols=5):
+    db = database.ArrayInventory(rows, cols)
+    db.populate_random_data()
+    return db, waves.WavePlanner(db, spa.PathFinder(spa.Grid(rows, cols)))
+
+def test_baseline_skips_bins_without_stock():
+    db, planner = make_planner()
+    db.update_quantity(2, 5)
+    db.update_quantity(21, 0)
+    plan = planner.plan([[2, 21]], (0, 0), (4, 4))
+    assert dict(plan.waves[0].unfilled) == {21: 1}
+    # One order in one wave walks the same bins either way
+    assert plan.solo_distance == plan.wave_distance
+    assert plan.distance_saved == 0
+
+def test_dispatch_reports_stock_taken_since_planning():
+    db, planner = make_planner()
+    db.update_quantity(2, 1)
+    db.update_quantity(8, 1)
+    plan = planner.plan([[2, 8]], (0, 0), (4, 4))
+    db.update_quantity(8, 0)
+    assert planner.dispatch(plan.waves[0]) == [8]
+    assert db.get_quantities([2, 8]) == {2: 0, 8: 0}
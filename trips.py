@@ -0,0 +1,234 @@
+# Capacitated routing: splits a pick list that is too big for one bot load into several trips
+import logging
+import time
+from collections import Counter
+
+import spa
+
+# Get the main logger
+logger = logging.getLogger(__name__)
+
+class Trip:
+    """One run from the start dock to the end dock carrying at most one bot load"""
+    def __init__(self, stops):
+        # (cell, units) in visiting order
+        self.stops = list(stops)
+        self.length = None
+        self.path = None
+
+    @property
+    def load(self):
+        return sum(units for _, units in self.stops)
+
+    def cells(self):
+        return [cell for cell, _ in self.stops]
+
+class TripPlan:
+    """Result of planning: the trips, their total distance and the distance of filling trips in pick order"""
+    def __init__(self, trips, distance, naive_distance, unreachable, error=None):
+        self.trips = trips
+        self.distance = distance
+        self.naive_distance = naive_distance
+        # Picks no route can reach, left out of every trip
+        self.unreachable = unreachable
+        # Why nothing could be planned, e.g. a walled-off dock
+        self.error = error
+
+    def summary(self, cols):
+        """Human readable report of the plan"""
+        if self.error:
+            return f"Error: {self.error}"
+        lines = []
+        for number, trip in enumerate(self.trips, 1):
+            positions = ", ".join(str(spa.coordinates_to_index(row, col, cols)) for row, col in trip.cells())
+            lines.append(f"Trip {number}: {trip.load} units from positions {positions}, {trip.length} steps")
+        if self.unreachable:
+            positions = ", ".join(str(spa.coordinates_to_index(row, col, cols)) for row, col in self.unreachable)
+            lines.append(f"Cannot reach positions: {positions}")
+        saved = self.naive_distance - self.distance
+        saved_pct = saved / self.naive_distance * 100 if self.naive_distance else 0
+        lines.append(f"Total distance: {self.distance} steps in {len(self.trips)} trips vs "
+                     f"{self.naive_distance} steps filling trips in pick order ({saved} saved, {saved_pct:.0f}%)")
+        return "\n".join(lines)
+
+class TripPlanner:
+    def __init__(self, path_finder, capacity=10, time_budget=2.0):
+        """Plan trips with the given PathFinder for a bot carrying capacity units"""
+        if capacity < 1:
+            raise ValueError("Bot capacity must be at least 1 unit")
+        self.path_finder = path_finder
+        self.capacity = capacity
+        self.time_budget = time_budget
+
+    def split_loads(self, picks):
+        """
+        Turn {item_id: units} into (full_loads, demands) of (cell, units)
+
+        A bin holding more than one load is emptied by direct full trips first,
+        so every remaining demand fits on the bot by itself.
+        """
+        cols = self.path_finder.grid.cols
+        full_loads = []
+        demands = []
+        for item_id, units in sorted(picks.items()):
+            cell = spa.index_to_coordinates(item_id, cols)
+            while units > self.capacity:
+                full_loads.append((cell, self.capacity))
+                units -= self.capacity
+            if units > 0:
+                demands.append((cell, units))
+        return full_loads, demands
+
+    def savings_routes(self, matrix, loads, deadline):
+        """
+        Clarke-Wright savings over demand indices
+
+        Every demand starts on its own trip. Joining the trip ending at i to the
+        trip starting at j saves d(i, end) + d(start, j) - d(i, j); joins are
+        made in order of saving while the combined load fits. Matrix node 0 is
+        the start, node 1 the end and node k + 2 demand k. Stops merging at the
+        deadline, which still leaves valid trips.
+        """
+        count = len(loads)
+        from_start = [matrix[0][k + 2] for k in range(count)]
+        to_end = [matrix[k + 2][1] for k in range(count)]
+        savings = []
+        for i in range(count):
+            row = matrix[i + 2]
+            for j in range(count):
+                if i != j:
+                    saving = to_end[i] + from_start[j] - row[j + 2]
+                    if saving > 0:
+                        savings.append((saving, i, j))
+        savings.sort(reverse=True)
+
+        routes = {k: [k] for k in range(count)}
+        route_of = list(range(count))
+        route_load = list(loads)
+        for number, (saving, i, j) in enumerate(savings):
+            if number % 1024 == 0 and time.monotonic() >= deadline:
+                logger.warning(f"Deadline reached after {number} of {len(savings)} savings")
+                break
+            a, b = route_of[i], route_of[j]
+            # Only join the end of one trip to the start of another
+            if a == b or routes[a][-1] != i or routes[b][0] != j:
+                continue
+            if route_load[a] + route_load[b] > self.capacity:
+                continue
+            routes[a].extend(routes[b])
+            for k in routes[b]:
+                route_of[k] = a
+            route_load[a] += route_load[b]
+            del routes[b]
+        return list(routes.values())
+
+    def route_cost(self, matrix, route):
+        """Distance from the start through the demands in route to the end"""
+        nodes = [0] + [k + 2 for k in route] + [1]
+        return sum(matrix[nodes[i]][nodes[i + 1]] for i in range(len(nodes) - 1))
+
+    def improve_route(self, matrix, route, deadline):
+        """
+        Reorder one trip with 2-opt reversals until no reversal helps or the deadline passes
+
+        Each reversal is priced from the arcs it changes. The reversed span is
+        summed in both directions as it grows, as cell costs can make
+        distances asymmetric, so a candidate costs O(1) and a pass O(n²). The
+        deadline is checked for every segment start, not just every pass.
+        """
+        nodes = [0] + [k + 2 for k in route] + [1]
+        improved = True
+        while improved:
+            improved = False
+            for p in range(1, len(nodes) - 2):
+                if time.monotonic() >= deadline:
+                    break
+                before, first = nodes[p - 1], nodes[p]
+                forward = backward = 0
+                for q in range(p + 1, len(nodes) - 1):
+                    forward += matrix[nodes[q - 1]][nodes[q]]
+                    backward += matrix[nodes[q]][nodes[q - 1]]
+                    last, after = nodes[q], nodes[q + 1]
+                    delta = (matrix[before][last] + backward + matrix[first][after]
+                             - matrix[before][first] - forward - matrix[last][after])
+                    # The tolerance stops float rounding on weighted grids flipping a span back and forth
+                    if delta < -1e-9:
+                        nodes[p:q + 1] = nodes[p:q + 1][::-1]
+                        improved = True
+                        break
+        route = [node - 2 for node in nodes[1:-1]]
+        return route, self.route_cost(matrix, route)
+
+    def plan(self, picks, start, end, time_budget=None, build_paths=True):
+        """
+        Plans trips for picks, {item_id: units} or a list of item IDs (one per unit)
+
+        Distances come from one shared matrix over the start, end and every
+        pick, built from the path finder's cached distance fields. Savings and
+        2-opt then share the time budget. With build_paths, each trip is
+        routed cell by cell into trip.path.
+        """
+        if not hasattr(picks, 'items'):
+            picks = Counter(picks)
+        if time_budget is None:
+            time_budget = self.time_budget
+        full_loads, demands = self.split_loads(picks)
+
+        # Walled-off picks are reported rather than costing a penalty in every trip
+        cells = [cell for cell, _ in full_loads + demands]
+        unreachable = set(self.path_finder.unreachable_points(start, cells, end))
+        if self.path_finder.grid.component_of(*start) is None or end in unreachable:
+            # No trip can run at all, and every leg distance would be None
+            if self.path_finder.grid.component_of(*start) is None:
+                error = f"Start dock {start} is blocked"
+            else:
+                error = f"End dock {end} cannot be reached from {start}"
+            logger.warning(f"Cannot plan trips: {error}")
+            return TripPlan([], 0, 0, sorted(set(cells)), error=error)
+        full_loads = [stop for stop in full_loads if stop[0] not in unreachable]
+        demands = [stop for stop in demands if stop[0] not in unreachable]
+        if unreachable:
+            logger.warning(f"Leaving out {len(unreachable)} unreachable picks")
+
+        matrix = self.path_finder.distance_matrix([start, end] + [cell for cell, _ in demands])
+        deadline = time.monotonic() + time_budget
+        loads = [units for _, units in demands]
+        routes = self.savings_routes(matrix, loads, deadline)
+
+        trips = []
+        distance = 0
+        for route in routes:
+            route, cost = self.improve_route(matrix, route, deadline)
+            trip = Trip(demands[k] for k in route)
+            trip.length = cost
+            trips.append(trip)
+            distance += cost
+
+        # Full loads are single-stop trips with nothing to optimise
+        for cell, units in full_loads:
+            trip = Trip([(cell, units)])
+            trip.length = self.path_finder.distance(start, cell) + self.path_finder.distance(cell, end)
+            trips.append(trip)
+            distance += trip.length
+        full_distance = sum(trip.length for trip in trips[len(routes):])
+
+        # Baseline: fill each trip with picks in the order given until the bot is full
+        naive_distance = full_distance
+        route, load = [], 0
+        for k, units in enumerate(loads):
+            if load + units > self.capacity:
+                naive_distance += self.route_cost(matrix, route)
+                route, load = [], 0
+            route.append(k)
+            load += units
+        if route:
+            naive_distance += self.route_cost(matrix, route)
+
+        if build_paths:
+            for trip in trips:
+                trip.path = self.path_finder.find_path_through_points(start, trip.cells(), end)
+
+        plan = TripPlan(trips, distance, naive_distance, sorted(unreachable))
+        logger.info(f"Planned {sum(picks.values())} units into {len(trips)} trips of at most {self.capacity}, "
+                    f"{distance} steps in total")
+        return plan
@@ -0,0 +1,190 @@
+# Wave planning: groups pending orders into pick waves that are routed once each
+import logging
+from collections import Counter
+
+import spa
+
+# Get the main logger
+logger = logging.getLogger(__name__)
+
+class Wave:
+    """A group of orders picked together on a single route"""
+    def __init__(self, order_ids):
+        self.order_ids = list(order_ids)
+        # Units to take from each item, merged across all orders in the wave
+        self.picks = Counter()
+        # Units that could not be allocated because stock ran out
+        self.unfilled = Counter()
+        self.path = None
+        self.route_length = None
+
+    def pick_cells(self, cols):
+        """Return the distinct bin coordinates visited by this wave"""
+        return [spa.index_to_coordinates(item_id, cols) for item_id in sorted(self.picks)]
+
+class WavePlan:
+    """Result of planning: the waves and the walking distance compared with single-order routing"""
+    def __init__(self, waves, solo_distance, wave_distance):
+        self.waves = waves
+        self.solo_distance = solo_distance
+        self.wave_distance = wave_distance
+
+    @property
+    def distance_saved(self):
+        return self.solo_distance - self.wave_distance
+
+    def summary(self):
+        """Human readable report of the plan"""
+        lines = []
+        for number, wave in enumerate(self.waves, 1):
+            orders = ", ".join(str(order_id + 1) for order_id in wave.order_ids)
+            length = "no route" if wave.route_length is None else f"{wave.route_length} steps"
+            lines.append(f"Wave {number}: orders {orders}, {len(wave.picks)} bins, {length}")
+            if wave.unfilled:
+                short = ", ".join(str(item_id) for item_id in sorted(wave.unfilled))
+                lines.append(f"  Not enough stock at positions: {short}")
+        saved_pct = self.distance_saved / self.solo_distance * 100 if self.solo_distance else 0
+        lines.append(f"Walking distance: {self.wave_distance} steps in waves vs "
+                     f"{self.solo_distance} steps order by order ({self.distance_saved} saved, {saved_pct:.0f}%)")
+        return "\n".join(lines)
+
+class WavePlanner:
+    def __init__(self, db, path_finder, max_orders_per_wave=4, max_bins_per_wave=10):
+        """Plan waves using the given InventoryDB and PathFinder"""
+        self.db = db
+        self.path_finder = path_finder
+        self.max_orders_per_wave = max_orders_per_wave
+        self.max_bins_per_wave = max_bins_per_wave
+
+    def cluster_orders(self, orders):
+        """
+        Groups orders by spatial proximity
+
+        Each wave is seeded with the unassigned order nearest the start dock and
+        grown with the orders whose pick centroid is closest to the wave's centroid,
+        until the order or bin limit is reached.
+        """
+        cols = self.path_finder.grid.cols
+        centroids = {}
+        for order_id, order in enumerate(orders):
+            cells = [spa.index_to_coordinates(item_id, cols) for item_id in order]
+            centroids[order_id] = (sum(r for r, _ in cells) / len(cells), sum(c for _, c in cells) / len(cells))
+
+        unassigned = sorted(centroids, key=lambda o: centroids[o][0] + centroids[o][1])
+        clusters = []
+        while unassigned:
+            seed = unassigned.pop(0)
+            cluster = [seed]
+            bins = set(orders[seed])
+            centre = centroids[seed]
+            while unassigned and len(cluster) < self.max_orders_per_wave:
+                # Closest remaining order to the current wave centre
+                nearest = min(unassigned, key=lambda o: abs(centroids[o][0] - centre[0]) + abs(centroids[o][1] - centre[1]))
+                if len(bins | set(orders[nearest])) > self.max_bins_per_wave:
+                    break
+                unassigned.remove(nearest)
+                cluster.append(nearest)
+                bins |= set(orders[nearest])
+                centre = (sum(centroids[o][0] for o in cluster) / len(cluster),
+                          sum(centroids[o][1] for o in cluster) / len(cluster))
+            clusters.append(cluster)
+        return clusters
+
+    def route_length(self, start, points, end):
+        """Length of the optimised route through points, from the cached distance fields"""
+        if len(points) > 1:
+            points = self.path_finder.optimise_point_order(start, list(points), end)
+        return self.order_length(start, points, end)
+
+    def order_length(self, start, order, end):
+        """
+        Length of visiting order as given, summed from path_finder.distance
+
+        This is a cost or travel time on weighted grids and with "turns", so
+        waves and single orders are always measured in the same units. Returns
+        None if any leg cannot be routed.
+        """
+        legs = [start] + list(order) + [end]
+        total = 0
+        for i in range(len(legs) - 1):
+            steps = self.path_finder.distance(legs[i], legs[i + 1])
+            if steps is None:
+                return None
+            total += steps
+        return total
+
+    def plan(self, orders, start, end):
+        """
+        Plans waves for a list of orders, each a list of item IDs (one per unit)
+
+        Stock for every order is read in one bulk query and allocated order by
+        order, then each wave is routed once through its merged bins.
+        """
+        orders = [list(order) for order in orders if order]
+        if not orders:
+            return WavePlan([], 0, 0)
+        cols = self.path_finder.grid.cols
+
+        # One bulk stock read covering every wave
+        available = self.db.get_quantities(item_id for order in orders for item_id in order)
+
+        waves = []
+        # Bins each order was actually given stock from, so the baseline walks the same bins as the waves
+        allocated_bins = {}
+        for cluster in self.cluster_orders(orders):
+            wave = Wave(cluster)
+            for order_id in cluster:
+                allocated_bins[order_id] = set()
+                for item_id, amount in Counter(orders[order_id]).items():
+                    allocated = min(amount, available.get(item_id, 0))
+                    available[item_id] = available.get(item_id, 0) - allocated
+                    if allocated:
+                        wave.picks[item_id] += allocated
+                        allocated_bins[order_id].add(item_id)
+                    if allocated < amount:
+                        wave.unfilled[item_id] += amount - allocated
+            waves.append(wave)
+
+        # Route each wave once through its distinct bins, costing it in the order the route visits them
+        for wave in waves:
+            points = wave.pick_cells(cols)
+            if not points:
+                continue
+            optimise = len(points) > 1
+            wave.path = self.path_finder.find_path_through_points(start, points, end, optimise_order=optimise)
+            if wave.path:
+                cells = wave.path.cells
+                order = sorted(points, key=lambda point: cells.index(point[0] * cols + point[1]))
+                wave.route_length = self.order_length(start, order, end)
+
+        # Baseline: every order routed on its own through its allocated bins; one with none makes no trip
+        solo_lengths = []
+        for order_id in range(len(orders)):
+            points = [spa.index_to_coordinates(item_id, cols) for item_id in sorted(allocated_bins[order_id])]
+            solo_lengths.append(self.route_length(start, points, end) if points else 0)
+
+        # Only waves that were routed, made of orders that could each be routed, are compared
+        wave_distance = 0
+        solo_distance = 0
+        for wave in waves:
+            if wave.route_length is None or any(solo_lengths[order_id] is None for order_id in wave.order_ids):
+                continue
+            wave_distance += wave.route_length
+            solo_distance += sum(solo_lengths[order_id] for order_id in wave.order_ids)
+
+        plan = WavePlan(waves, solo_distance, wave_distance)
+        logger.info(f"Planned {len(orders)} orders into {len(waves)} waves, saving {plan.distance_saved} steps")
+        return plan
+
+    def dispatch(self, wave):
+        """
+        Take the stock for a wave in one transaction
+
+        Returns the item IDs that were short when the wave was picked, for
+        example because stock was taken after planning; the rest of the wave
+        is still taken.
+        """
+        short = self.db.decrement_quantities(dict(wave.picks))
+        if short:
+            logger.warning(f"Wave dispatched short at positions {sorted(short)}")
+        return short
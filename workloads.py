@@ -0,0 +1,39 @@
+# Workload helpers shared by the benchmarks and the simulation: seeded layouts, quiet logging and percentiles
+import logging
+import random
+
+import spa
+
+def quiet_logging():
+    """Only show warnings so per-search log lines don't distort timings"""
+    logging.getLogger('spa').setLevel(logging.WARNING)
+    logging.getLogger('database').setLevel(logging.WARNING)
+
+def random_grid(rows, cols, density, seed):
+    """Create a grid with randomly placed obstacles, keeping the start and end cells open"""
+    rng = random.Random(seed)
+    grid = spa.Grid(rows, cols)
+    for row in range(rows):
+        for col in range(cols):
+            if rng.random() < density and (row, col) not in ((0, 0), (rows - 1, cols - 1)):
+                grid.add_obstacle(row, col)
+    return grid
+
+def rack_grid(rows, cols, seed):
+    """
+    Create a maze-like warehouse: vertical racks every other column, each with
+    a single gap at the top or bottom so routes snake between aisles
+    """
+    rng = random.Random(seed)
+    grid = spa.Grid(rows, cols)
+    for col in range(1, cols - 1, 2):
+        gap = 0 if rng.random() < 0.5 else rows - 1
+        for row in range(rows):
+            if row != gap:
+                grid.add_obstacle(row, col)
+    return grid
+
+def percentile(values, fraction):
+    """Return the value at the given fraction (0-1) of a list of numbers"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]